@@ -0,0 +1,126 @@
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.core.passwords import PasswordHasherBusy, password_hasher
+from app.core.ratelimit import Rate, RateLimited, client_ip, limiter
+from app.core.security import identity_cache, verify_session_token
+from app.schemas.user import SessionIdentity, User
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def load_identity(user_id: str) -> Optional[SessionIdentity]:
+    """
+    Resolves a user id to its identity, from the in-process cache when
+    possible. Only a cache miss costs a (projected) MongoDB lookup.
+    """
+    identity = identity_cache.get(user_id)
+    if identity is not None:
+        return identity
+
+    try:
+        oid = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return None
+
+    raw = await User.get_motor_collection().find_one({"_id": oid}, {"email": 1, "first_name": 1})
+    if raw is None:
+        return None
+
+    identity = SessionIdentity(user_id=user_id, email=raw["email"], first_name=raw["first_name"])
+    identity_cache.set(user_id, identity)
+    return identity
+
+
+async def authenticate_credentials(email: str, password: str, projection: dict) -> Optional[dict]:
+    """
+    Looks up an account by email and checks its password off the event loop
+    (see app/core/passwords.py). Returns the user document read with
+    `projection`, or None if the credentials are wrong. A password stored
+    before hashing, or hashed with an outdated cost, is re-hashed here.
+    """
+    collection = User.get_motor_collection()
+    raw = await collection.find_one({"email": email}, {**projection, "password_hash": 1})
+    stored = raw.pop("password_hash", None) if raw is not None else None
+
+    try:
+        matches, new_hash = await password_hasher.verify(password, stored)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many logins in progress, retry shortly", headers={"Retry-After": "1"})
+    if not matches:
+        return None
+
+    if new_hash is not None:
+        # Only if nobody changed it meanwhile; a new version so cached copies (ETags) revalidate
+        result = await collection.update_one(
+            {"_id": raw["_id"], "password_hash": stored},
+            {"$set": {"password_hash": new_hash}, "$inc": {"version": 1}},
+        )
+        if result.modified_count and "version" in raw:
+            raw["version"] += 1
+    return raw
+
+
+async def get_optional_identity(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> Optional[SessionIdentity]:
+    """
+    Returns the caller's identity if a bearer session token was sent.
+    Raises 401 for a token that is present but invalid or expired.
+    """
+    if credentials is None:
+        return None
+
+    payload = verify_session_token(credentials.credentials)
+    if payload is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token")
+
+    identity = await load_identity(payload["sub"])
+    if identity is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token")
+    return identity
+
+
+async def get_current_identity(
+    identity: Optional[SessionIdentity] = Depends(get_optional_identity),
+) -> SessionIdentity:
+    if identity is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return identity
+
+
+def too_many_requests(e: RateLimited) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many requests, slow down",
+        headers={"Retry-After": e.retry_after_header},
+    )
+
+
+def rate_limit(scope: str, per_minute_ip: int, per_minute_user: int = 0):
+    """
+    Dependency limiting requests per IP and, for callers with a valid
+    session token, per user. Over the limit the request gets a 429 with
+    Retry-After. Only the token's signature is checked here, so a limit
+    check never needs the database.
+    """
+    ip_rate, user_rate = Rate(per_minute_ip), Rate(per_minute_user)
+
+    async def check(
+        request: Request,
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    ) -> None:
+        try:
+            await limiter.hit(scope, f"ip:{client_ip(request)}", ip_rate)
+            if credentials is not None and per_minute_user:
+                payload = verify_session_token(credentials.credentials)
+                if payload is not None:
+                    await limiter.hit(scope, f"user:{payload['sub']}", user_rate)
+        except RateLimited as e:
+            raise too_many_requests(e)
+
+    return Depends(check)
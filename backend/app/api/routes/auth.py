@@ -1,43 +1,72 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.user import User, UserSignup
+from fastapi import APIRouter, HTTPException, Response
+from pymongo.errors import DuplicateKeyError
+from app.schemas.user import User, UserProfile, UserSignup
+from app.api.deps import authenticate_credentials, rate_limit, too_many_requests
+from app.core.config import settings
+from app.core.passwords import PasswordHasherBusy, password_hasher
+from app.core.ratelimit import Rate, RateLimited, limiter
+from app.core.security import create_session_token, identity_cache, identity_from_user
 from pydantic import BaseModel
 
 router = APIRouter()
 
 class LoginRequest(BaseModel):
     email: str
-    password_hash: str
+    password_hash: str          # The password itself; hashed server-side (app/core/passwords.py)
 
 
-@router.post("/login", response_model=User)
-async def login(credentials: LoginRequest):
-    # MongoDB Query: Find one document where email matches
-    # fetch_links=True is useful if you ever reference other documents
-    user = await User.find_one(User.email == credentials.email)
+# Header carrying the signed session token. Send it back as
+# `Authorization: Bearer <token>` to skip credential lookups.
+SESSION_TOKEN_HEADER = "X-Session-Token"
 
-    if not user or user.password_hash != credentials.password_hash:
+# Guessing passwords for one account from many IPs still hits the per-email limit
+LOGIN_EMAIL_RATE = Rate(settings.RATE_LIMIT_LOGIN_PER_MINUTE_EMAIL)
+
+
+@router.post("/login", response_model=UserProfile, dependencies=[rate_limit("login", settings.RATE_LIMIT_LOGIN_PER_MINUTE_IP)])
+async def login(credentials: LoginRequest, response: Response):
+    try:
+        await limiter.hit("login", f"email:{credentials.email.lower()}", LOGIN_EMAIL_RATE)
+    except RateLimited as e:
+        raise too_many_requests(e)
+
+    # Only the profile fields (and the stored hash, to check against) are read back
+    raw = await authenticate_credentials(credentials.email, credentials.password_hash, UserProfile.Settings.projection)
+    if raw is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    user = UserProfile.model_validate(raw)
+
+    # Issue a session token and prime the identity cache so the next
+    # authenticated request doesn't need the database to know who this is.
+    identity = identity_from_user(user)
+    identity_cache.set(identity.user_id, identity)
+    response.headers[SESSION_TOKEN_HEADER] = create_session_token(identity)
     
-    # Beanie/Pydantic will automatically convert the MongoDB BSON to JSON
-    # AND exclude the password_hash if you use a response_model that excludes it.
     return user
 
-@router.post("/signup", response_model=User)
-async def signup(user_info: UserSignup):
-    # Check if user with the same email already exists
-    existing_user = await User.find_one(User.email == user_info.email)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="A user with this email has already signed up.")
-
-    # Create a new User instance
+@router.post("/signup", response_model=UserProfile, dependencies=[rate_limit("signup", settings.RATE_LIMIT_SIGNUP_PER_MINUTE_IP)])
+async def signup(user_info: UserSignup, response: Response):
+    # Hash the password off the event loop, then create the User instance
+    try:
+        password_hash = await password_hasher.hash(user_info.password_hash)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many signups in progress, retry shortly", headers={"Retry-After": "1"})
     new_user = User(
         email=user_info.email,
-        password_hash=user_info.password_hash,
+        password_hash=password_hash,
         first_name=user_info.first_name
     )
     
-    # Save the new user to the database
-    await new_user.insert()
+    # Save the new user to the database. The unique index on email rejects
+    # an existing address, so there's no lookup beforehand.
+    try:
+        await new_user.insert()
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="A user with this email has already signed up.")
+
+    identity = identity_from_user(new_user)
+    identity_cache.set(identity.user_id, identity)
+    response.headers[SESSION_TOKEN_HEADER] = create_session_token(identity)
     
-    return new_user
+    return UserProfile.from_user(new_user)
 
@@ -1,114 +1,74 @@
-import asyncio
-import json
-import base64
-import os
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from google import genai
-from google.genai import types
-from app.core.config import settings
+import logging
+from fastapi import APIRouter, WebSocket
+from app.core.gemini import get_client
+from app.realtime.admission import session_registry
+from app.realtime.engine import RealtimeStream
+from app.realtime.personas import personas
+from app.realtime.protocol import AudioSender, negotiate
+from app.realtime.quotas import socket_user_id
+from app.realtime.telemetry import SessionTelemetry
+from app.realtime.transcripts import TranscriptRecorder, send_summary
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # --- CONFIGURATION FROM YOUR SNIPPET ---
 MODEL = "models/gemini-2.0-flash-exp"  # Updated to latest valid ID for 2.0 Flash
 # Note: "native-audio-preview" is often an alias; "gemini-2.0-flash-exp" is the standard experimental endpoint.
 
-# Initialize Client
-client = genai.Client(
-    http_options={"api_version": "v1beta"},
-    api_key=settings.GEMINI_API_KEY
-)
+# The shared v1beta client (app/core/gemini.py) is created by the first session
 
-# Configuration from your snippet
-GEMINI_CONFIG = types.LiveConnectConfig(
-    response_modalities=["AUDIO"],  # We want audio back
-    speech_config=types.SpeechConfig(
-        voice_config=types.VoiceConfig(
-            prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Orus")
-        )
-    ),
-)
+# Voice and greeting come from the "chat" persona (app/realtime/personas.json).
+# Its config asks for audio replies plus the text of both sides, which is
+# forwarded as {"type": "text"} and stored (app/realtime/transcripts.py).
 
 @router.websocket("/ws")
-async def websocket_endpoint(client_ws: WebSocket):
+async def websocket_endpoint(client_ws: WebSocket, protocol: str = "json", codec: str = "pcm"):
+    # Connect with ?protocol=binary to exchange raw PCM in binary frames
+    # (see app/realtime/protocol.py); JSON with base64 audio stays the default.
+    # Binary clients can add ?codec=opus to get replies as Opus packets
+    # (app/realtime/outbound.py); the "session" message says which they got.
+    protocol = negotiate(protocol)
     await client_ws.accept()
-    print("Frontend connected.")
+    logger.info("Frontend connected (%s protocol).", protocol)
+    audio_out = AudioSender(client_ws, protocol, json_key="audio", json_type=None)
+    telemetry = SessionTelemetry("chat")
+    recorder = TranscriptRecorder("chat", owner=socket_user_id(client_ws))
 
+    # Over capacity (or draining) the client gets a "busy" message right away
+    admission = await session_registry.admit("chat", client_ws)
+    if admission is None:
+        return
+
+    stream = RealtimeStream(client_ws, telemetry, recorder=recorder)
     try:
         # Connect to Gemini using the SDK's async context manager
-        async with client.aio.live.connect(model=MODEL, config=GEMINI_CONFIG) as session:
-            print("Connected to Gemini Live API")
+        async with get_client("v1beta").aio.live.connect(model=MODEL, config=personas.chat_config()) as session:
+            logger.info("Connected to Gemini Live API")
+            # Model audio is framed and paced to real time on its way out
+            outbound = await stream.open_outbound(audio_out, codec)
+
+            # Lets the client fetch the summary later (GET /sessions/{id}/summary)
+            await client_ws.send_json({"type": "session", "session_id": recorder.session_id, "codec": outbound.codec})
 
             # --- 1. SEND HIDDEN TRIGGER (To make Gemini speak first) ---
             # We treat this as a "client_content" turn to wake it up.
-            await session.send(
-                input="The user has connected. Say 'Hello, I am Orus. Ready to start?'",
-                end_of_turn=True
-            )
-
-            # --- 2. DEFINE BACKGROUND TASKS ---
-            
-            # Task A: Receive from Frontend -> Send to Gemini
-            async def receive_from_frontend():
-                try:
-                    while True:
-                        # Expecting JSON: { "realtime_input": { "media_chunks": [...] } }
-                        data = await client_ws.receive_json()
-                        
-                        # Just pass the whole payload directly to Gemini
-                        # The SDK's 'send' method is smart, but for raw JSON passing, 
-                        # we might need to parse. 
-                        
-                        # If the frontend sends raw PCM base64, we wrap it:
-                        if "realtime_input" in data:
-                            for chunk in data["realtime_input"]["media_chunks"]:
-                                # Send audio chunk to Gemini
-                                await session.send(
-                                    input={"data": chunk["data"], "mime_type": "audio/pcm"},
-                                    end_of_turn=False # Keep channel open
-                                )
-                                
-                except WebSocketDisconnect:
-                    print("Frontend disconnected")
-                except Exception as e:
-                    print(f"Error receiving from frontend: {e}")
-
-            # Task B: Receive from Gemini -> Send to Frontend
-            async def receive_from_gemini():
-                try:
-                    while True:
-                        async for response in session.receive():
-                            # The SDK returns a 'LiveConnectResponse' object
-                            server_content = response.server_content
-                            
-                            if server_content is None:
-                                continue
-
-                            model_turn = server_content.model_turn
-                            
-                            if model_turn:
-                                for part in model_turn.parts:
-                                    # Handle Audio
-                                    if part.inline_data:
-                                        # Send Base64 Audio to Frontend
-                                        await client_ws.send_json({
-                                            "audio": base64.b64encode(part.inline_data.data).decode("utf-8")
-                                        })
-                                    
-                                    # Handle Text (if any)
-                                    if part.text:
-                                        print(f"Gemini: {part.text}")
-
-                            if server_content.turn_complete:
-                                print("Gemini finished speaking.")
-                                
-                except Exception as e:
-                    print(f"Error receiving from Gemini: {e}")
+            await session.send(input=personas.chat_greeting, end_of_turn=True)
 
-            # Run both tasks indefinitely
-            await asyncio.gather(receive_from_frontend(), receive_from_gemini())
+            # --- 2. RELAY (app/realtime/engine.py) ---
+            # Frontend audio arrives as binary frames or as
+            # { "realtime_input": { "media_chunks": [...] } } with base64 PCM
+            await stream.run(session)
 
     except Exception as e:
-        print(f"Connection Error: {e}")
+        telemetry.error("session")
+        logger.warning("Connection Error: %s", e)
     finally:
-        await client_ws.close()
\ No newline at end of file
+        await stream.close()
+        # The Gemini session is closed by now, so the slot is free while the summary is written
+        admission.release()
+        await send_summary(recorder, client_ws)
+        try:
+            await client_ws.close()
+        except Exception:
+            pass  # Client already gone
@@ -1,6 +1,11 @@
-from fastapi import APIRouter
-from app.schemas.health import HealthResponse
+import asyncio
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from app.schemas.health import HealthResponse, ReadinessResponse
 from app.core.config import settings
+from app.core.database import ping, pool_stats
+from app.core.metrics import components
+from app.realtime.admission import session_registry
 
 router = APIRouter()
 
@@ -14,4 +19,41 @@ async def health_check():
         "status": "healthy",
         "version": settings.VERSION,
         "environment": "development"  # In real apps, fetch this from settings
-    }
\ No newline at end of file
+    }
+
+@router.get("/ready", response_model=ReadinessResponse, tags=["System"])
+async def readiness_check(request: Request):
+    """
+    Readiness probe. Unlike /health this pings MongoDB, and answers 503 when
+    the database can't be reached or the worker is draining for shutdown,
+    so the load balancer stops routing here.
+    """
+    client = request.app.state.mongo_client
+    body = ReadinessResponse(status="unavailable", database="connecting", pool=pool_stats.snapshot())
+
+    if client is not None and request.app.state.db_ready:
+        try:
+            body.ping_ms = round(await asyncio.wait_for(ping(client), settings.READY_PING_TIMEOUT_SECONDS), 2)
+            body.status = "ready"
+            body.database = "ok"
+        except Exception:
+            body.database = "unreachable"
+
+    if session_registry.draining:
+        body.status = "draining"
+
+    if body.status != "ready":
+        return JSONResponse(status_code=503, content=body.model_dump())
+    return body
+
+
+@router.get("/health/cache", tags=["System"])
+async def cache_stats():
+    """
+    Hit/miss counters for the in-process caches: user identities (every hit
+    is a MongoDB round trip saved) and pre-connected Gemini Live sessions
+    (every hit is a handshake the user didn't wait for).
+    """
+    # The pools only exist if their routers are enabled
+    names = ("identity_cache", "gemini_session_pool", "transcoder_pool")
+    return {name: components[name]() for name in names if name in components}
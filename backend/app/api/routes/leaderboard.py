@@ -0,0 +1,62 @@
+from typing import Literal, Optional
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.api.deps import get_current_identity
+from app.core.config import settings
+from app.core.leaderboard import LANGUAGE_METRICS, board_size, rank_of, top
+from app.schemas.leaderboard import GLOBAL_SCOPE, LeaderboardResponse, RankResponse, language_scope
+from app.schemas.lesson import validate_language
+from app.schemas.user import SessionIdentity
+
+router = APIRouter()
+
+Metric = Literal["lessons", "streak", "minutes"]
+
+
+def _language(language: str, metric: str) -> str:
+    try:
+        language = validate_language(language)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if metric not in LANGUAGE_METRICS:
+        raise HTTPException(status_code=400, detail=f"Language boards rank by {', '.join(LANGUAGE_METRICS)}")
+    return language
+
+
+@router.get("", response_model=LeaderboardResponse)
+async def global_leaderboard(
+    metric: Metric = "lessons",
+    limit: int = Query(20, ge=1, le=settings.LEADERBOARD_MAX_LIMIT),
+):
+    """Top learners across all languages, by lessons completed, live streak or minutes practised."""
+    return LeaderboardResponse(scope=GLOBAL_SCOPE, metric=metric, entries=await top(GLOBAL_SCOPE, metric, limit))
+
+
+@router.get("/languages/{language}", response_model=LeaderboardResponse)
+async def language_leaderboard(
+    language: str,
+    metric: Metric = "lessons",
+    limit: int = Query(20, ge=1, le=settings.LEADERBOARD_MAX_LIMIT),
+):
+    """Top learners of one language, by lessons completed in it or live streak."""
+    language = _language(language, metric)
+    entries = await top(language_scope(language), metric, limit)
+    return LeaderboardResponse(scope=language, metric=metric, entries=entries)
+
+
+@router.get("/me", response_model=RankResponse)
+async def my_rank(
+    metric: Metric = "lessons",
+    language: Optional[str] = None,
+    identity: SessionIdentity = Depends(get_current_identity),
+):
+    """
+    The caller's rank on the global board, or on a language board with
+    `?language=`. Needs a session token.
+    """
+    # Responses name a language board by its language, as before
+    name = _language(language, metric) if language else GLOBAL_SCOPE
+    scope = language_scope(name) if language else GLOBAL_SCOPE
+    result = await rank_of(ObjectId(identity.user_id), scope, metric)
+    rank, value = result if result else (None, 0)
+    return RankResponse(scope=name, metric=metric, rank=rank, value=value, out_of=await board_size(scope, metric))
@@ -1,67 +1,267 @@
-from fastapi import APIRouter, HTTPException
-from datetime import date, timedelta
-from app.schemas.user import User, LanguageProgress
-from app.schemas.lesson import LessonCompletionRequest
+from typing import Dict, List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from datetime import date, datetime, time, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.api.deps import authenticate_credentials, get_optional_identity
+from app.core.config import settings
+from app.core.events import record_completion
+from app.core.leaderboard import refresh_rankings
+from app.core.security import identity_cache, identity_from_user
+from app.schemas.user import SessionIdentity, User, UserProfile
+from app.schemas.lesson import (
+    LessonCompletionRequest,
+    LessonDetails,
+    LessonSyncItem,
+    LessonSyncRequest,
+    LessonSyncResponse,
+    LessonSyncResult,
+)
 
 router = APIRouter()
 
-@router.post("/complete", response_model=User)
-async def complete_lesson(payload: LessonCompletionRequest):
-    # 1. Authenticate User
-    user = await User.find_one(User.email == payload.email)
-    if not user or user.password_hash != payload.password_hash:
+
+def _literal(value):
+    # User-supplied values inside an aggregation pipeline must be wrapped,
+    # otherwise a string like "$email" would be read as a field path.
+    return {"$literal": value}
+
+
+# Converts a legacy `languages_studied` list into the keyed layout. Used as
+# the first stage of every progress update and by the migration script.
+KEYED_PROGRESS_STAGE = {
+    "$set": {
+        "languages_studied": {
+            "$cond": [
+                {"$isArray": "$languages_studied"},
+                {
+                    "$arrayToObject": {
+                        "$map": {
+                            "input": "$languages_studied",
+                            "as": "prog",
+                            "in": {"k": "$$prog.language", "v": "$$prog"},
+                        }
+                    }
+                },
+                {"$ifNull": ["$languages_studied", {}]},
+            ]
+        }
+    }
+}
+
+
+def completion_fields(lesson: LessonDetails, day: date) -> dict:
+    """
+    The `$set` expressions that apply one lesson completion on `day`.
+
+    Everything the old load/modify/save code did in Python happens inside
+    MongoDB in a single atomic update, so concurrent completions for the
+    same user can no longer overwrite each other. Progress is addressed by
+    path (`languages_studied.<language>`), so the update only touches the
+    language being completed, and completed lessons are merged with
+    `$setUnion` (`$addToSet` isn't available inside pipelines).
+    """
+    # Beanie stores `date` fields as midnight datetimes
+    day_dt = datetime.combine(day, time.min)
+    previous_dt = day_dt - timedelta(days=1)
+
+    # Safe to use in a field path: LessonDetails validates it
+    progress_path = f"languages_studied.{lesson.language}"
+    lesson_id = _literal(lesson.lesson_id)
+
+    return {
+        # 1. Streak: same day (or a late replay of an older day) -> keep,
+        #    the day before -> +1, otherwise reset to 1
+        "daily_streak": {
+            "$switch": {
+                "branches": [
+                    {"case": {"$gte": ["$last_active_date", day_dt]}, "then": "$daily_streak"},
+                    {"case": {"$eq": ["$last_active_date", previous_dt]}, "then": {"$add": ["$daily_streak", 1]}},
+                ],
+                "default": 1,
+            }
+        },
+        "last_active_date": {"$max": ["$last_active_date", day_dt]},
+
+        # 2. Global stats ($inc equivalents)
+        "total_lessons_completed": {"$add": [{"$ifNull": ["$total_lessons_completed", 0]}, 1]},
+        "total_time_spent": {"$add": [{"$ifNull": ["$total_time_spent", 0]}, _literal(lesson.time_spent)]},
+        "last_lesson_language": _literal(lesson.language),
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+
+        # 3. This language's progress: defaults, then what's stored, then this lesson
+        progress_path: {
+            "$mergeObjects": [
+                {"language": _literal(lesson.language), "level": "Beginner"},
+                f"${progress_path}",
+                {
+                    "completed_lessons": {
+                        "$setUnion": [{"$ifNull": [f"${progress_path}.completed_lessons", []]}, [lesson_id]]
+                    },
+                    "last_lesson_rating": _literal(lesson.rating),
+                    "previous_lesson_notes": _literal(lesson.new_notes),
+                },
+            ]
+        },
+    }
+
+
+def build_completion_pipeline(payload: LessonCompletionRequest, today: date) -> list:
+    """Builds the update pipeline that applies one lesson completion server-side."""
+    return [KEYED_PROGRESS_STAGE, {"$set": completion_fields(payload, today)}]
+
+
+def build_sync_pipeline(items: List[LessonSyncItem], batch_id: str) -> list:
+    """
+    Builds one update pipeline that applies a batch of offline completions.
+
+    Items are applied in the order given (oldest day first), each by a pair
+    of stages: the first checks the item's idempotency key against
+    `sync_keys`, the second applies the completion only if the key is new
+    and records `{k: key, b: batch_id}`. The caller tells "applied" from
+    "duplicate" by which batch a key ended up recorded under.
+    """
+    pipeline = [KEYED_PROGRESS_STAGE]
+    for item in items:
+        key = _literal(item.idempotency_key)
+        pipeline.append({
+            "$set": {"_sync_apply": {"$not": [{"$in": [key, {"$ifNull": ["$sync_keys.k", []]}]}]}}
+        })
+
+        fields = completion_fields(item, item.completed_on)
+        fields["sync_keys"] = {
+            "$concatArrays": [{"$ifNull": ["$sync_keys", []]}, [{"k": key, "b": _literal(batch_id)}]]
+        }
+        pipeline.append({
+            "$set": {
+                field: {"$cond": ["$_sync_apply", expr, f"${field}"]}
+                for field, expr in fields.items()
+            }
+        })
+
+    pipeline += [
+        # Only recent keys are kept: a client retries a batch within minutes, not months
+        {"$set": {"sync_keys": {"$slice": [{"$ifNull": ["$sync_keys", []]}, -settings.LESSON_SYNC_KEYS_KEPT]}}},
+        {"$unset": "_sync_apply"},
+    ]
+    return pipeline
+
+
+async def _user_filter(identity: Optional[SessionIdentity], email: Optional[str], password_hash: Optional[str]) -> dict:
+    # A session token is resolved without touching MongoDB. Legacy clients
+    # still send credentials in the body; those cost a lookup and a password
+    # check first (the password is only stored hashed).
+    if identity is not None:
+        return {"_id": ObjectId(identity.user_id)}
+    if email and password_hash:
+        raw = await authenticate_credentials(email, password_hash, {"_id": 1})
+        if raw is None:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        return {"_id": raw["_id"]}
+    raise HTTPException(status_code=401, detail="Not authenticated")
+
+
+@router.post("/complete", response_model=UserProfile)
+async def complete_lesson(
+    payload: LessonCompletionRequest,
+    background_tasks: BackgroundTasks,
+    identity: Optional[SessionIdentity] = Depends(get_optional_identity),
+):
+    # 1. Authenticate
+    user_filter = await _user_filter(identity, payload.email, payload.password_hash)
+
+    # 2. Apply the completion atomically, reading back only the profile
+    raw = await User.get_motor_collection().find_one_and_update(
+        user_filter,
+        build_completion_pipeline(payload, date.today()),
+        projection=UserProfile.Settings.projection,
+        return_document=ReturnDocument.AFTER,
+    )
+
+    if raw is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    # --- LOGIC START ---
-    today = date.today()
+    # 3. Refresh the cached identity with what we just read back
+    user = UserProfile.model_validate(raw)
+    identity_cache.set(str(user.id), identity_from_user(user))
 
-    # 2. Update Streak Logic
-    if user.last_active_date == today:
-        # Already learned today, do nothing to streak
-        pass
-    elif user.last_active_date == today - timedelta(days=1):
-        # Learned yesterday -> Increment streak
-        user.daily_streak += 1
-    else:
-        # Missed a day (or brand new) -> Reset streak to 1
-        user.daily_streak = 1
-    
-    # Update the date
-    user.last_active_date = today
-
-    # 3. Update Global Stats
-    user.total_lessons_completed += 1
-    user.total_time_spent += payload.time_spent
-    user.last_lesson_language = payload.language
-
-    # 4. Update Specific Language Progress
-    # We need to find if the user has studied this language before
-    target_lang_progress = None
-    
-    for prog in user.languages_studied:
-        if prog.language == payload.language:
-            target_lang_progress = prog
-            break
-    
-    if target_lang_progress:
-        # Update existing language
-        if payload.lesson_id not in target_lang_progress.completed_lessons:
-            target_lang_progress.completed_lessons.append(payload.lesson_id)
-        
-        target_lang_progress.last_lesson_rating = payload.rating
-        target_lang_progress.previous_lesson_notes = payload.new_notes
-    else:
-        # New language! Create new entry.
-        new_progress = LanguageProgress(
-            language=payload.language,
-            level="Beginner", # Default
-            completed_lessons=[payload.lesson_id],
-            last_lesson_rating=payload.rating,
-            previous_lesson_notes=payload.new_notes
+    # 4. Log the event and move this user's leaderboard entries after the response is sent
+    record_completion(user.id, payload, date.today())
+    background_tasks.add_task(refresh_rankings, raw)
+
+    return user
+
+
+@router.post("/sync", response_model=LessonSyncResponse)
+async def sync_lessons(
+    payload: LessonSyncRequest,
+    background_tasks: BackgroundTasks,
+    identity: Optional[SessionIdentity] = Depends(get_optional_identity),
+):
+    """
+    Replays completions recorded while the client was offline, in one
+    update instead of one `/complete` round trip each. Safe to retry: items
+    whose idempotency key was already applied are reported as duplicates.
+    """
+    # 1. Authenticate and validate the batch
+    user_filter = await _user_filter(identity, payload.email, payload.password_hash)
+    if len(payload.completions) > settings.LESSON_SYNC_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.LESSON_SYNC_MAX_ITEMS} completions per sync")
+
+    # Allow for clients a timezone ahead of the server
+    latest_allowed = date.today() + timedelta(days=1)
+    results: Dict[int, LessonSyncResult] = {}
+    accepted = []
+    seen = set()
+    for index, item in enumerate(payload.completions):
+        if item.completed_on > latest_allowed:
+            results[index] = LessonSyncResult(idempotency_key=item.idempotency_key, status="rejected",
+                                              detail="completed_on is in the future")
+        elif item.idempotency_key in seen:
+            results[index] = LessonSyncResult(idempotency_key=item.idempotency_key, status="duplicate")
+        else:
+            seen.add(item.idempotency_key)
+            accepted.append((index, item))
+
+    # 2. Apply every accepted completion in one atomic update, oldest day
+    # first so streaks come out as if the client had been online
+    collection = User.get_motor_collection()
+    if accepted:
+        batch_id = str(ObjectId())
+        accepted.sort(key=lambda pair: pair[1].completed_on)
+        raw = await collection.find_one_and_update(
+            user_filter,
+            build_sync_pipeline([item for _, item in accepted], batch_id),
+            # The profile, plus just the keys this batch recorded
+            projection={
+                **UserProfile.Settings.projection,
+                "sync_keys": {"$filter": {"input": "$sync_keys", "cond": {"$eq": ["$$this.b", _literal(batch_id)]}}},
+            },
+            return_document=ReturnDocument.AFTER,
         )
-        user.languages_studied.append(new_progress)
+    else:
+        raw = await collection.find_one(user_filter, UserProfile.Settings.projection)
+
+    if raw is None:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # 3. Per-item outcome: applied now if its key was recorded under this batch
+    if accepted:
+        recorded = {entry["k"] for entry in raw.pop("sync_keys", None) or []}
+        for index, item in accepted:
+            status = "applied" if item.idempotency_key in recorded else "duplicate"
+            results[index] = LessonSyncResult(idempotency_key=item.idempotency_key, status=status)
+    ordered = [results[index] for index in range(len(payload.completions))]
+
+    # 4. Refresh the cached identity, log what was applied and, if anything
+    # changed, the leaderboards
+    user = UserProfile.model_validate(raw)
+    identity_cache.set(str(user.id), identity_from_user(user))
 
-    # 5. Save changes to MongoDB
-    await user.save()
+    applied = [item for index, item in accepted if results[index].status == "applied"]
+    for item in applied:
+        record_completion(user.id, item, item.completed_on, source="sync")
+    if applied:
+        background_tasks.add_task(refresh_rankings, raw)
 
-    return user
\ No newline at end of file
+    return LessonSyncResponse(results=ordered, user=user)
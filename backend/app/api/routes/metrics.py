@@ -0,0 +1,53 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.database import pool_stats
+from app.core.events import event_writer
+from app.core.metrics import components, register_component, registry
+from app.core.passwords import password_hasher
+from app.core.ratelimit import limiter
+from app.core.security import identity_cache
+from app.realtime.admission import session_registry
+from app.realtime.personas import personas
+from app.realtime.quotas import realtime_quotas
+from app.realtime.resumption import resumption_registry
+from app.realtime.transcripts import transcript_writer
+
+router = APIRouter()
+
+# Components that already keep their own counters are read at scrape time
+# instead of being instrumented again. The Gemini session pool and the
+# transcoder pool are registered by their routers, if those are enabled.
+_COMPONENTS = {
+    "realtime_sessions": session_registry.stats,
+    "parked_sessions": resumption_registry.stats,
+    "rate_limits": limiter.stats,
+    "realtime_quotas": realtime_quotas.stats,
+    "identity_cache": identity_cache.stats,
+    "password_hasher": password_hasher.stats,
+    "personas": personas.stats,
+    "mongo_pool": pool_stats.snapshot,
+    "lesson_events": event_writer.stats,
+    "transcript_writer": transcript_writer.stats,
+}
+for name, stats in _COMPONENTS.items():
+    register_component(name, stats)
+
+
+def _component_stats():
+    values = {}
+    for component, stats in components.items():
+        for stat, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[(component, stat)] = value
+    return values
+
+
+registry.callback_gauge("app_component_stat", "Counters and sizes of caches and pools", ["component", "stat"], _component_stats)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus scrape endpoint: realtime session metrics plus cache and pool stats.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
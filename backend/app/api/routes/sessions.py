@@ -0,0 +1,61 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from app.api.deps import get_optional_identity
+from app.schemas.user import SessionIdentity
+from app.schemas.transcript import (
+    SessionSummary,
+    SummaryResponse,
+    TranscriptLine,
+    TranscriptResponse,
+    TranscriptTurn,
+)
+
+router = APIRouter()
+
+# A session opened with a token (?token=...) belongs to that user: only the
+# same user's bearer token reads it back. Sessions opened without one have no
+# owner; their random 128-bit id, handed only to the session's own client (in
+# the ready/session message), is the credential.
+
+
+def check_owner(owner: Optional[str], identity: Optional[SessionIdentity], not_found: str) -> None:
+    if owner is None:
+        return
+    if identity is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if identity.user_id != owner:
+        # Same answer as for an unknown id, so other users' session ids can't be probed
+        raise HTTPException(status_code=404, detail=not_found)
+
+
+@router.get("/{session_id}/summary", response_model=SummaryResponse)
+async def session_summary(session_id: str, identity: Optional[SessionIdentity] = Depends(get_optional_identity)):
+    """Tutor notes for a finished speaking or chat session, for clients that missed the summary message."""
+    not_found = "No summary for this session (yet)"
+    summary = await SessionSummary.find_one(SessionSummary.session_id == session_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    check_owner(summary.user_id, identity, not_found)
+    return SummaryResponse(
+        session_id=summary.session_id,
+        language=summary.language,
+        topic=summary.topic,
+        turns=summary.turns,
+        notes=summary.notes,
+    )
+
+
+@router.get("/{session_id}/transcript", response_model=TranscriptResponse)
+async def session_transcript(session_id: str, identity: Optional[SessionIdentity] = Depends(get_optional_identity)):
+    """The stored turns of a session, in order. Turns are written in batches, so the last few may lag slightly."""
+    not_found = "No transcript for this session"
+    cursor = TranscriptTurn.get_motor_collection().find(
+        {"session_id": session_id}, {"_id": 0, "user_id": 1, "seq": 1, "role": 1, "text": 1}
+    ).sort("seq", 1)
+    docs = [doc async for doc in cursor]
+    if not docs:
+        raise HTTPException(status_code=404, detail=not_found)
+    # Every turn of a session is written with the same owner
+    check_owner(docs[0].get("user_id"), identity, not_found)
+    turns = [TranscriptLine(seq=doc["seq"], role=doc["role"], text=doc["text"]) for doc in docs]
+    return TranscriptResponse(session_id=session_id, turns=turns)
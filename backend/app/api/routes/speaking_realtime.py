@@ -4,18 +4,30 @@ This uses WebSocket for bidirectional audio streaming - like a real conversation
 
 Key Configuration:
 - MODEL: gemini-2.5-flash (supports native audio I/O)
-- VOICE_CONFIG: How Gemini speaks back to you
-- SYSTEM_INSTRUCTIONS: Customize AI tutor personality per language
+- Voice and tutor personality per language, topic and mode: app/realtime/personas.json
+  (reloaded while running, see app/realtime/personas.py)
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from google import genai
-import os
+from app.core.config import settings
+from app.core.gemini import get_client
+from app.core.metrics import register_component
+from app.realtime.admission import session_registry
+from app.realtime.audio import TARGET_RATE, parse_input_rate
+from app.realtime.engine import RealtimeStream
+from app.realtime.live_pool import LiveSessionPool
+from app.realtime.personas import personas
+from app.realtime.protocol import AudioSender, negotiate
+from app.realtime.quotas import socket_user_id
+from app.realtime.resumption import ReplayBuffer, ResumableSession, resumption_registry
+from app.realtime.telemetry import SessionTelemetry
+from app.realtime.transcripts import TranscriptRecorder, send_summary
 import json
-import base64
-import asyncio
+import logging
+import time
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # ============================================
 # CONFIGURATION - Customize AI behavior here
@@ -24,117 +36,45 @@ router = APIRouter()
 # Gemini model with Live API support
 MODEL = "models/gemini-2.5-flash"
 
-# Voice configuration - customize how AI speaks
-# Options: Monst, Peach, Puck, Alloy, Charon, Coral, Echo, Kore, Orbit, Sage, Verse
-VOICE_NAME = "Puck"  # Change to your preferred voice
+# Voices and system instructions come from the persona registry
+# (app/realtime/personas.json), which prebuilds a config per session key
 
-# System instructions per language
-# Modify these to change tutor personality and teaching style
-LANGUAGE_INSTRUCTIONS = {
-    "Spanish": """You are a friendly Spanish tutor from Spain or Latin America. 
-    Speak naturally in Spanish with a conversational tone. 
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-    
-    "French": """You are a friendly French tutor from France.
-    Speak naturally in French with a conversational tone.
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-    
-    "German": """You are a friendly German tutor from Germany.
-    Speak naturally in German with a conversational tone.
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-    
-    "Italian": """You are a friendly Italian tutor from Italy.
-    Speak naturally in Italian with a conversational tone.
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-    
-    "Portuguese": """You are a friendly Portuguese tutor from Brazil or Portugal.
-    Speak naturally in Portuguese with a conversational tone.
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-    
-    "Hindi": """You are a friendly Hindi tutor. Speak in a natural Mumbai/Delhi dialect.
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-    
-    "Chinese": """You are a friendly Mandarin Chinese tutor.
-    Speak naturally in Mandarin with a conversational tone.
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-    
-    "Japanese": """You are a friendly Japanese tutor from Japan.
-    Speak naturally in Japanese with a conversational tone.
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-    
-    "Korean": """You are a friendly Korean tutor from South Korea.
-    Speak naturally in Korean with a conversational tone.
-    Keep responses brief (2-3 sentences) so the conversation flows naturally.
-    In ASSISTED mode: gently correct mistakes and offer tips.
-    In NON-ASSISTED mode: just have a natural conversation.""",
-}
-
-# Get API key from environment
-API_KEY = os.getenv("GEMINI_API_KEY")
+# Get API key from settings
+API_KEY = settings.GEMINI_API_KEY
 if not API_KEY:
-    print("WARNING: GEMINI_API_KEY not set - WebSocket audio will not work!")
+    logger.warning("GEMINI_API_KEY not set - WebSocket audio will not work!")
 
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
 
-def build_system_instruction(language: str, topic: str, mode: str) -> str:
-    """
-    Builds the system instruction for Gemini based on user settings.
-    
-    Args:
-        language: Target language (Spanish, French, etc.)
-        topic: Conversation topic (Greetings, Travel, etc.)
-        mode: Assisted or Non-Assisted
-        
-    Returns:
-        Complete system instruction string
-    """
-    base = LANGUAGE_INSTRUCTIONS.get(language, "You are a friendly language tutor.")
-    topic_instruction = f"\nFocus the conversation on: {topic}. Use relevant vocabulary naturally."
-    return base + topic_instruction
+def connect_live(key, handle=None):
+    """Opens a Gemini Live session for a (language, topic, mode) key, or resumes one from its handle."""
+    language, topic, mode = key
+    return get_client("v1alpha").aio.live.connect(
+        model=MODEL,
+        config=personas.speaking_config(language, topic, mode, handle)
+    )
 
 
-def create_gemini_config(language: str, topic: str, mode: str) -> dict:
-    """
-    Creates configuration for Gemini Live API.
-    
-    Customize these settings to change AI behavior:
-    - voice_name: Which voice to use (Puck, Alloy, etc.)
-    - response_modalities: ["AUDIO"] for voice responses
-    - system_instruction: AI personality and behavior
-    
-    Args:
-        language, topic, mode: User conversation settings
-        
-    Returns:
-        Configuration dictionary for Gemini
-    """
-    return {
-        "generation_config": {
-            "response_modalities": ["AUDIO"],  # AI responds with audio
-            "speech_config": {
-                "voice_config": {"prebuilt_voice_config": {"voice_name": VOICE_NAME}}
-            }
-        },
-        "system_instruction": build_system_instruction(language, topic, mode)
-    }
+# Pre-connected sessions so users don't wait for the Gemini handshake.
+# With the pool disabled every acquire() connects on demand.
+session_pool = LiveSessionPool(
+    connect_live,
+    max_size=settings.GEMINI_POOL_MAX_SIZE,
+    per_key=settings.GEMINI_POOL_PER_KEY if settings.GEMINI_SESSION_POOL_ENABLED else 0,
+    idle_timeout=settings.GEMINI_POOL_IDLE_SECONDS,
+)
+# After a persona reload, warm sessions still carry the old instructions
+personas.on_reload(session_pool.flush)
+register_component("gemini_session_pool", session_pool.stats)
+
+
+def prewarm_session_pool():
+    """Pre-connects the keys listed in GEMINI_POOL_PREWARM ("Language|Topic|Mode")."""
+    keys = [tuple(entry.split("|")) for entry in settings.GEMINI_POOL_PREWARM if entry.count("|") == 2]
+    if keys and API_KEY:
+        session_pool.prewarm(keys)
 
 
 # ============================================
@@ -148,26 +88,54 @@ async def websocket_audio_chat(websocket: WebSocket):
     
     Flow:
     1. Client connects and sends initial settings (language, topic, mode)
-    2. Backend establishes Gemini Live API connection
+    2. Backend takes a pre-connected Gemini Live session from the pool (or connects one),
+       or reattaches the parked session a reconnecting client asks to resume
     3. Client streams audio chunks → sent to Gemini
-    4. Gemini streams audio responses → sent back to client
+    4. Gemini streams audio responses → gathered into even frames, paced to real time
+       (optionally Opus-encoded) and sent back to client (see app/realtime/outbound.py)
     5. Client plays audio in browser
+    6. If the socket drops, the session waits SESSION_RESUME_GRACE_SECONDS for the
+       client to come back (see app/realtime/resumption.py)
+    
+    Connect with ?token=<session token> to be limited per user rather than
+    only per IP (see app/realtime/quotas.py). A session started with a token
+    can only be resumed with a token for the same user.
     
     Message Format from Client:
-    - {"type": "config", "language": "Spanish", "topic": "Travel", "mode": "Assisted"}
-    - {"type": "audio", "data": "base64_encoded_audio_chunk"}
-    - {"type": "end_turn"}  # User finished speaking
+    - {"type": "config", "language": "Spanish", "topic": "Travel", "mode": "Assisted",
+       "protocol": "binary", "sample_rate": 48000, "codec": "opus"}  # protocol defaults to "json", sample_rate (8000-48000) to 16000, codec to "pcm"
+    - {"type": "config", ..., "resume": {"session_id": "...", "resume_key": "...", "received": 42}}  # After a drop: keys from ready; received = audio frames received so far
+    - {"type": "audio", "data": "base64_encoded_audio_chunk"}  # json protocol
+    - binary frame: 6-byte header + raw PCM (see app/realtime/protocol.py)
+    - {"type": "end_turn"}  # User finished speaking (optional: trailing silence also ends the turn)
     - {"type": "close"}  # End conversation
     
     Message Format to Client:
-    - {"type": "audio", "data": "base64_encoded_audio"}
-    - {"type": "text", "data": "transcript_text"}  # Optional
+    - {"type": "ready", "protocol": "binary", "codec": "opus", "warm": true, "setup_ms": 12.3,
+       "session_id": "...", "resume_key": "...", "resumed": false}  # warm = served from the session pool; resumed = reattached after a drop
+    - {"type": "audio", "data": "base64_encoded_audio"}  # json protocol: 24 kHz PCM
+    - binary frame: 6-byte header + 24 kHz PCM, or one Opus packet  # binary protocol, per "codec" in ready
+    - {"type": "text", "role": "user" | "tutor", "data": "transcript fragment"}
+    - {"type": "interrupted"}  # User talked over the tutor: drop any reply audio still buffered
+    - {"type": "summary", "session_id": "...", "notes": "..."}  # After "close": pre-fills new_notes for /lessons/complete
     - {"type": "error", "message": "error_description"}
+    - {"type": "busy", "reason": "capacity", "retry_after": 5}  # Worker full, draining or caller "rate_limited"; socket closes with 1013
+    - {"type": "quota_exceeded", "retry_after": 3600}  # Daily session minutes used up; socket closes with 1008
+    - {"type": "draining", "retry_after": 5}  # Server is shutting down; reconnect after finishing this exchange
     """
     await websocket.accept()
-    print("✅ WebSocket connected - ready for audio chat")
+    logger.info("✅ WebSocket connected - ready for audio chat")
+    
+    # Over capacity (or draining) the client gets a "busy" message right away
+    admission = await session_registry.admit("speaking", websocket)
+    if admission is None:
+        return
     
-    gemini_session = None
+    live = None
+    stream = None               # RealtimeStream: the relay on this socket
+    recorder = None
+    state = None                # ResumableSession: what survives a dropped socket
+    telemetry = SessionTelemetry("speaking")
     
     try:
         # Wait for initial configuration from client
@@ -178,107 +146,152 @@ async def websocket_audio_chat(websocket: WebSocket):
             await websocket.send_json({"type": "error", "message": "First message must be config"})
             return
         
-        language = config_data.get("language", "Spanish")
-        topic = config_data.get("topic", "Greetings")
-        mode = config_data.get("mode", "Assisted")
+        protocol = negotiate(config_data.get("protocol"))
+        try:
+            sample_rate = parse_input_rate(config_data.get("sample_rate", TARGET_RATE))
+        except ValueError as e:
+            await websocket.send_json({"type": "error", "message": str(e)})
+            return
+        
+        # A client coming back after a drop names its session; if it's still
+        # parked, language, topic, mode and the transcript carry over
+        resume = config_data.get("resume") or {}
+        owner = socket_user_id(websocket)
+        state = await resumption_registry.claim(resume.get("session_id"), "speaking", owner, resume.get("resume_key"))
+        resumed = state is not None
+        if resumed:
+            language, topic, mode = state.key
+            recorder = state.recorder
+        else:
+            language = config_data.get("language", "Spanish")
+            topic = config_data.get("topic", "Greetings")
+            mode = config_data.get("mode", "Assisted")
+            recorder = TranscriptRecorder("speaking", language, topic, mode, owner=owner)
+        
+        logger.info("📝 Config: %s | %s | %s | %s", language, topic, mode, protocol)
         
-        print(f"📝 Config: {language} | {topic} | {mode}")
+        config_received_at = time.perf_counter()
         
-        # Initialize Gemini client
+        # Gemini client is shared; check the key is configured
         if not API_KEY:
             await websocket.send_json({"type": "error", "message": "API key not configured"})
             return
-            
-        client = genai.Client(
-            api_key=API_KEY,
-            http_options={'api_version': 'v1alpha'}
+        
+        # The relay itself (app/realtime/engine.py); a resumed session keeps
+        # the replies read from Gemini before the drop in its downstream queue
+        stream = RealtimeStream(
+            websocket,
+            telemetry,
+            sample_rate=sample_rate,
+            recorder=recorder,
+            downstream=state.downstream if resumed else None,
+            on_handle=lambda handle: setattr(state, "handle", handle),
         )
         
-        # Create Gemini configuration
-        gemini_config = create_gemini_config(language, topic, mode)
+        # Audio the client never got before the drop is resent first, under
+        # its original sequence numbers (and codec: a session keeps its codec)
+        replay_frames = state.replay.since(int(resume.get("received", 0))) if resumed else []
+        next_seq = replay_frames[0][0] if replay_frames else state.next_seq if resumed else 0
+        audio_out = AudioSender(websocket, protocol, seq=next_seq)
+        
+        # Frames and paces model audio on its way out, encoding it if asked to.
+        # Each frame is remembered in case the socket drops with it in flight.
+        outbound = await stream.open_outbound(
+            audio_out,
+            state.codec if resumed else config_data.get("codec"),
+            on_frame=lambda seq, frame: state.replay.append(seq, frame)
+        )
+        if resumed and outbound.codec != state.codec:
+            replay_frames = []  # Encoded for a decoder the client no longer has
         
-        # Open connection to Gemini Live API
-        async with client.aio.live.connect(model=MODEL, config=gemini_config) as session:
-            gemini_session = session
-            print("🚀 Connected to Gemini Live API")
-            
-            # Send ready signal to client
-            await websocket.send_json({"type": "ready"})
-            
-            # Create tasks for bidirectional streaming
-            async def receive_from_client():
-                """Receives audio from client and sends to Gemini"""
-                try:
-                    while True:
-                        message = await websocket.receive_text()
-                        data = json.loads(message)
-                        
-                        if data.get("type") == "audio":
-                            # Decode base64 a audio and send to Gemini
-                            audio_bytes = base64.b64decode(data["data"])
-                            await session.send(audio_bytes, end_of_turn=False)
-                            
-                        elif data.get("type") == "end_turn":
-                            # User stopped speaking - signal end of turn
-                            await session.send(b"", end_of_turn=True)
-                            print("🎤 User finished speaking")
-                            
-                        elif data.get("type") == "close":
-                            print("👋 Client requested close")
-                            break
-                            
-                except WebSocketDisconnect:
-                    print("❌ Client disconnected")
-                except Exception as e:
-                    print(f"❌ Error receiving from client: {e}")
-            
-            async def send_to_client():
-                """Receives responses from Gemini and sends to client"""
-                try:
-                    async for response in session.receive():
-                        if response.server_content and response.server_content.model_turn:
-                            # Gemini is speaking - extract audio
-                            for part in response.server_content.model_turn.parts:
-                                if hasattr(part, 'inline_data') and part.inline_data:
-                                    # Get audio bytes from Gemini
-                                    audio_data = part.inline_data.data
-                                    
-                                    # Encode as base64 and send to client
-                                    audio_b64 = base64.b64encode(audio_data).decode('utf-8')
-                                    await websocket.send_json({
-                                        "type": "audio",
-                                        "data": audio_b64
-                                    })
-                                    print("🔊 Sent audio chunk to client")
-                                    
-                        # You can also extract text transcripts if needed
-                        # if response.server_content.model_turn.text:
-                        #     await websocket.send_json({
-                        #         "type": "text",
-                        #         "data": response.server_content.model_turn.text
-                        #     })
-                            
-                except Exception as e:
-                    print(f"❌ Error sending to client: {e}")
-                    await websocket.send_json({"type": "error", "message": str(e)})
-            
-            # Run both directions concurrently
-            await asyncio.gather(
-                receive_from_client(),
-                send_to_client()
+        if resumed:
+            # The parked Gemini session, or a new one continuing from its resumption handle
+            live = await state.reattach(connect_live)
+        else:
+            # Take a pre-connected Gemini Live session (or connect one now)
+            live = await session_pool.acquire((language, topic, mode))
+        setup_ms = (time.perf_counter() - config_received_at) * 1000
+        logger.info(
+            "🚀 Gemini Live session ready in %.1f ms (%s)",
+            setup_ms, "resumed" if resumed else "warm" if live.warm else "cold"
+        )
+        
+        if not resumed:
+            state = ResumableSession(
+                session_id=recorder.session_id,
+                endpoint="speaking",
+                key=(language, topic, mode),
+                live=live,
+                recorder=recorder,
+                downstream=stream.downstream,
+                replay=ReplayBuffer(settings.SESSION_RESUME_REPLAY_FRAMES),
+                owner=owner,
             )
+            resumption_registry.track(state)
+        
+        # Send ready signal to client
+        await websocket.send_json({
+            "type": "ready",
+            "protocol": protocol,
+            "codec": outbound.codec,
+            "warm": live.warm,
+            "setup_ms": round(setup_ms, 1),
+            "session_id": recorder.session_id,
+            "resume_key": state.resume_key,
+            "resumed": resumed,
+        })
+        
+        state.codec = outbound.codec
+        
+        # The client reconnected before this socket's drop was noticed: end the
+        # relay here so the session can be parked and resumed on the new socket
+        async def wait_for_takeover():
+            await state.superseded.wait()
+            stream.state.client_dropped = True
+            logger.info("🔀 Client resumed on a new connection")
+        
+        # Run all stages until either side goes away
+        try:
+            await stream.run(
+                live.session,
+                replay=[frame for _, frame in replay_frames],
+                extra_stages=[wait_for_takeover()]
+            )
+        finally:
+            state.next_seq = audio_out.seq
     
     except WebSocketDisconnect:
-        print("❌ WebSocket disconnected")
+        logger.info("❌ WebSocket disconnected")
     except Exception as e:
-        print(f"❌ WebSocket error: {e}")
+        telemetry.error("session")
+        logger.exception("❌ WebSocket error: %s", e)
         try:
             await websocket.send_json({"type": "error", "message": str(e)})
         except:
             pass
     finally:
-        # Cleanup
-        print("🧹 Closing WebSocket connection")
+        # A client that dropped (rather than left) gets a grace period to come
+        # back; the Gemini session waits for it, but the worker slot doesn't
+        parked = (
+            state is not None and stream is not None and stream.state.client_dropped
+            and not session_registry.draining and not admission.closed_by_server
+            and await resumption_registry.park(state, upstream_ok=not stream.state.upstream_failed)
+        )
+        # Cleanup - pooled sessions are single-use, so always close it
+        logger.info("🧹 Closing WebSocket connection%s", " (session parked)" if parked else "")
+        if state is not None and not parked:
+            resumption_registry.forget(state)
+            # Also covers a claimed session this handler failed before reattaching:
+            # claim() stopped its expiry, so nothing else would close it
+            await state.close_live()
+        elif live is not None and not parked:
+            await live.close()
+        if stream is not None:
+            await stream.close()
+        # The Gemini session is gone, so the slot is free while the summary is written
+        admission.release()
+        if recorder is not None and not parked:
+            await send_summary(recorder, websocket)
         try:
             await websocket.close()
         except:
@@ -0,0 +1,50 @@
+from datetime import timedelta
+from typing import Optional
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.api.deps import get_current_identity
+from app.core.config import settings
+from app.core.stats import daily_series, language_totals, user_days, utc_today
+from app.schemas.lesson import validate_language
+from app.schemas.stats import DailyStatsResponse, LanguageStatsResponse, UserStatsResponse
+from app.schemas.user import SessionIdentity
+
+router = APIRouter()
+
+# Figures come from the rollups, so they trail live activity by up to
+# STATS_ROLLUP_INTERVAL_SECONDS. Days are the learners' own (completed_on),
+# counted back from today in UTC.
+Days = Query(30, ge=1, le=settings.STATS_MAX_DAYS)
+
+
+@router.get("/daily", response_model=DailyStatsResponse)
+async def daily_stats(days: int = Days, language: Optional[str] = None):
+    """Lessons, minutes, average rating and learners per day, for all languages or one."""
+    if language is not None:
+        try:
+            language = validate_language(language)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    since = utc_today() - timedelta(days=days - 1)
+    return DailyStatsResponse(language=language, days=await daily_series(since, language))
+
+
+@router.get("/languages", response_model=LanguageStatsResponse)
+async def language_stats(days: int = Days):
+    """Totals per language over the last `days` days, most practised first."""
+    since = utc_today() - timedelta(days=days - 1)
+    return LanguageStatsResponse(since=since, languages=await language_totals(since))
+
+
+@router.get("/me", response_model=UserStatsResponse)
+async def my_stats(days: int = Days, identity: SessionIdentity = Depends(get_current_identity)):
+    """The caller's activity per day and language. Needs a session token."""
+    since = utc_today() - timedelta(days=days - 1)
+    rows = await user_days(ObjectId(identity.user_id), since)
+    return UserStatsResponse(
+        since=since,
+        lessons=sum(row.lessons for row in rows),
+        minutes=sum(row.minutes for row in rows),
+        active_days=len({row.day for row in rows}),
+        days=rows,
+    )
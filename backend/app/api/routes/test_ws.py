@@ -1,124 +1,92 @@
-import os
-import asyncio
-import subprocess
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from google import genai
+import logging
+from fastapi import APIRouter, WebSocket
 from app.core.config import settings
+from app.core.gemini import get_client
+from app.core.metrics import register_component
+from app.realtime.admission import session_registry
+from app.realtime.engine import RealtimeStream, decode_raw
+from app.realtime.protocol import PROTOCOL_RAW, AudioSender
+from app.realtime.telemetry import SessionTelemetry
+from app.realtime.transcode import TranscoderBusy, TranscoderPool
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 GEMINI_MODEL = "gemini-2.0-flash-exp"
 
 # Validate Key
 if not settings.GEMINI_API_KEY:
-    print("CRITICAL: GEMINI_API_KEY is missing in .env")
+    logger.critical("GEMINI_API_KEY is missing in .env")
 
-client = genai.Client(api_key=settings.GEMINI_API_KEY, http_options={"api_version": "v1alpha"})
+# The shared v1alpha client (app/core/gemini.py) is created by the first session
+
+# Bounded pool of ffmpeg decoders shared by all sessions on this worker
+transcoder_pool = TranscoderPool(
+    max_workers=settings.TRANSCODER_MAX_WORKERS,
+    warm=settings.TRANSCODER_WARM,
+    acquire_timeout=settings.TRANSCODER_ACQUIRE_TIMEOUT_SECONDS
+)
+register_component("transcoder_pool", transcoder_pool.stats)
+
+# Clients that record 16 kHz s16le PCM themselves connect with ?format=pcm
+# and skip the transcoder entirely. Replies are 24 kHz PCM in bare binary
+# frames, or one Opus packet per frame with ?codec=opus.
+PCM_PASSTHROUGH = "pcm"
 
 @router.websocket("/gemini-live")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, format: str = "webm", codec: str = "pcm"):
     await websocket.accept()
-    print("WS: Client connected")
+    logger.info("WS: Client connected (%s)", format)
+    telemetry = SessionTelemetry("test")
 
-    # 1. Start FFmpeg (Persistent)
-    # Added '-f webm' to explicitly tell FFmpeg the input format
-    # Added stderr=asyncio.subprocess.PIPE to capture errors
-    ffmpeg_cmd = [
-        'ffmpeg',
-        '-f', 'webm',               # Force input format
-        '-i', 'pipe:0',             # Read from stdin
-        '-f', 's16le',              # Output format
-        '-acodec', 'pcm_s16le',     # Audio codec
-        '-ac', '1',                 # Channels
-        '-ar', '16000',             # Sample Rate
-        'pipe:1'                    # Write to stdout
-    ]
-    
-    process = await asyncio.create_subprocess_exec(
-        *ffmpeg_cmd,
-        stdin=asyncio.subprocess.PIPE,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE  # Capture stderr for debugging
-    )
-    
-    print(f"FFMPEG: Started PID {process.pid}")
+    # Admission first, so a rejected client never takes a decoder
+    admission = await session_registry.admit("test", websocket)
+    if admission is None:
+        return
 
-    config = {"response_modalities": ["AUDIO"]}
-    
+    transcoder = None
+    stream = None
+    # Everything after admission sits in this try, so the slot (and quota
+    # lease) is released however the session ends
     try:
-        async with client.aio.live.connect(model=GEMINI_MODEL, config=config) as session:
-            print("GEMINI: Connected to Live API")
-
-            # --- TASK 1: Browser -> FFmpeg ---
-            async def receive_from_browser():
-                try:
-                    while True:
-                        message = await websocket.receive()
-                        if "bytes" in message:
-                            data = message["bytes"]
-                            # print(f"INPUT: Received {len(data)} bytes from Browser") # Uncomment if spammy
-                            
-                            process.stdin.write(data)
-                            await process.stdin.drain()
-                        elif "text" in message:
-                            print(f"INPUT: Text message: {message['text']}")
-                except WebSocketDisconnect:
-                    print("WS: Disconnected")
-                except Exception as e:
-                    print(f"INPUT ERROR: {e}")
-                finally:
-                    process.stdin.close()
-
-            # --- TASK 2: FFmpeg -> Gemini ---
-            async def send_to_gemini():
-                try:
-                    while True:
-                        # Read larger chunks (4KB) to ensure valid PCM frames
-                        data = await process.stdout.read(4096)
-                        if not data:
-                            print("FFMPEG: Output stream ended")
-                            break
-                        
-                        # print(f"TRANSCODE: Sending {len(data)} PCM bytes to Gemini") # Uncomment if spammy
-                        await session.send(input={"data": data, "mime_type": "audio/pcm"}, end_of_turn=False)
-                except Exception as e:
-                    print(f"TRANSCODE ERROR: {e}")
-
-            # --- TASK 3: Gemini -> Browser ---
-            async def receive_from_gemini():
-                try:
-                    while True:
-                        async for response in session.receive():
-                            if response.server_content and response.server_content.model_turn:
-                                for part in response.server_content.model_turn.parts:
-                                    if part.inline_data:
-                                        audio = part.inline_data.data
-                                        print(f"OUTPUT: Gemini sent {len(audio)} bytes audio")
-                                        await websocket.send_bytes(audio)
-                except Exception as e:
-                    print(f"OUTPUT ERROR: {e}")
+        # 1. Lease a decoder from the pool (already running if one was warm)
+        if format != PCM_PASSTHROUGH:
+            try:
+                transcoder = await transcoder_pool.acquire()
+            except TranscoderBusy as e:
+                logger.warning("FFMPEG: %s", e)
+                telemetry.error("transcoder_busy")
+                await websocket.send_json({"type": "error", "message": "Transcoder busy, retry shortly"})
+                return
+            except OSError as e:
+                # ffmpeg missing or the spawn failed
+                logger.error("FFMPEG: Could not start a decoder: %s", e)
+                telemetry.error("transcoder_spawn")
+                await websocket.send_json({"type": "error", "message": "Audio decoder unavailable"})
+                return
+            logger.debug("FFMPEG: Leased PID %s", transcoder.pid)
 
-            # --- TASK 4: Monitor FFmpeg Errors ---
-            async def monitor_ffmpeg_errors():
-                while True:
-                    line = await process.stderr.readline()
-                    if not line: break
-                    # Only print actual errors/warnings, skip routine info
-                    line_str = line.decode().strip()
-                    if "Error" in line_str or "Invalid" in line_str:
-                         print(f"FFMPEG LOG: {line_str}")
+        config = {"response_modalities": ["AUDIO"]}
+        # 2. The relay (app/realtime/engine.py): bare audio bytes in, through the
+        # decoder if there is one; replies paced out as bare binary frames
+        stream = RealtimeStream(websocket, telemetry, decode=decode_raw, transcoder=transcoder)
 
-            await asyncio.gather(
-                receive_from_browser(),
-                send_to_gemini(),
-                receive_from_gemini(),
-                monitor_ffmpeg_errors()
-            )
+        async with get_client("v1alpha").aio.live.connect(model=GEMINI_MODEL, config=config) as session:
+            logger.info("GEMINI: Connected to Live API")
+            await stream.open_outbound(AudioSender(websocket, PROTOCOL_RAW), codec)
+            await stream.run(session)
 
     except Exception as e:
-        print(f"SESSION ERROR: {e}")
+        telemetry.error("session")
+        logger.warning("SESSION ERROR: %s", e)
     finally:
-        if process.returncode is None:
-            process.terminate()
-        await websocket.close()
-        print("CLEANUP: Connection closed")
\ No newline at end of file
+        if transcoder is not None:
+            await transcoder_pool.release(transcoder)
+        if stream is not None:
+            await stream.close()
+        try:
+            await websocket.close()
+        except Exception:
+            pass  # Client already gone
+        admission.release()
+        logger.info("CLEANUP: Connection closed")
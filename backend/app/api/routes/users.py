@@ -0,0 +1,94 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from bson import ObjectId
+from app.api.deps import get_current_identity
+from app.schemas.lesson import validate_language
+from app.schemas.user import LanguageProgress, SessionIdentity, User, UserProfile
+
+router = APIRouter()
+
+# Profiles change with every lesson, so clients revalidate each time; an
+# unchanged profile costs a 304 with no body
+CACHE_CONTROL = "private, no-cache"
+
+
+# Every write to a user document bumps `version` (lesson updates, password
+# re-hashes, migrations), so id.version names one state of the document
+def profile_etag(user_id, version: int) -> str:
+    return f'"{user_id}.{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+@router.get("/me", response_model=UserProfile)
+async def read_profile(
+    response: Response,
+    identity: SessionIdentity = Depends(get_current_identity),
+    if_none_match: Optional[str] = Header(None),
+):
+    """The caller's profile. Send the last ETag back in If-None-Match to get a 304 when nothing changed."""
+    profile = await User.find_one(User.id == ObjectId(identity.user_id), projection_model=UserProfile)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    etag = profile_etag(profile.id, profile.version)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return profile
+
+
+@router.get("/me/languages/{language}", response_model=LanguageProgress)
+async def read_language_progress(
+    language: str,
+    response: Response,
+    identity: SessionIdentity = Depends(get_current_identity),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Full progress (completed lessons, latest notes) for one language; only that language is read."""
+    try:
+        language = validate_language(language)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    users = User.get_motor_collection()
+    raw = await users.find_one(
+        {"_id": ObjectId(identity.user_id)},
+        {f"languages_studied.{language}": 1, "version": 1},
+    )
+    if raw is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    studied = raw.get("languages_studied")
+    if isinstance(studied, list):
+        # Legacy list layout (not yet converted by migrations/m001): the path
+        # projection can't pick one entry out of a list, so read the whole
+        # list once and key it the way the model does
+        raw = await users.find_one({"_id": raw["_id"]}, {"languages_studied": 1, "version": 1})
+        if raw is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        studied = User.key_legacy_progress(raw.get("languages_studied") or [])
+    progress = studied.get(language) if isinstance(studied, dict) else None
+    if progress is None:
+        raise HTTPException(status_code=404, detail=f"No progress in {language} yet")
+
+    etag = profile_etag(raw["_id"], raw.get("version", 0))
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return LanguageProgress.model_validate(progress)
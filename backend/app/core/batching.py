@@ -0,0 +1,104 @@
+"""
+Buffered, batched inserts for append-only collections.
+
+Request and relay code calls `record()`, which only appends to an
+in-memory list. A background task flushes the buffer with unordered
+`insert_many` batches every `flush_interval` seconds, or as soon as a full
+batch is waiting. Callers never wait on MongoDB, and the collection sees
+a few large inserts instead of many small ones.
+
+What goes through a BatchWriter is log-like data, not state. If MongoDB
+is unreachable, batches are kept and retried up to `max_buffer`
+documents. Beyond that new documents are dropped (and counted) so memory
+stays bounded.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    def __init__(self, name: str, collection: Callable[[], Any], batch_size: int, flush_interval: float, max_buffer: int):
+        """
+        Args:
+            name: What the documents are, for logs ("lesson events")
+            collection: Returns the motor collection to write to; called per
+                flush, so the database may connect after the writer starts
+            batch_size: Documents per insert_many
+            flush_interval: Seconds between flushes when no batch fills up
+            max_buffer: Documents held in memory before new ones are dropped
+        """
+        self.name = name
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+
+        self._buffer: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def record(self, document: dict) -> None:
+        """Queues one document. Never blocks and never raises."""
+        if len(self._buffer) >= self.max_buffer:
+            if not self.dropped % 1000:
+                logger.warning("Buffer for %s full (%d): dropping new ones", self.name, self.max_buffer)
+            self.dropped += 1
+            return
+        self._buffer.append(document)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:len(batch)]
+                try:
+                    await self.collection().insert_many(batch, ordered=False)
+                except Exception as e:
+                    # Put the batch back in front and retry on the next flush
+                    self._buffer[:0] = batch
+                    self.failed_flushes += 1
+                    logger.warning("Writing %d %s failed: %s", len(batch), self.name, e)
+                    return
+                self.written += len(batch)
+
+    async def close(self) -> None:
+        """Stops the flush loop and writes whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self._buffer:
+            logger.warning("Shutdown: %d %s could not be written", len(self._buffer), self.name)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+        }
@@ -5,12 +5,155 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "LinguaLearn Microservice"
     VERSION: str = "1.0.0"
     API_PREFIX: str = "/api/v1"
+    LOG_LEVEL: str = "INFO"                 # DEBUG turns on per-turn relay logs
+    LOG_FORMAT: str = "text"                # "json" for one structured object per line
     
+    # Routers to leave out, by name (see ROUTERS in app/main.py), e.g. ["test"].
+    # Their modules aren't imported, so their SDK clients and pools never load.
+    ROUTERS_DISABLED: list[str] = []
+
     # Example of a secure setting (reads from env var or defaults to localhost)
     ALLOWED_ORIGINS: list[str] = ["http://localhost:3000"]
     
     MONGODB_URL: str
+    MONGODB_MAX_POOL_SIZE: int = 50
+    MONGODB_MIN_POOL_SIZE: int = 5          # Also how many connections are warmed at startup
+    MONGODB_MAX_IDLE_TIME_MS: int = 60_000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5_000
+    MONGODB_CONNECT_RETRY_SECONDS: float = 5.0
+    READY_PING_TIMEOUT_SECONDS: float = 2.0
     GEMINI_API_KEY: str
+
+    # Pre-connected Gemini Live sessions for the speaking endpoint
+    GEMINI_SESSION_POOL_ENABLED: bool = True
+    GEMINI_POOL_MAX_SIZE: int = 8           # Warm + connecting sessions across all keys
+    GEMINI_POOL_PER_KEY: int = 1            # Warm sessions kept per (language, topic, mode)
+    GEMINI_POOL_IDLE_SECONDS: float = 60.0  # Close warm sessions nobody picked up
+    GEMINI_POOL_PREWARM: list[str] = []     # e.g. ["Spanish|Greetings|Assisted"]
+
+    # Tutor voices and instructions (app/realtime/personas.py)
+    PERSONAS_FILE: str = ""                 # Default: app/realtime/personas.json
+    PERSONAS_RELOAD_SECONDS: float = 5.0    # How often to check the file for changes; 0 = never
+
+    # Upstream audio framing: inbound PCM is coalesced into frames this long
+    AUDIO_FRAME_MS: int = 40
+    AUDIO_FRAME_MAX_DELAY_MS: int = 40      # Flush a partial frame after this long
+
+    # Inbound audio preprocessing (app/realtime/audio.py): resampling,
+    # normalization, voice activity gating and automatic end of turn
+    AUDIO_VAD_ENABLED: bool = True
+    AUDIO_VAD_THRESHOLD_DBFS: float = -45.0
+    AUDIO_VAD_HANGOVER_MS: int = 300
+    AUDIO_PREROLL_MS: int = 200
+    AUDIO_END_OF_TURN_SILENCE_MS: int = 800     # 0 = only the client ends turns
+    AUDIO_TARGET_DBFS: float = -20.0
+    AUDIO_MAX_GAIN_DB: float = 20.0
+
+    # Admission control: realtime sessions one worker accepts before answering "busy"
+    REALTIME_MAX_SESSIONS: int = 100
+    REALTIME_ENDPOINT_LIMITS: dict[str, int] = {}   # Per-endpoint caps, e.g. {"test": 16}
+    REALTIME_RETRY_AFTER_SECONDS: int = 5
+    SHUTDOWN_DRAIN_SECONDS: float = 20.0            # After SIGTERM, time open sessions get to wind down
+    SHUTDOWN_CLOSE_TIMEOUT_SECONDS: float = 5.0     # Then time for closed sockets to finish before cancelling
+
+    # Per-caller limits on the realtime WebSockets (app/realtime/quotas.py), by IP
+    # and by user for sockets opened with ?token=<session token>. 0 = no limit.
+    REALTIME_PER_MINUTE_IP: int = 30            # New sessions
+    REALTIME_SESSIONS_PER_IP: int = 10          # Concurrent
+    REALTIME_SESSIONS_PER_USER: int = 2
+    REALTIME_MINUTES_PER_DAY_IP: int = 600      # Session minutes per UTC day
+    REALTIME_MINUTES_PER_DAY_USER: int = 120
+
+    # Resumable speaking sessions (app/realtime/resumption.py): after an abnormal
+    # disconnect the Gemini session is parked so the client can reattach to it
+    SESSION_RESUME_ENABLED: bool = True
+    SESSION_RESUME_GRACE_SECONDS: float = 30.0
+    SESSION_RESUME_MAX_PARKED: int = 50         # Per worker; each may hold a Gemini connection open
+    SESSION_RESUME_REPLAY_FRAMES: int = 100     # Recent reply audio kept to resend frames lost in flight
+    SESSION_RESUME_TAKEOVER_SECONDS: float = 2.0  # Reconnect beat the drop: wait this long for the old socket to let go
+
+    # Bounded queues between realtime relay stages (see app/realtime/queues.py).
+    # Policies: "block", "drop_oldest", "drop_newest". Max age 0 = never stale.
+    RELAY_UPSTREAM_QUEUE_SIZE: int = 50         # ~2s of 40 ms frames
+    RELAY_UPSTREAM_POLICY: str = "drop_oldest"
+    RELAY_UPSTREAM_MAX_AGE_MS: int = 1000
+    RELAY_DOWNSTREAM_QUEUE_SIZE: int = 750      # Holds the part of a reply that pacing hasn't sent yet (~30s)
+    RELAY_DOWNSTREAM_POLICY: str = "drop_oldest"
+    RELAY_DOWNSTREAM_MAX_AGE_MS: int = 0
+    RELAY_TRANSCODE_QUEUE_SIZE: int = 100       # Compressed input; always "block" (can't drop container bytes)
+    RELAY_MAX_BAD_MESSAGES: int = 10            # Undecodable client messages skipped before the socket is closed (1008)
+
+    # Model audio to the client (app/realtime/outbound.py): gathered into even
+    # frames, paced to real time, and Opus-encoded for clients that ask for it
+    OUTBOUND_FRAME_MS: int = 40                 # Also the Opus frame size: 40, 80 or 120
+    OUTBOUND_LEAD_MS: int = 300                 # How far ahead of playback the client is sent
+    OUTBOUND_PACING_ENABLED: bool = True
+    OUTBOUND_OPUS_ENABLED: bool = True          # Needs ffmpeg with libopus
+    OUTBOUND_OPUS_BITRATE_KBPS: int = 24
+    OUTBOUND_OPUS_MAX_ENCODERS: int = 16        # Per worker, ~2% of a core each; beyond that sessions get PCM
+    OUTBOUND_OPUS_WARM: int = 0                 # Pre-spawned idle encoders
+    OUTBOUND_OPUS_ACQUIRE_TIMEOUT_SECONDS: float = 0.5
+
+    # Pooled ffmpeg decoders for the WebM test router
+    TRANSCODER_MAX_WORKERS: int = 32            # Concurrent decoders per worker process
+    TRANSCODER_WARM: int = 2                    # Pre-spawned idle decoders
+    TRANSCODER_ACQUIRE_TIMEOUT_SECONDS: float = 2.0
+
+    # Session tokens issued by /auth/login. Set SESSION_SECRET in production,
+    # otherwise every worker signs with its own random key.
+    SESSION_SECRET: str = ""
+    SESSION_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Password hashing (app/core/passwords.py): bcrypt, off the event loop
+    PASSWORD_BCRYPT_ROUNDS: int = 12            # Raising it upgrades stored hashes as users log in
+    PASSWORD_HASH_WORKERS: int = 2              # Threads hashing at once
+    PASSWORD_HASH_MAX_PENDING: int = 64         # Logins waiting beyond this get a 503
+
+    # Request rate limits (app/core/ratelimit.py): token buckets per IP and per
+    # user that refill at the given rate per minute. 0 = no limit.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = "memory"            # Or "package.module:ClassName" for a store shared by all workers
+    RATE_LIMIT_MEMORY_MAX_KEYS: int = 100_000
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # Required behind a proxy (Render): client IP from X-Forwarded-For
+    RATE_LIMIT_FORWARDED_HOPS: int = 1          # Proxies in front that append to X-Forwarded-For
+    RATE_LIMIT_API_PER_MINUTE_IP: int = 600
+    RATE_LIMIT_API_PER_MINUTE_USER: int = 300   # Requests with a bearer session token
+    RATE_LIMIT_LOGIN_PER_MINUTE_IP: int = 20
+    RATE_LIMIT_LOGIN_PER_MINUTE_EMAIL: int = 10
+    RATE_LIMIT_SIGNUP_PER_MINUTE_IP: int = 5
+
+    # In-process cache of user identities used to authenticate session tokens
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL_SECONDS: int = 300
+
+    # Leaderboards: top lists are cached briefly; ranks are always live
+    LEADERBOARD_CACHE_TTL_SECONDS: int = 30
+    LEADERBOARD_MAX_LIMIT: int = 100
+
+    # Offline sync (POST /lessons/sync)
+    LESSON_SYNC_MAX_ITEMS: int = 100
+    LESSON_SYNC_KEYS_KEPT: int = 500            # Idempotency keys remembered per user (> LESSON_SYNC_MAX_ITEMS)
+
+    # Append-only lesson event log (app/core/events.py) and the daily rollups
+    # the /stats endpoints read (app/core/stats.py)
+    LESSON_EVENTS_TIMESERIES: bool = True       # Time-series collection, needs MongoDB 5.0+
+    LESSON_EVENTS_RETENTION_DAYS: int = 0       # 0 = keep forever; only applied when the collection is created
+    LESSON_EVENTS_BATCH_SIZE: int = 500
+    LESSON_EVENTS_FLUSH_SECONDS: float = 1.0
+    LESSON_EVENTS_MAX_BUFFER: int = 10_000      # Held while MongoDB is unreachable; newer events are dropped beyond this
+    STATS_ROLLUP_ENABLED: bool = True           # One worker running the job is enough
+    STATS_ROLLUP_INTERVAL_SECONDS: float = 60.0
+    STATS_MAX_DAYS: int = 90
+
+    # Speaking/chat transcripts: stored in batches off the audio path, then
+    # summarized at session end to pre-fill new_notes (app/realtime/transcripts.py)
+    TRANSCRIPTS_ENABLED: bool = True
+    TRANSCRIPT_BATCH_SIZE: int = 200
+    TRANSCRIPT_FLUSH_SECONDS: float = 2.0
+    TRANSCRIPT_MAX_BUFFER: int = 20_000
+    TRANSCRIPT_SUMMARY_MODEL: str = "gemini-2.5-flash"
+    TRANSCRIPT_SUMMARY_TIMEOUT_SECONDS: float = 8.0   # Then a plain summary is used instead
+    TRANSCRIPT_SUMMARY_MAX_CHARS: int = 12_000        # Most recent transcript sent to the summary model
     
     # Allow extra fields like GOOGLE_API_KEY without validation errors
     model_config = ConfigDict(extra='ignore', env_file=".env")
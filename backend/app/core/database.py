@@ -1,18 +1,104 @@
+import asyncio
+import time
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from beanie import init_beanie
+from app.schemas.leaderboard import LeaderboardEntry
+from app.schemas.stats import DailyLanguageStats, DailyUserStats, LessonEvent
+from app.schemas.transcript import SessionSummary, TranscriptTurn
 from app.schemas.user import User
 from app.core.config import settings
 import certifi
 
-async def init_db():
-    # Create the Async Motor Client
-    client = AsyncIOMotorClient(
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Counts open and checked-out connections across the client's pools.
+    Motor doesn't expose pool usage directly, so we listen to pymongo's
+    CMAP events instead.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_closed(self, event):
+        self.open = max(0, self.open - 1)
+
+    def connection_checked_out(self, event):
+        self.in_use += 1
+
+    def connection_checked_in(self, event):
+        self.in_use = max(0, self.in_use - 1)
+
+    def snapshot(self) -> dict:
+        return {
+            "open": self.open,
+            "in_use": self.in_use,
+            "max_size": settings.MONGODB_MAX_POOL_SIZE,
+        }
+
+
+pool_stats = PoolStats()
+
+# Every Beanie document the app uses; shared with the benchmark harness
+DOCUMENT_MODELS = [
+    User, LeaderboardEntry, LessonEvent, DailyUserStats, DailyLanguageStats, TranscriptTurn, SessionSummary,
+]
+
+
+def create_client() -> AsyncIOMotorClient:
+    # Create the Async Motor Client with the pool tuned from Settings
+    return AsyncIOMotorClient(
         settings.MONGODB_URL,
-        tlsCAFile=certifi.where() # <--- Add this argument
+        tlsCAFile=certifi.where(),
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=[pool_stats],
     )
-    
-    # Initialize Beanie with the database and the Document models
-    await init_beanie(
-        database=client.get_default_database(),
-        document_models=[User]
-    )
\ No newline at end of file
+
+
+async def warm_pool(client: AsyncIOMotorClient) -> None:
+    """
+    Opens `MONGODB_MIN_POOL_SIZE` connections up front by running that many
+    pings concurrently, so the first requests don't pay the TLS handshake.
+    """
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(1, settings.MONGODB_MIN_POOL_SIZE))))
+
+
+async def ping(client: AsyncIOMotorClient) -> float:
+    """Round-trips a ping and returns the latency in milliseconds."""
+    start = time.perf_counter()
+    await client.admin.command("ping")
+    return (time.perf_counter() - start) * 1000
+
+
+async def init_db() -> AsyncIOMotorClient:
+    client = create_client()
+
+    try:
+        # Initialize Beanie with the database and the Document models
+        await init_beanie(
+            database=client.get_default_database(),
+            document_models=DOCUMENT_MODELS
+        )
+        await warm_pool(client)
+    except Exception:
+        client.close()
+        raise
+
+    return client
@@ -0,0 +1,36 @@
+"""
+Append-only lesson event log.
+
+Request handlers call `record_completion()`; `event_writer` (a
+BatchWriter) writes the events to `lesson_events` in batches, so a
+completion costs no database round trip of its own.
+"""
+
+from datetime import date, datetime, time, timezone
+
+from app.core.batching import BatchWriter
+from app.core.config import settings
+from app.schemas.stats import LessonEvent
+
+event_writer = BatchWriter(
+    "lesson events",
+    LessonEvent.get_motor_collection,
+    batch_size=settings.LESSON_EVENTS_BATCH_SIZE,
+    flush_interval=settings.LESSON_EVENTS_FLUSH_SECONDS,
+    max_buffer=settings.LESSON_EVENTS_MAX_BUFFER,
+)
+
+
+def record_completion(user_id, lesson, completed_on: date, source: str = "complete") -> None:
+    """Logs one lesson completion (`lesson` is a LessonDetails)."""
+    event_writer.record({
+        "timestamp": datetime.now(timezone.utc),
+        "language": lesson.language,
+        "user_id": user_id,
+        "lesson_id": lesson.lesson_id,
+        "time_spent": lesson.time_spent,
+        "rating": lesson.rating,
+        # BSON has no date type
+        "completed_on": datetime.combine(completed_on, time.min),
+        "source": source,
+    })
@@ -0,0 +1,23 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from google import genai
+
+
+@lru_cache(maxsize=None)
+def get_client(api_version: str = "v1alpha") -> "genai.Client":
+    """
+    Returns the process-wide Gemini client for an API version.
+
+    Building a client per connection repeats auth setup and throws away the
+    underlying HTTP/TLS state, so every router shares these instead. The
+    SDK itself is imported here on first use, not at startup: importing it
+    takes longer than everything else a worker loads before its first
+    request.
+    """
+    from google import genai
+
+    return genai.Client(api_key=settings.GEMINI_API_KEY, http_options={"api_version": api_version})
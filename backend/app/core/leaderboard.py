@@ -0,0 +1,206 @@
+"""
+Precomputed leaderboards.
+
+Rankings live in the `leaderboard` collection (one LeaderboardEntry per user
+per board) instead of being computed from `users`:
+
+- `refresh_rankings()` runs after every lesson completion, from the user
+  document the update already returned, and upserts only that user's
+  entries, never over ones built from a newer version of the document
+- top-N reads walk a `(scope, metric desc, user_id)` index and are cached for
+  a few seconds, so a busy board costs one query per TTL
+- "my rank" is 1 + the number of entries scoring higher, an index-only
+  count (the streak index also holds `last_active_date` for the filter below)
+- `rebuild_leaderboard()` recomputes everything server-side with `$merge`,
+  for the initial backfill or after a manual fix to `users`
+
+Streak boards only count streaks that are still alive (active today or
+yesterday), since a stored streak isn't reset until the user's next lesson.
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.schemas.leaderboard import GLOBAL_SCOPE, LANGUAGE_SCOPE_PREFIX, LeaderboardEntry, LeaderboardRow, language_scope
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("lessons", "streak", "minutes")
+LANGUAGE_METRICS = ("lessons", "streak")
+
+# (scope, metric, limit) -> List[LeaderboardRow]
+top_cache = TTLCache(maxsize=1024, ttl=settings.LEADERBOARD_CACHE_TTL_SECONDS)
+# (scope, metric) -> number of entries on the board
+size_cache = TTLCache(maxsize=1024, ttl=settings.LEADERBOARD_CACHE_TTL_SECONDS)
+
+
+def _streak_alive_since() -> datetime:
+    # Beanie stores `date` fields as midnight datetimes
+    return datetime.combine(date.today() - timedelta(days=1), time.min)
+
+
+def _board_filter(scope: str, metric: str) -> dict:
+    query = {"scope": scope}
+    if metric == "streak":
+        query["last_active_date"] = {"$gte": _streak_alive_since()}
+    return query
+
+
+def _newer_only(fields: dict, version: int) -> list:
+    # An update pipeline that writes `fields` only over an entry built from
+    # an older user document. Streaks can go down, so $max won't do.
+    newer = {"$gt": [version, {"$ifNull": ["$version", -1]}]}
+    return [{"$set": {
+        field: {"$cond": [newer, {"$literal": value}, f"${field}"]}
+        for field, value in {**fields, "version": version}.items()
+    }}]
+
+
+def ranking_updates(user: dict) -> list:
+    """
+    Bulk operations that bring one user's entries in line with their user
+    document (as read with the UserProfile projection): the global entry
+    and one per language studied.
+
+    Completions run their refreshes as concurrent background tasks, so an
+    older document can arrive after a newer one. Every entry records the
+    `version` of the document it was built from and is only overwritten by
+    a newer one.
+    """
+    version = user.get("version", 0)
+    shared = {
+        "first_name": user["first_name"],
+        "streak": user.get("daily_streak", 0),
+        "last_active_date": user.get("last_active_date"),
+        "updated_at": datetime.now(timezone.utc),
+    }
+    operations = [
+        UpdateOne(
+            {"user_id": user["_id"], "scope": GLOBAL_SCOPE},
+            _newer_only({
+                **shared,
+                "lessons": user.get("total_lessons_completed", 0),
+                "minutes": user.get("total_time_spent", 0),
+            }, version),
+            upsert=True,
+        ),
+    ]
+    # The whole document, not just the languages just practised: a newer
+    # version also carries the lessons of completions whose refresh lost
+    for language, progress in (user.get("languages_studied") or {}).items():
+        operations.append(UpdateOne(
+            {"user_id": user["_id"], "scope": language_scope(language)},
+            _newer_only({**shared, "lessons": progress.get("completed_count", 0)}, version),
+            upsert=True,
+        ))
+    return operations
+
+
+async def refresh_rankings(user: dict) -> None:
+    """Upserts one user's leaderboard entries. Runs as a background task after the response is sent."""
+    try:
+        await LeaderboardEntry.get_motor_collection().bulk_write(ranking_updates(user), ordered=False)
+    except Exception as e:
+        # The next completion (or a rebuild) repairs a missed refresh
+        logger.warning("Leaderboard refresh failed for %s: %s", user.get("_id"), e)
+
+
+async def top(scope: str, metric: str, limit: int) -> List[LeaderboardRow]:
+    key = (scope, metric, limit)
+    rows = top_cache.get(key)
+    if rows is not None:
+        return rows
+
+    cursor = (
+        LeaderboardEntry.get_motor_collection()
+        .find(_board_filter(scope, metric), {"user_id": 1, "first_name": 1, metric: 1})
+        .sort([(metric, -1), ("user_id", 1)])
+        .limit(limit)
+    )
+    rows = []
+    async for doc in cursor:
+        value = doc.get(metric, 0)
+        # Competition ranking: ties share a rank, the next rank skips
+        rank = rows[-1].rank if rows and rows[-1].value == value else len(rows) + 1
+        rows.append(LeaderboardRow(rank=rank, user_id=str(doc["user_id"]), first_name=doc["first_name"], value=value))
+
+    top_cache.set(key, rows)
+    return rows
+
+
+async def board_size(scope: str, metric: str) -> int:
+    """Entries ranked on a board: on streak boards, only live streaks."""
+    key = (scope, metric)
+    size = size_cache.get(key)
+    if size is None:
+        size = await LeaderboardEntry.get_motor_collection().count_documents(_board_filter(scope, metric))
+        size_cache.set(key, size)
+    return size
+
+
+async def rank_of(user_id, scope: str, metric: str) -> Optional[tuple]:
+    """Returns (rank, value) for a user on a board, or None if they aren't on it."""
+    collection = LeaderboardEntry.get_motor_collection()
+    query = _board_filter(scope, metric)
+    entry = await collection.find_one({**query, "user_id": user_id}, {metric: 1})
+    if entry is None:
+        return None
+
+    value = entry.get(metric, 0)
+    above = await collection.count_documents({**query, metric: {"$gt": value}})
+    return above + 1, value
+
+
+async def rebuild_leaderboard(users_collection) -> None:
+    """Recomputes every entry from `users` inside MongoDB (no documents pass through Python)."""
+    now = datetime.now(timezone.utc)
+    target = {
+        "into": LeaderboardEntry.Settings.name,
+        "on": ["user_id", "scope"],
+        "whenMatched": "replace",
+        "whenNotMatched": "insert",
+    }
+    shared = {
+        "_id": 0,
+        "user_id": "$_id",
+        "first_name": 1,
+        "streak": {"$ifNull": ["$daily_streak", 0]},
+        "last_active_date": 1,
+        "version": {"$ifNull": ["$version", 0]},
+        "updated_at": {"$literal": now},
+    }
+
+    # Entries from before language scopes were namespaced
+    await LeaderboardEntry.get_motor_collection().delete_many(
+        {"scope": {"$ne": GLOBAL_SCOPE, "$not": {"$regex": f"^{LANGUAGE_SCOPE_PREFIX}"}}}
+    )
+
+    await users_collection.aggregate([
+        {"$project": {
+            **shared,
+            "scope": {"$literal": GLOBAL_SCOPE},
+            "lessons": {"$ifNull": ["$total_lessons_completed", 0]},
+            "minutes": {"$ifNull": ["$total_time_spent", 0]},
+        }},
+        {"$merge": target},
+    ]).to_list(None)
+
+    await users_collection.aggregate([
+        {"$match": {"languages_studied": {"$type": "object"}}},
+        {"$project": {**shared, "progress": {"$objectToArray": "$languages_studied"}}},
+        {"$unwind": "$progress"},
+        {"$project": {
+            "_id": 0, "user_id": 1, "first_name": 1, "streak": 1, "last_active_date": 1, "version": 1, "updated_at": 1,
+            "scope": {"$concat": [LANGUAGE_SCOPE_PREFIX, "$progress.k"]},
+            "lessons": {"$size": {"$ifNull": ["$progress.v.completed_lessons", []]}},
+        }},
+        {"$merge": target},
+    ]).to_list(None)
+
+    top_cache.clear()
+    size_cache.clear()
@@ -0,0 +1,230 @@
+"""
+Minimal Prometheus-compatible metrics.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+text exposition format by `registry.render()` for the /metrics endpoint.
+Everything is updated from the event loop, so there is no locking. Values
+owned by other components (caches, pools) are read at scrape time through
+`CallbackGauge`, so the hot paths don't pay for them.
+"""
+
+import abc
+import bisect
+import math
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+
+    def labels(self, *values: str, **kwargs: str):
+        key = tuple(str(kwargs[n]) for n in self.labelnames) if kwargs else tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """A fresh value for one combination of label values."""
+
+    @abc.abstractmethod
+    def _samples(self) -> Iterable[str]:
+        """The metric's sample lines, without HELP and TYPE."""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for key, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = sorted(buckets) + [math.inf]
+
+    def _new_child(self):
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self):
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(child.bounds, child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(child.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {child.count}"
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose samples come from `callback()` -> {label values: value} at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], callback: Callable[[], Dict[LabelValues, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        raise TypeError(f"{self.name}: a callback gauge's values come from its callback, not from labels()")
+
+    def _samples(self):
+        try:
+            values = self.callback()
+        except Exception:
+            return
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback_gauge(self, name: str, documentation: str, labelnames: Sequence[str], callback: Callable[[], Dict[LabelValues, float]]) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, labelnames, callback))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Stats of components that keep their own counters (caches, pools), read at
+# scrape time by /metrics. Optional routers register theirs when loaded.
+components: Dict[str, Callable[[], dict]] = {}
+
+
+def register_component(name: str, stats: Callable[[], dict]) -> None:
+    components[name] = stats
+
+# ---------- Realtime sessions ----------
+
+ACTIVE_SESSIONS = registry.gauge("realtime_active_sessions", "Open realtime WebSocket sessions", ["endpoint"])
+SESSIONS_TOTAL = registry.counter("realtime_sessions_total", "Realtime sessions started", ["endpoint"])
+SESSION_ERRORS = registry.counter("realtime_errors_total", "Errors in realtime relay stages", ["endpoint", "stage"])
+TIME_TO_FIRST_AUDIO = registry.histogram(
+    "realtime_time_to_first_audio_seconds",
+    "Session start to first model audio sent to the client",
+    ["endpoint"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0),
+)
+TURN_LATENCY = registry.histogram(
+    "realtime_turn_latency_seconds",
+    "End of user turn to first model audio sent to the client",
+    ["endpoint"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0),
+)
+AUDIO_BYTES = registry.counter("realtime_audio_bytes_total", "Audio bytes relayed", ["endpoint", "direction"])
+AUDIO_FRAMES = registry.counter("realtime_audio_frames_total", "Audio frames relayed", ["endpoint", "direction"])
+QUEUE_DELAY = registry.histogram(
+    "realtime_queue_delay_seconds",
+    "Time items wait in a relay queue",
+    ["endpoint", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+QUEUE_DROPPED = registry.counter("realtime_queue_dropped_total", "Relay queue items dropped on overflow or staleness", ["endpoint", "stage", "reason"])
+QUEUE_HIGH_WATER = registry.histogram(
+    "realtime_queue_high_water_mark",
+    "Per-session peak relay queue depth",
+    ["endpoint", "stage"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500),
+)
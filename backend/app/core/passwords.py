@@ -0,0 +1,142 @@
+"""
+Password hashing.
+
+Passwords are stored as bcrypt hashes with cost PASSWORD_BCRYPT_ROUNDS. A
+check takes a few hundred milliseconds of CPU on purpose, so it runs in a
+small dedicated thread pool. bcrypt releases the GIL while it hashes, so
+the event loop that relays live audio keeps running. At most
+PASSWORD_HASH_MAX_PENDING checks wait for the pool. Beyond that, callers get
+`PasswordHasherBusy` instead of queueing without end.
+
+bcrypt reads only the first 72 bytes of its input. The password is first
+reduced to a base64 SHA-256 digest (44 bytes), so long passphrases keep all
+their entropy.
+
+Accounts created before hashing stored the password as sent. Clients have
+always sent it in the `password_hash` field. Such a record is compared in
+constant time and, on a match, replaced with a hash. A hash made with a
+different cost is also replaced on a match. See `verify`.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+from app.core.config import settings
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _prehash(password: str) -> bytes:
+    return base64.b64encode(hashlib.sha256(password.encode()).digest())
+
+
+def is_hashed(stored: str) -> bool:
+    return stored.startswith(("$2a$", "$2b$", "$2y$"))
+
+
+def _rounds(stored: str) -> Optional[int]:
+    # "$2b$12$<salt+hash>"; None for anything else, which gets re-hashed
+    try:
+        return int(stored.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = 12, workers: int = 2, max_pending: int = 64):
+        """
+        Args:
+            rounds: bcrypt cost factor; each step doubles the work
+            workers: Hashes computed at once
+            max_pending: Hashes running or waiting before callers are turned away
+        """
+        self.rounds = rounds
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self._dummy: Optional[str] = None
+
+        self.hashed = 0
+        self.verified = 0
+        self.migrated = 0
+        self.rejected = 0
+
+    def hash_sync(self, password: str) -> str:
+        return bcrypt.hashpw(_prehash(password), bcrypt.gensalt(self.rounds)).decode()
+
+    @staticmethod
+    def _check_sync(password: str, stored: str) -> bool:
+        try:
+            return bcrypt.checkpw(_prehash(password), stored.encode())
+        except ValueError:
+            return False    # Malformed hash: nothing matches it
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy(f"{self._pending} password checks already pending")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(self.hash_sync, password)
+        self.hashed += 1
+        return hashed
+
+    async def verify(self, password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Checks `password` against the stored value (None for an unknown
+        account, which costs as much as a wrong password). Returns whether it
+        matches, and the hash to store in its place when the record should be
+        upgraded.
+        """
+        self.verified += 1
+        if stored is None:
+            if self._dummy is None:
+                self._dummy = await self._run(self.hash_sync, secrets.token_urlsafe())
+            await self._run(self._check_sync, password, self._dummy)
+            return False, None
+
+        if not is_hashed(stored):
+            # Stored before hashing: compare as is, then upgrade
+            matches = hmac.compare_digest(stored.encode(), password.encode())
+        else:
+            matches = await self._run(self._check_sync, password, stored)
+            if matches and _rounds(stored) == self.rounds:
+                return True, None
+
+        if not matches:
+            return False, None
+        self.migrated += 1
+        return True, await self.hash(password)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "migrated": self.migrated,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
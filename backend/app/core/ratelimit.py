@@ -0,0 +1,194 @@
+"""
+Rate limits and quotas.
+
+Two kinds of state are kept in a `RateLimitStore`:
+
+- token buckets for request rates (logins, signups, API calls, new realtime
+  sessions). A bucket holds a minute's worth of requests and refills
+  continuously, so short bursts pass and sustained loops are cut to the rate.
+- counters with an expiry, for concurrent realtime sessions and audio
+  minutes per UTC day (app/realtime/quotas.py)
+
+Per-IP limits need the real client address. Behind a reverse proxy or load
+balancer (Render, nginx, ...) every request arrives from the proxy, so set
+RATE_LIMIT_TRUST_FORWARDED_FOR, or the per-IP limits become one limit for
+the whole service. Leave it off when clients connect directly: then the
+header is theirs to forge.
+
+The default `MemoryRateLimitStore` lives in this worker's memory. A check is
+a dict lookup and a little arithmetic, and nothing is awaited. With it,
+every worker enforces the limits on its own, so the effective limits scale
+with the worker count. To share limits across workers, implement
+`RateLimitStore` on a shared store and set
+RATE_LIMIT_STORE="package.module:ClassName". In Redis, for example, `take`
+is a short Lua script over a hash and `incr` is INCRBYFLOAT plus EXPIRE.
+"""
+
+import importlib
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Rate:
+    per_minute: float   # 0 = unlimited
+
+    @property
+    def capacity(self) -> float:
+        return self.per_minute
+
+    @property
+    def per_second(self) -> float:
+        return self.per_minute / 60
+
+
+class RateLimited(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"{reason}: retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RateLimitStore(ABC):
+    @abstractmethod
+    async def take(self, key: str, rate: Rate, cost: float = 1.0) -> float:
+        """
+        Removes `cost` tokens from the bucket at `key` (created full). Returns
+        0.0 if they were there, otherwise the seconds until they will be, in
+        which case nothing is removed.
+        """
+
+    @abstractmethod
+    async def incr(self, key: str, amount: float, ttl: float) -> float:
+        """Adds `amount` (may be negative) to the counter at `key` and returns the new value.
+        A new counter expires `ttl` seconds after it was created."""
+
+    @abstractmethod
+    async def get(self, key: str) -> float:
+        """The counter at `key`, 0.0 if it doesn't exist or expired."""
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    def __init__(self, max_keys: int = 100_000):
+        """
+        Args:
+            max_keys: Buckets kept before the least recently used ones are
+                dropped; a dropped bucket simply starts full again
+        """
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated_at)
+        self._counters: Dict[str, Tuple[float, float]] = {}                   # key -> (value, expires_at)
+        self._next_prune = 0.0
+
+    async def take(self, key: str, rate: Rate, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (rate.capacity, now))
+        tokens = min(rate.capacity, tokens + (now - updated_at) * rate.per_second)
+
+        if tokens >= cost:
+            wait = 0.0
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate.per_second
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def incr(self, key: str, amount: float, ttl: float) -> float:
+        now = time.monotonic()
+        self._prune(now)
+        value, expires_at = self._counters.get(key, (0.0, now + ttl))
+        if expires_at <= now:
+            value, expires_at = 0.0, now + ttl
+        value += amount
+        if value <= 0:
+            self._counters.pop(key, None)
+            return 0.0
+        self._counters[key] = (value, expires_at)
+        return value
+
+    async def get(self, key: str) -> float:
+        value, expires_at = self._counters.get(key, (0.0, math.inf))
+        return value if expires_at > time.monotonic() else 0.0
+
+    def _prune(self, now: float) -> None:
+        # Expired counters are dropped at most once a minute
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        for key in [k for k, (_, expires_at) in self._counters.items() if expires_at <= now]:
+            del self._counters[key]
+
+    def stats(self) -> dict:
+        return {"buckets": len(self._buckets), "counters": len(self._counters)}
+
+
+def load_store(spec: str) -> RateLimitStore:
+    """"memory", or "package.module:ClassName" for a store class taking no arguments."""
+    if spec == "memory":
+        return MemoryRateLimitStore(max_keys=settings.RATE_LIMIT_MEMORY_MAX_KEYS)
+    module, _, name = spec.partition(":")
+    store = getattr(importlib.import_module(module), name)()
+    if not isinstance(store, RateLimitStore):
+        raise TypeError(f"RATE_LIMIT_STORE {spec!r} is not a RateLimitStore")
+    return store
+
+
+class RateLimiter:
+    def __init__(self, store: RateLimitStore, enabled: bool = True):
+        self.store = store
+        self.enabled = enabled
+        self.allowed = 0
+        self.limited: Dict[str, int] = {}
+
+    async def hit(self, scope: str, key: str, rate: Rate) -> None:
+        """Counts one request against `rate` for `key`. Raises RateLimited when over it."""
+        if not self.enabled or rate.per_minute <= 0:
+            return
+        wait = await self.store.take(f"{scope}:{key}", rate)
+        if wait:
+            raise self.reject(scope, wait)
+        self.allowed += 1
+
+    def reject(self, scope: str, retry_after: float) -> RateLimited:
+        """Counts a rejection for `scope` and returns the exception to raise."""
+        self.limited[scope] = self.limited.get(scope, 0) + 1
+        return RateLimited(scope, retry_after)
+
+    def stats(self) -> dict:
+        stats = {"allowed": self.allowed, **{f"limited_{scope}": n for scope, n in self.limited.items()}}
+        if isinstance(self.store, MemoryRateLimitStore):
+            stats.update(self.store.stats())
+        return stats
+
+
+def client_ip(conn: HTTPConnection) -> str:
+    """
+    The caller's IP. Behind a proxy (RATE_LIMIT_TRUST_FORWARDED_FOR) it comes
+    from X-Forwarded-For, taken RATE_LIMIT_FORWARDED_HOPS entries from the
+    right: those are the ones our own proxies appended. Entries further left
+    are whatever the client sent and can't be trusted.
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = [entry.strip() for entry in conn.headers.get("x-forwarded-for", "").split(",") if entry.strip()]
+        if forwarded:
+            return forwarded[max(0, len(forwarded) - settings.RATE_LIMIT_FORWARDED_HOPS)]
+    return conn.client.host if conn.client else "unknown"
+
+
+limiter = RateLimiter(load_store(settings.RATE_LIMIT_STORE), enabled=settings.RATE_LIMIT_ENABLED)
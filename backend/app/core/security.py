@@ -0,0 +1,75 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.schemas.user import SessionIdentity
+
+logger = logging.getLogger(__name__)
+
+if settings.SESSION_SECRET:
+    _SECRET = settings.SESSION_SECRET.encode()
+else:
+    logger.warning("SESSION_SECRET not set - using a per-process key, tokens won't survive restarts or cross workers")
+    _SECRET = secrets.token_bytes(32)
+
+# user_id -> SessionIdentity. Lets protected routes authenticate a token
+# without a MongoDB round trip; writes that change identity fields must
+# call `identity_cache.invalidate(user_id)`.
+identity_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(_SECRET, body.encode("ascii"), hashlib.sha256).digest())
+
+
+def create_session_token(identity: SessionIdentity) -> str:
+    """
+    Issues a signed session token of the form `<payload>.<signature>`.
+
+    The payload is base64url JSON with the user id (`sub`), email and expiry.
+    """
+    payload = {
+        "sub": identity.user_id,
+        "email": identity.email,
+        "exp": int(time.time()) + settings.SESSION_TTL_SECONDS,
+    }
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{body}.{_sign(body)}"
+
+
+def verify_session_token(token: str) -> Optional[dict]:
+    """
+    Returns the token payload if the signature is valid and it hasn't expired,
+    otherwise None. Pure CPU work - no database access.
+    """
+    try:
+        body, signature = token.split(".", 1)
+        # Compared as bytes: compare_digest rejects non-ASCII str with TypeError
+        if not hmac.compare_digest(signature.encode(), _sign(body).encode()):
+            return None
+        payload = json.loads(_b64decode(body))
+    except (ValueError, UnicodeError, TypeError):
+        return None
+
+    if not isinstance(payload, dict) or payload.get("exp", 0) < time.time():
+        return None
+    return payload
+
+
+def identity_from_user(user) -> SessionIdentity:
+    return SessionIdentity(user_id=str(user.id), email=user.email, first_name=user.first_name)
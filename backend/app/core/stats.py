@@ -0,0 +1,218 @@
+"""
+Daily rollups of the lesson event log, and the reads behind /stats.
+
+`rollup_days()` recomputes whole days inside MongoDB. A lesson counts on
+the day the learner completed it (`completed_on`), not the day the server
+heard about it, so an offline sync lands on the days it was practised:
+
+1. events of the day -> `$group` by (user, language) -> DailyUserStats
+2. those rows -> `$group` by language -> DailyLanguageStats
+
+Both steps `$merge` with "replace", so a day can be recomputed any number
+of times (by several workers, or after a crash halfway through) without
+double counting. `run_rollups()` redoes, every STATS_ROLLUP_INTERVAL_SECONDS,
+today, yesterday and every earlier day that events recorded since yesterday
+were completed on (what offline syncs added to).
+
+The stats endpoints only read the rollup collections, never `users` or the
+raw events; global series are cached for one rollup interval.
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.schemas.stats import (
+    DailyLanguageStats,
+    DailyStatsRow,
+    DailyUserStats,
+    LanguageStatsRow,
+    LessonEvent,
+    UserDayRow,
+)
+
+logger = logging.getLogger(__name__)
+
+# (since, language) -> List[DailyStatsRow], since -> List[LanguageStatsRow]
+daily_cache = TTLCache(maxsize=1024, ttl=settings.STATS_ROLLUP_INTERVAL_SECONDS)
+language_cache = TTLCache(maxsize=256, ttl=settings.STATS_ROLLUP_INTERVAL_SECONDS)
+
+_TOTALS = {
+    "lessons": {"$sum": "$lessons"},
+    "minutes": {"$sum": "$minutes"},
+    "rating_sum": {"$sum": "$rating_sum"},
+    "rating_count": {"$sum": "$rating_count"},
+}
+
+
+def _midnight(day: date) -> datetime:
+    # Beanie stores `date` fields as midnight datetimes (UTC)
+    return datetime.combine(day, time.min)
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _average(doc: dict) -> Optional[float]:
+    return round(doc["rating_sum"] / doc["rating_count"], 2) if doc.get("rating_count") else None
+
+
+async def rollup_days(days: Iterable[date]) -> None:
+    """Recomputes DailyUserStats and DailyLanguageStats for the given days (`completed_on`)."""
+    days = sorted(set(days))
+    if not days:
+        return
+    events = LessonEvent.get_motor_collection()
+
+    for day in days:
+        start = _midnight(day)
+        await events.aggregate([
+            {"$match": {
+                "completed_on": start,
+                # Nothing completed that day was recorded before the day
+                # before (clients a timezone ahead), so buckets older than
+                # that are skipped by their time range
+                "timestamp": {"$gte": start - timedelta(days=1)},
+            }},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "language": "$language"},
+                "lessons": {"$sum": 1},
+                "minutes": {"$sum": "$time_spent"},
+                "rating_sum": {"$sum": "$rating"},
+                "rating_count": {"$sum": {"$cond": [{"$gt": ["$rating", 0]}, 1, 0]}},
+            }},
+            {"$project": {
+                "_id": 0,
+                "day": {"$literal": start},
+                "user_id": "$_id.user_id",
+                "language": "$_id.language",
+                "lessons": 1, "minutes": 1, "rating_sum": 1, "rating_count": 1,
+            }},
+            {"$merge": {
+                "into": DailyUserStats.Settings.name,
+                "on": ["user_id", "day", "language"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]).to_list(None)
+
+    await DailyUserStats.get_motor_collection().aggregate([
+        {"$match": {"day": {"$in": [_midnight(day) for day in days]}}},
+        {"$group": {"_id": {"day": "$day", "language": "$language"}, **_TOTALS, "learners": {"$sum": 1}}},
+        {"$project": {
+            "_id": 0,
+            "day": "$_id.day",
+            "language": "$_id.language",
+            "lessons": 1, "minutes": 1, "rating_sum": 1, "rating_count": 1, "learners": 1,
+        }},
+        {"$merge": {
+            "into": DailyLanguageStats.Settings.name,
+            "on": ["day", "language"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]).to_list(None)
+
+    daily_cache.clear()
+    language_cache.clear()
+
+
+async def touched_days(since: date) -> List[date]:
+    """
+    The `completed_on` days of events recorded since `since`: today's
+    completions, plus whatever earlier days offline syncs reached back to.
+    Days older than STATS_MAX_DAYS are never served, so they're left to m003.
+    """
+    oldest = _midnight(utc_today() - timedelta(days=settings.STATS_MAX_DAYS))
+    days = await LessonEvent.get_motor_collection().distinct(
+        "completed_on", {"timestamp": {"$gte": _midnight(since)}, "completed_on": {"$gte": oldest}},
+    )
+    return [day.date() for day in days]
+
+
+async def run_rollups(interval: float) -> None:
+    """Background loop: rolls up today, yesterday and the days recent syncs touched every `interval` seconds."""
+    while True:
+        today = utc_today()
+        yesterday = today - timedelta(days=1)
+        try:
+            await rollup_days([yesterday, today, *await touched_days(yesterday)])
+        except Exception as e:
+            # e.g. the database isn't connected yet; the next pass redoes the same days
+            logger.warning("Stats rollup failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+async def daily_series(since: date, language: Optional[str] = None) -> List[DailyStatsRow]:
+    key = (since, language)
+    rows = daily_cache.get(key)
+    if rows is not None:
+        return rows
+
+    collection = DailyLanguageStats.get_motor_collection()
+    if language is not None:
+        cursor = collection.find({"language": language, "day": {"$gte": _midnight(since)}}).sort("day", 1)
+    else:
+        cursor = collection.aggregate([
+            {"$match": {"day": {"$gte": _midnight(since)}}},
+            {"$group": {"_id": "$day", **_TOTALS, "learners": {"$sum": "$learners"}}},
+            {"$sort": {"_id": 1}},
+        ])
+
+    rows = [
+        DailyStatsRow(
+            day=doc.get("day", doc["_id"]),
+            lessons=doc["lessons"],
+            minutes=doc["minutes"],
+            average_rating=_average(doc),
+            learners=doc["learners"],
+        )
+        async for doc in cursor
+    ]
+    daily_cache.set(key, rows)
+    return rows
+
+
+async def language_totals(since: date) -> List[LanguageStatsRow]:
+    rows = language_cache.get(since)
+    if rows is not None:
+        return rows
+
+    cursor = DailyLanguageStats.get_motor_collection().aggregate([
+        {"$match": {"day": {"$gte": _midnight(since)}}},
+        {"$group": {"_id": "$language", **_TOTALS, "learner_days": {"$sum": "$learners"}}},
+        {"$sort": {"lessons": -1, "_id": 1}},
+    ])
+    rows = [
+        LanguageStatsRow(
+            language=doc["_id"],
+            lessons=doc["lessons"],
+            minutes=doc["minutes"],
+            average_rating=_average(doc),
+            learner_days=doc["learner_days"],
+        )
+        async for doc in cursor
+    ]
+    language_cache.set(since, rows)
+    return rows
+
+
+async def user_days(user_id, since: date) -> List[UserDayRow]:
+    """One user's rollup rows since `since`, oldest first (an index range read)."""
+    cursor = DailyUserStats.get_motor_collection().find(
+        {"user_id": user_id, "day": {"$gte": _midnight(since)}},
+    ).sort([("day", 1), ("language", 1)])
+    return [
+        UserDayRow(
+            day=doc["day"],
+            language=doc["language"],
+            lessons=doc["lessons"],
+            minutes=doc["minutes"],
+            average_rating=_average(doc),
+        )
+        async for doc in cursor
+    ]
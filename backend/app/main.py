@@ -1,32 +1,191 @@
 from contextlib import asynccontextmanager
+from types import ModuleType
+from typing import Callable, Dict
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 # Internal imports
 from app.core.config import settings
+from app.api.deps import rate_limit
 from app.core.database import init_db
-from app.api.routes import health, auth, lessons, chat, test_ws, speaking_realtime
+from app.core.events import event_writer
+from app.core.passwords import password_hasher
+from app.core.logging import configure_logging
+from app.realtime.admission import session_registry
+from app.realtime.outbound import opus_encoders
+from app.realtime.personas import personas
+from app.realtime.resumption import resumption_registry
+from app.realtime.transcripts import transcript_writer
+from app.core.stats import run_rollups
+from app.api.routes import health, metrics
 import sys
 import asyncio
+import importlib
+import logging
+import signal
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# Routers that can be turned off with ROUTERS_DISABLED:
+# name -> (module in app.api.routes, prefix under API_PREFIX, tag, rate limited).
+# The realtime ones are limited per session instead (app/realtime/quotas.py).
+ROUTERS = {
+    "auth": ("auth", "/auth", "Authentication", True),
+    "users": ("users", "/users", "Users", True),
+    "lessons": ("lessons", "/lessons", "Lessons", True),
+    "leaderboard": ("leaderboard", "/leaderboard", "Leaderboard", True),
+    "stats": ("stats", "/stats", "Stats", True),
+    "chat": ("chat", "/chat", "Chat", False),
+    "test": ("test_ws", "/test", "Test WebSocket", False),
+    "speaking": ("speaking_realtime", "/speaking", "Speaking", False),
+    "sessions": ("sessions", "/sessions", "Sessions", True),
+}
+
+
+def load_routers() -> Dict[str, ModuleType]:
+    """Imports the enabled routers' modules; disabled ones are never imported."""
+    unknown = set(settings.ROUTERS_DISABLED) - set(ROUTERS)
+    if unknown:
+        logger.warning("ROUTERS_DISABLED names unknown routers: %s", ", ".join(sorted(unknown)))
+    return {
+        name: importlib.import_module(f"app.api.routes.{module}")
+        for name, (module, *_) in ROUTERS.items()
+        if name not in settings.ROUTERS_DISABLED
+    }
+
 # 1. Define the Lifespan Context Manager
 # This replaces the old "startup" and "shutdown" events.
+async def connect_db_with_retry(app: FastAPI):
+    """
+    Keeps retrying the initial MongoDB connection in the background.
+    Until it succeeds /ready reports 503, so the load balancer doesn't
+    route traffic to this worker.
+    """
+    while True:
+        try:
+            app.state.mongo_client = await init_db()
+            app.state.db_ready = True
+            logger.info("Startup: Connected to MongoDB via Beanie (after retry)")
+            return
+        except Exception as e:
+            logger.error("Startup Error: Could not connect to DB - %s. Retrying in %ss", e, settings.MONGODB_CONNECT_RETRY_SECONDS)
+            await asyncio.sleep(settings.MONGODB_CONNECT_RETRY_SECONDS)
+
+
+def drain_on_sigterm() -> Callable[[], None]:
+    """
+    Wraps the server's SIGTERM handler so realtime sessions are drained first.
+
+    Uvicorn stops serving as soon as it sees SIGTERM, which would cut every
+    open conversation mid-sentence during a rolling deploy. Instead the
+    registry stops admitting, warns clients and lets sessions wind down for
+    up to SHUTDOWN_DRAIN_SECONDS; only then is the original handler called.
+    A second SIGTERM skips the wait. Returns a function that restores the
+    original handler.
+    """
+    loop = asyncio.get_running_loop()
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def forward(signum, frame):
+        signal.signal(signal.SIGTERM, previous)
+        if callable(previous):
+            previous(signum, frame)
+        else:
+            signal.raise_signal(signum)
+
+    async def drain_then_exit(signum, frame):
+        try:
+            await session_registry.drain(settings.SHUTDOWN_DRAIN_SECONDS, settings.SHUTDOWN_CLOSE_TIMEOUT_SECONDS)
+        finally:
+            forward(signum, frame)
+
+    def on_sigterm(signum, frame):
+        if session_registry.draining:
+            forward(signum, frame)
+            return
+        logger.warning("SIGTERM: draining realtime sessions before shutdown")
+        loop.call_soon_threadsafe(lambda: loop.create_task(drain_then_exit(signum, frame)))
+
+    try:
+        signal.signal(signal.SIGTERM, on_sigterm)
+    except ValueError:
+        return lambda: None  # Not the main thread (e.g. TestClient): nothing to wrap
+
+    def restore():
+        if signal.getsignal(signal.SIGTERM) is on_sigterm:
+            signal.signal(signal.SIGTERM, previous)
+    return restore
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup Logic ---
+    app.state.mongo_client = None
+    app.state.db_ready = False
+    db_retry_task = None
     try:
-        await init_db()
-        print("Startup: Connected to MongoDB via Beanie!")
+        # Connects, initializes Beanie and warms the connection pool
+        app.state.mongo_client = await init_db()
+        app.state.db_ready = True
+        logger.info("Startup: Connected to MongoDB via Beanie!")
     except Exception as e:
-        print(f"Startup Error: Could not connect to DB - {e}")
+        logger.error("Startup Error: Could not connect to DB - %s", e)
+        db_retry_task = asyncio.create_task(connect_db_with_retry(app))
+
+    # Check the tutor personas (fails fast on a broken file) and build their
+    # configs once serving; then start pre-connecting Gemini Live sessions
+    # for the configured keys. Only for the routers that are enabled.
+    routers = app.state.routers
+    speaking, test = routers.get("speaking"), routers.get("test")
+    persona_tasks = []
+    if speaking or "chat" in routers:
+        personas.check()
+        persona_tasks.append(asyncio.create_task(personas.warm()))
+        if settings.PERSONAS_RELOAD_SECONDS > 0:
+            persona_tasks.append(asyncio.create_task(personas.watch()))
+    if speaking:
+        speaking.prewarm_session_pool()
+    if test:
+        test.transcoder_pool.prewarm()
+    if speaking or test or "chat" in routers:
+        opus_encoders.prewarm()
+    restore_sigterm = drain_on_sigterm()
+
+    # Batched writers (lesson events, transcripts) and the rollups the /stats endpoints read
+    event_writer.start()
+    transcript_writer.start()
+    rollup_task = asyncio.create_task(run_rollups(settings.STATS_ROLLUP_INTERVAL_SECONDS)) if settings.STATS_ROLLUP_ENABLED else None
     
     yield # The application runs while the code halts here
     
-    # --- Shutdown Logic (Optional) ---
-    print("Shutdown: Closing connections...")
+    # --- Shutdown Logic ---
+    # Realtime sessions first (each closes its own upstream session), then
+    # parked ones and the pools they drew from, then the database
+    logger.info("Shutdown: Closing connections...")
+    restore_sigterm()
+    await session_registry.drain(grace=0, close_timeout=settings.SHUTDOWN_CLOSE_TIMEOUT_SECONDS)
+    await resumption_registry.close()
+    if speaking:
+        await speaking.session_pool.close()
+    if test:
+        await test.transcoder_pool.close()
+    await opus_encoders.close()
+    if rollup_task is not None:
+        rollup_task.cancel()
+    for task in persona_tasks:
+        task.cancel()
+    await event_writer.close()
+    await transcript_writer.close()
+    password_hasher.close()
+    if db_retry_task is not None:
+        db_retry_task.cancel()
+    if app.state.mongo_client is not None:
+        app.state.db_ready = False
+        app.state.mongo_client.close()
 
 # 2. Define the Application Factory
 def get_application() -> FastAPI:
@@ -46,15 +205,24 @@ def get_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Session-Token", "ETag"],
     )
 
-    # Register Routers
+    # Register Routers. The HTTP API shares one request rate limit per IP and
+    # per user; health checks, metrics and the WebSockets (limited per session
+    # in app/realtime/quotas.py) are left out.
+    api_limit = [rate_limit("api", settings.RATE_LIMIT_API_PER_MINUTE_IP, settings.RATE_LIMIT_API_PER_MINUTE_USER)]
     app.include_router(health.router, prefix=settings.API_PREFIX)
-    app.include_router(auth.router, prefix=f"{settings.API_PREFIX}/auth", tags=["Authentication"])
-    app.include_router(lessons.router, prefix=f"{settings.API_PREFIX}/lessons", tags=["Lessons"])
-    app.include_router(chat.router, prefix=f"{settings.API_PREFIX}/chat", tags=["Chat"])
-    app.include_router(test_ws.router, prefix=f"{settings.API_PREFIX}/test", tags=["Test WebSocket"])
-    app.include_router(speaking_realtime.router, prefix=f"{settings.API_PREFIX}/speaking", tags=["Speaking"])
+    app.include_router(metrics.router, tags=["System"])
+    app.state.routers = load_routers()
+    for name, module in app.state.routers.items():
+        _, prefix, tag, limited = ROUTERS[name]
+        app.include_router(
+            module.router,
+            prefix=f"{settings.API_PREFIX}{prefix}",
+            tags=[tag],
+            dependencies=api_limit if limited else None,
+        )
 
     return app
 
@@ -0,0 +1,227 @@
+"""
+Admission control and graceful draining for the realtime WebSockets.
+
+Every realtime session holds a Gemini Live connection (and on the test
+router an ffmpeg process), so each worker only admits a bounded number of
+them. Over capacity, a client gets an immediate
+`{"type": "busy", "retry_after": N}` and a 1013 close instead of a session
+that competes with everyone else for CPU and upstream bandwidth. The same
+answer, with reason "rate_limited", goes to a caller over its own limits
+(app/realtime/quotas.py); one that runs out of daily minutes mid-session
+gets `{"type": "quota_exceeded", "retry_after": N}` and a 1008 close.
+
+On shutdown `drain()` runs in order:
+
+1. stop admitting (new clients get `busy` with reason "draining", /ready 503s)
+2. tell open clients `{"type": "draining", "retry_after": N}` and give them
+   `grace` seconds to finish the current exchange and reconnect elsewhere
+3. close the remaining WebSockets with 1012 (service restart), which ends
+   their relay stages so each handler closes its upstream session itself
+4. cancel any handler that still hasn't finished
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+from app.core.ratelimit import RateLimited
+from app.realtime.quotas import QuotaLease, realtime_quotas, seconds_until_tomorrow
+
+logger = logging.getLogger(__name__)
+
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_SERVICE_RESTART = 1012
+CLOSE_POLICY_VIOLATION = 1008
+
+# Quota work that outlives the call that started it
+_background: set = set()
+
+
+def _spawn(coro) -> None:
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+@dataclass(eq=False)
+class RealtimeSession:
+    endpoint: str
+    websocket: WebSocket
+    task: Optional[asyncio.Task] = None
+    started_at: float = field(default_factory=time.monotonic)
+    lease: Optional[QuotaLease] = None
+    closed_by_server: bool = False  # Ended for its quota: not a drop to resume from
+    _quota_timer: Optional[asyncio.TimerHandle] = field(default=None, repr=False)
+    _registry: Optional["SessionRegistry"] = field(default=None, repr=False)
+
+    def release(self) -> None:
+        if self._registry is not None:
+            self._registry._release(self)
+            self._registry = None
+        if self._quota_timer is not None:
+            self._quota_timer.cancel()
+            self._quota_timer = None
+        if self.lease is not None:
+            _spawn(realtime_quotas.release(self.lease))
+            self.lease = None
+
+    def _start_quota_timer(self) -> None:
+        if self.lease is not None and self.lease.minutes_left != math.inf:
+            self._quota_timer = asyncio.get_running_loop().call_later(
+                max(0.0, self.lease.seconds_left), lambda: _spawn(self._close_for_quota())
+            )
+
+    async def _close_for_quota(self) -> None:
+        # Closing the socket ends the relay stages; the handler cleans up as usual
+        logger.info("Ending %s session: daily minutes used up", self.endpoint)
+        self.closed_by_server = True
+        try:
+            await self.websocket.send_json({"type": "quota_exceeded", "retry_after": round(seconds_until_tomorrow())})
+            await self.websocket.close(code=CLOSE_POLICY_VIOLATION)
+        except Exception:
+            pass  # Client already gone
+
+
+class SessionRegistry:
+    def __init__(self, max_sessions: int, endpoint_limits: Optional[Dict[str, int]] = None, retry_after: int = 5):
+        """
+        Args:
+            max_sessions: Realtime sessions this worker holds across all endpoints
+            endpoint_limits: Lower caps for individual endpoints, e.g. {"test": 16}
+            retry_after: Seconds rejected clients are told to wait
+        """
+        self.max_sessions = max_sessions
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self.retry_after = retry_after
+        self.draining = False
+
+        self._sessions: Dict[str, set] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.rate_limited = 0
+
+    @property
+    def active(self) -> int:
+        return sum(len(s) for s in self._sessions.values())
+
+    def try_admit(self, endpoint: str, websocket: WebSocket) -> Optional[RealtimeSession]:
+        """Registers a session for the calling handler's task, or returns None if the worker is full."""
+        limit = self.endpoint_limits.get(endpoint, self.max_sessions)
+        if self.draining or self.active >= self.max_sessions or len(self._sessions.get(endpoint, ())) >= limit:
+            self.rejected += 1
+            return None
+
+        session = RealtimeSession(endpoint, websocket, task=asyncio.current_task(), _registry=self)
+        self._sessions.setdefault(endpoint, set()).add(session)
+        self._idle.clear()
+        self.admitted += 1
+        return session
+
+    async def admit(self, endpoint: str, websocket: WebSocket) -> Optional[RealtimeSession]:
+        """
+        `try_admit` plus the caller's own limits, for an accepted WebSocket:
+        on rejection the client is sent a busy message and the socket is
+        closed, so the handler just returns.
+        """
+        session = self.try_admit(endpoint, websocket)
+        if session is None:
+            await self._reject(endpoint, websocket, "draining" if self.draining else "capacity", self.retry_after)
+            return None
+
+        # From here on the slot is taken: every way out but success gives it back
+        try:
+            session.lease = await realtime_quotas.acquire(websocket)
+            session._start_quota_timer()
+        except RateLimited as e:
+            session.release()
+            self.admitted -= 1
+            self.rate_limited += 1
+            await self._reject(endpoint, websocket, "rate_limited", int(e.retry_after_header), e.reason)
+            return None
+        except BaseException:
+            session.release()
+            self.admitted -= 1
+            raise
+        return session
+
+    async def _reject(self, endpoint: str, websocket: WebSocket, reason: str, retry_after: int, detail: str = "") -> None:
+        logger.info("Rejected %s session (%s)", endpoint, detail or reason)
+        try:
+            await websocket.send_json({"type": "busy", "reason": reason, "retry_after": retry_after})
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        except Exception:
+            pass  # Client already gone
+
+    def _release(self, session: RealtimeSession) -> None:
+        self._sessions.get(session.endpoint, set()).discard(session)
+        if not self.active:
+            self._idle.set()
+
+    async def drain(self, grace: float, close_timeout: float = 5.0) -> None:
+        """Stops admitting and winds down every open session (see module docstring)."""
+        self.draining = True
+        sessions = self._open_sessions()
+        if not sessions:
+            return
+        logger.warning("Draining %d realtime session(s)", len(sessions))
+
+        for session in sessions:
+            try:
+                await session.websocket.send_json({"type": "draining", "retry_after": self.retry_after})
+            except Exception:
+                pass
+        if await self._wait_idle(grace):
+            return
+
+        # Oldest first, so the longest conversations are wrapped up before newer ones
+        for session in self._open_sessions():
+            try:
+                await session.websocket.close(code=CLOSE_SERVICE_RESTART)
+            except Exception:
+                pass
+        if await self._wait_idle(close_timeout):
+            return
+
+        remaining = [s.task for s in self._open_sessions() if s.task is not None]
+        logger.warning("Cancelling %d realtime session(s) that didn't close", len(remaining))
+        for task in remaining:
+            task.cancel()
+        await asyncio.gather(*remaining, return_exceptions=True)
+
+    def _open_sessions(self):
+        return sorted((s for group in self._sessions.values() for s in group), key=lambda s: s.started_at)
+
+    async def _wait_idle(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "max_sessions": self.max_sessions,
+            "by_endpoint": {endpoint: len(group) for endpoint, group in self._sessions.items()},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited,
+            "draining": self.draining,
+        }
+
+
+# Shared by every realtime router on this worker
+session_registry = SessionRegistry(
+    max_sessions=settings.REALTIME_MAX_SESSIONS,
+    endpoint_limits=settings.REALTIME_ENDPOINT_LIMITS,
+    retry_after=settings.REALTIME_RETRY_AFTER_SECONDS,
+)
@@ -0,0 +1,277 @@
+"""
+Vectorized preprocessing of inbound microphone audio (NumPy).
+
+Runs between the client and the upstream framer:
+
+1. resample to 16 kHz mono s16le (what Gemini Live expects)
+2. energy-based voice activity detection on 20 ms analysis frames, with an
+   adaptive noise floor, a hangover so word gaps aren't cut, and a short
+   pre-roll so onsets aren't clipped. The floor is a low percentile of the
+   last few seconds of levels, speech included: speech has enough gaps
+   that it barely moves the percentile, while steady room noise becomes the
+   floor and is gated.
+3. level normalization of voiced audio towards a target RMS, with a gain cap
+4. automatic end of turn once speech is followed by enough trailing silence
+
+Silence never leaves the process, which cuts upstream bytes and model input,
+and the turn is closed as soon as the user stops talking instead of waiting
+for the client's `end_turn` message. With AUDIO_VAD_ENABLED off only step 1
+runs: audio still has to reach Gemini at 16 kHz.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import settings
+
+TARGET_RATE = 16000
+MIN_INPUT_RATE = 8000
+MAX_INPUT_RATE = 48000
+ANALYSIS_FRAME_MS = 20
+NOISE_WINDOW_MS = 3000          # Levels the noise floor is estimated from
+NOISE_PERCENTILE = 10
+NOISE_RISE_DB_PER_S = 6.0       # The floor falls at once but rises slowly, so speech onsets aren't gated
+_INT16_SCALE = 32768.0
+_EPS = 1e-10
+
+
+@dataclass
+class Processed:
+    audio: bytes            # Voiced, normalized 16 kHz PCM (may be empty)
+    end_of_turn: bool       # Trailing silence closed the current turn
+
+
+def _dbfs(rms: np.ndarray) -> np.ndarray:
+    return 20.0 * np.log10(np.maximum(rms, _EPS))
+
+
+def parse_input_rate(value) -> int:
+    """A client's declared sample rate, as an int in MIN_INPUT_RATE..MAX_INPUT_RATE. Raises ValueError otherwise."""
+    try:
+        rate = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"sample_rate must be a number of Hz, got {value!r}")
+    if not MIN_INPUT_RATE <= rate <= MAX_INPUT_RATE:
+        raise ValueError(f"sample_rate must be between {MIN_INPUT_RATE} and {MAX_INPUT_RATE} Hz")
+    return rate
+
+
+class LinearResampler:
+    """
+    Streaming linear-interpolation resampler that keeps phase across chunks.
+
+    Downsampling first runs a windowed-sinc low-pass just below the output
+    Nyquist frequency. Otherwise content between the two Nyquist frequencies
+    (8-24 kHz from a 48 kHz microphone) would fold back into the speech band.
+    """
+
+    def __init__(self, input_rate: int, output_rate: int = TARGET_RATE, taps: int = 63):
+        self.step = input_rate / output_rate
+        self._pos = 0.0                         # Next output position, in input samples relative to _last
+        self._last = np.zeros(1, dtype=np.float32)
+
+        self._kernel = None
+        if self.step > 1:
+            cutoff = 0.45 / self.step           # Cycles per input sample
+            n = np.arange(taps) - (taps - 1) / 2
+            kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+            self._kernel = (kernel / kernel.sum()).astype(np.float32)
+            self._history = np.zeros(taps - 1, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self._kernel is not None:
+            padded = np.concatenate((self._history, samples))
+            self._history = padded[len(padded) - len(self._history):]
+            samples = np.convolve(padded, self._kernel, mode="valid").astype(np.float32)
+
+        x = np.concatenate((self._last, samples))
+        end = len(x) - 1
+        if end <= self._pos:
+            self._pos -= len(samples)
+            self._last = x[-1:]
+            return np.zeros(0, dtype=np.float32)
+
+        positions = np.arange(self._pos, end, self.step)
+        out = np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+        self._pos = positions[-1] + self.step - end
+        self._last = x[-1:]
+        return out
+
+
+class AudioPreprocessor:
+    def __init__(
+        self,
+        input_rate: int = TARGET_RATE,
+        vad_threshold_dbfs: float = -45.0,
+        noise_margin_db: float = 10.0,
+        hangover_ms: int = 300,
+        preroll_ms: int = 200,
+        end_of_turn_silence_ms: int = 800,
+        target_dbfs: float = -20.0,
+        max_gain_db: float = 20.0,
+        vad_enabled: bool = True,
+    ):
+        """
+        Args:
+            input_rate: Sample rate of the client's s16le mono PCM
+            vad_threshold_dbfs: Frames quieter than this are never speech
+            noise_margin_db: Speech must also be this far above the noise floor
+            hangover_ms: Keep sending this long after the last voiced frame
+            preroll_ms: Silence kept and sent just before speech starts
+            end_of_turn_silence_ms: Trailing silence that ends a turn (0 = off)
+            target_dbfs: RMS level voiced audio is normalized towards
+            max_gain_db: Upper bound on normalization gain
+            vad_enabled: False only resamples: no gating, normalization or end of turn
+        """
+        self.vad_enabled = vad_enabled
+        self.resampler = LinearResampler(input_rate) if input_rate != TARGET_RATE else None
+        self.frame_len = TARGET_RATE * ANALYSIS_FRAME_MS // 1000
+
+        self.vad_threshold_dbfs = vad_threshold_dbfs
+        self.noise_margin_db = noise_margin_db
+        self.hangover_frames = max(0, hangover_ms // ANALYSIS_FRAME_MS)
+        self.end_of_turn_frames = end_of_turn_silence_ms // ANALYSIS_FRAME_MS
+        self.target_rms = 10 ** (target_dbfs / 20)
+        self.max_gain = 10 ** (max_gain_db / 20)
+
+        self._pending = np.zeros(0, dtype=np.float32)   # Samples short of a full analysis frame
+        self._preroll: deque = deque(maxlen=max(1, preroll_ms // ANALYSIS_FRAME_MS))
+        self._noise_floor_db = vad_threshold_dbfs - noise_margin_db
+        self._levels = np.full(NOISE_WINDOW_MS // ANALYSIS_FRAME_MS, np.nan)  # Ring buffer of recent frame levels
+        self._levels_at = 0
+        self._gain = 1.0
+        self._silent_frames = 0
+        self._in_speech = False
+        self._turn_has_speech = False
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_dropped = 0
+        self.turns_detected = 0
+
+    def process(self, pcm: bytes) -> Processed:
+        self.bytes_in += len(pcm)
+        samples = np.frombuffer(pcm[: len(pcm) - len(pcm) % 2], dtype="<i2").astype(np.float32) / _INT16_SCALE
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        if not self.vad_enabled:
+            return self._to_pcm(samples, end_of_turn=False)
+
+        samples = np.concatenate((self._pending, samples))
+        n_frames = len(samples) // self.frame_len
+        self._pending = samples[n_frames * self.frame_len:]
+        if not n_frames:
+            return Processed(b"", False)
+
+        frames = samples[: n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        level_db = _dbfs(rms)
+
+        # Voiced = loud in absolute terms and clearly above the noise floor
+        # (as estimated before this chunk, so a loud onset can't raise its own bar)
+        threshold = max(self.vad_threshold_dbfs, self._noise_floor_db + self.noise_margin_db)
+        voiced = level_db > threshold
+
+        self._track_noise_floor(level_db)
+
+        # The per-frame decision (hangover, pre-roll, end of turn) is a small
+        # state machine over at most a few dozen frames per chunk
+        keep = np.zeros(n_frames, dtype=bool)
+        emitted = []
+        end_of_turn = False
+        for i in range(n_frames):
+            if voiced[i]:
+                if not self._in_speech:
+                    emitted.extend(self._preroll)
+                    self._preroll.clear()
+                self._in_speech = True
+                self._turn_has_speech = True
+                self._silent_frames = 0
+                keep[i] = True
+            else:
+                self._silent_frames += 1
+                if self._in_speech and self._silent_frames <= self.hangover_frames:
+                    keep[i] = True
+                else:
+                    self._in_speech = False
+                    self._preroll.append(frames[i])
+                if (
+                    self.end_of_turn_frames
+                    and self._turn_has_speech
+                    and self._silent_frames >= self.end_of_turn_frames
+                ):
+                    self._turn_has_speech = False
+                    self.turns_detected += 1
+                    end_of_turn = True
+            if keep[i]:
+                emitted.append(frames[i])
+
+        self.frames_dropped += n_frames - int(keep.sum())
+        if not emitted:
+            return Processed(b"", end_of_turn)
+
+        out = np.concatenate(emitted)
+        return self._to_pcm(self._normalize(out, rms[voiced]), end_of_turn)
+
+    def end_turn(self) -> bool:
+        """
+        Called when the client sends its own end_turn. Returns False if the
+        turn was already closed automatically, so it isn't sent twice.
+        """
+        if not self.vad_enabled:
+            return True
+        had_speech = self._turn_has_speech
+        self._turn_has_speech = False
+        return had_speech
+
+    def stats(self) -> dict:
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "frames_dropped": self.frames_dropped,
+            "turns_detected": self.turns_detected,
+            "noise_floor_dbfs": round(self._noise_floor_db, 1),
+        }
+
+    def _track_noise_floor(self, level_db: np.ndarray) -> None:
+        # Minimum statistics: a low percentile of every recent frame, voiced
+        # or not. Learning only from frames below the gate would never let the
+        # floor rise above it, so steady noise louder than the gate would pass.
+        n = len(self._levels)
+        for value in level_db[-n:]:
+            self._levels[self._levels_at] = value
+            self._levels_at = (self._levels_at + 1) % n
+        estimate = float(np.nanpercentile(self._levels, NOISE_PERCENTILE))
+        if estimate < self._noise_floor_db:
+            self._noise_floor_db = estimate
+        else:
+            max_rise = NOISE_RISE_DB_PER_S * len(level_db) * ANALYSIS_FRAME_MS / 1000
+            self._noise_floor_db += min(estimate - self._noise_floor_db, max_rise)
+
+    def _to_pcm(self, audio: np.ndarray, end_of_turn: bool) -> Processed:
+        data = (np.clip(audio, -1.0, 1.0 - 1 / _INT16_SCALE) * _INT16_SCALE).astype("<i2").tobytes()
+        self.bytes_out += len(data)
+        return Processed(data, end_of_turn)
+
+    def _normalize(self, audio: np.ndarray, voiced_rms: np.ndarray) -> np.ndarray:
+        if voiced_rms.size:
+            wanted = min(self.max_gain, self.target_rms / max(float(np.mean(voiced_rms)), _EPS))
+            # Smooth across chunks so the level doesn't pump
+            self._gain += 0.3 * (wanted - self._gain)
+        return audio * self._gain
+
+
+def build_preprocessor(input_rate: int = TARGET_RATE) -> AudioPreprocessor:
+    """Builds a preprocessor from Settings. With AUDIO_VAD_ENABLED off it only resamples."""
+    return AudioPreprocessor(
+        input_rate=input_rate,
+        vad_threshold_dbfs=settings.AUDIO_VAD_THRESHOLD_DBFS,
+        hangover_ms=settings.AUDIO_VAD_HANGOVER_MS,
+        preroll_ms=settings.AUDIO_PREROLL_MS,
+        end_of_turn_silence_ms=settings.AUDIO_END_OF_TURN_SILENCE_MS,
+        target_dbfs=settings.AUDIO_TARGET_DBFS,
+        max_gain_db=settings.AUDIO_MAX_GAIN_DB,
+        vad_enabled=settings.AUDIO_VAD_ENABLED,
+    )
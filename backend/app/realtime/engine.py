@@ -0,0 +1,465 @@
+"""
+The relay every realtime WebSocket router runs on.
+
+The speaking, chat and test routers all stream audio between a browser and
+a Gemini Live session. Each used to carry its own copy of that relay, with
+its own message parsing, error handling and cleanup, so every change to the
+fast path had to be made three times. `RealtimeStream` is the relay, once.
+A session is a pipeline of stages joined by bounded queues
+(app/realtime/queues.py):
+
+    ingest      client socket -> upstream queue. `decode_message` reads
+                binary frames and both JSON envelopes; `decode_raw` takes
+                bare bytes. Routers may plug in their own decoder. A
+                message that doesn't decode gets an error frame and is
+                skipped; after RELAY_MAX_BAD_MESSAGES the socket is closed
+                with 1008.
+    transcode   optional: compressed client audio through a leased ffmpeg
+                decoder (app/realtime/transcode.py) into the upstream queue
+    transform   preprocessing (app/realtime/audio.py), then fixed-duration
+                frames (app/realtime/framing.py). Trailing silence ends the
+                turn.
+    send        frames -> Gemini, with `send_pcm` unless the router passes
+                its own sender
+    receive     Gemini -> downstream queue: reply audio, transcripts,
+                interruptions, ends of turn and resumption handles
+    deliver     downstream queue -> client through `OutboundAudio`
+                (app/realtime/outbound.py): framed, paced, maybe Opus
+
+Routers are thin adapters around it. They accept and admit the socket,
+negotiate the protocol, open the Gemini session their own way (pooled,
+resumed, per connection) and decide what happens once the relay ends, e.g.
+parking a speaking session. Everything the stages share about a session is
+in `StreamState`.
+
+Queue items are (kind, payload) tuples. Upstream: ("audio", pcm) and
+("end_turn", None). Downstream: ("audio", pcm), ("text", message),
+("turn_complete", None) and ("interrupted", None). Only audio is droppable.
+"""
+
+import asyncio
+import base64
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.core.config import settings
+from app.realtime.admission import CLOSE_POLICY_VIOLATION
+from app.realtime.audio import build_preprocessor
+from app.realtime.framing import AudioFramer
+from app.realtime.outbound import OutboundAudio
+from app.realtime.protocol import PROTOCOL_RAW, AudioSender, Frame, parse_message
+from app.realtime.queues import OverflowPolicy, RelayQueue, run_stages
+from app.realtime.resumption import CLOSE_NORMAL
+from app.realtime.telemetry import SessionTelemetry
+from app.realtime.transcode import Transcoder
+from app.realtime.transcripts import TranscriptRecorder
+
+logger = logging.getLogger(__name__)
+
+AUDIO = "audio"
+END_TURN = "end_turn"
+TEXT = "text"
+TURN_COMPLETE = "turn_complete"
+INTERRUPTED = "interrupted"
+
+Item = Tuple[str, Any]
+# Turns one received "websocket.receive" message into upstream items, or
+# returns None when the client asked to close the session
+Decoder = Callable[[dict], Optional[List[Item]]]
+# Delivers one frame of client audio to the Gemini session
+UpstreamSender = Callable[[Any, bytes], Awaitable[None]]
+
+
+def decode_message(message: dict) -> Optional[List[Item]]:
+    """
+    Binary frames (app/realtime/protocol.py) and the JSON messages of both
+    legacy envelopes: {"type": "audio" | "end_turn" | "close", ...} and
+    {"realtime_input": {"media_chunks": [...]}}.
+    """
+    data = parse_message(message)
+    if isinstance(data, Frame):
+        return [(AUDIO, data.payload), (END_TURN, None)] if data.end_of_turn else [(AUDIO, data.payload)]
+
+    kind = data.get("type")
+    if kind == "audio":
+        return [(AUDIO, base64.b64decode(data["data"]))]
+    if kind == "end_turn":
+        return [(END_TURN, None)]
+    if kind == "close":
+        return None
+    if "realtime_input" in data:
+        return [(AUDIO, base64.b64decode(chunk["data"])) for chunk in data["realtime_input"]["media_chunks"]]
+    return []
+
+
+def decode_raw(message: dict) -> Optional[List[Item]]:
+    """Bare audio bytes in binary frames; text frames are ignored."""
+    if message.get("bytes") is not None:
+        return [(AUDIO, message["bytes"])]
+    if message.get("text") is not None:
+        logger.debug("INPUT: Text message: %s", message["text"])
+    return []
+
+
+async def send_pcm(session: Any, frame: bytes) -> None:
+    await session.send(input={"data": frame, "mime_type": "audio/pcm"}, end_of_turn=False)
+
+
+@dataclass
+class StreamState:
+    """What the stages of one session know about it, and what its router reads once the relay ends."""
+    endpoint: str
+    client_closed: bool = False     # Client sent "close"
+    client_dropped: bool = False    # Socket lost without "close": the session may be resumed
+    bad_messages: int = 0           # Client messages that didn't decode
+    upstream_failed: bool = False   # Gemini side failed; a resumed session has to reconnect
+    user_turns: int = 0             # Turns closed upstream, by the client or by silence
+    replies: int = 0                # Turns Gemini completed
+    interruptions: int = 0
+
+
+class RealtimeStream:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        telemetry: SessionTelemetry,
+        sample_rate: int = 16000,
+        decode: Decoder = decode_message,
+        send_audio: UpstreamSender = send_pcm,
+        recorder: Optional[TranscriptRecorder] = None,
+        downstream: Optional[RelayQueue] = None,
+        transcoder: Optional[Transcoder] = None,
+        on_handle: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Args:
+            websocket: The accepted client socket
+            telemetry: The session's metrics; its endpoint names the session in logs
+            sample_rate: Of the PCM the client sends (after transcoding)
+            decode: Ingest stage: client message -> upstream items
+            send_audio: Send stage: one frame -> the Gemini session
+            recorder: Records and forwards transcripts (None: they're ignored)
+            downstream: Replies already read from Gemini, e.g. a resumed session's
+            transcoder: Leased decoder for compressed client audio
+            on_handle: Called with each new Gemini session resumption handle
+        """
+        self.websocket = websocket
+        self.telemetry = telemetry
+        self.state = StreamState(telemetry.endpoint)
+        self.decode = decode
+        self.send_audio = send_audio
+        self.recorder = recorder
+        self.transcoder = transcoder
+        self.on_handle = on_handle
+        self.session: Any = None
+        self.outbound: Optional[OutboundAudio] = None
+
+        # Resamples to 16 kHz, and (with AUDIO_VAD_ENABLED) normalizes and drops
+        # silence before anything goes upstream and ends turns on trailing silence
+        self.preprocessor = build_preprocessor(sample_rate)
+        # Client audio is coalesced into fixed-duration frames before it
+        # goes upstream, instead of one send per browser chunk
+        self.framer = AudioFramer(
+            self._send_frame,
+            frame_ms=settings.AUDIO_FRAME_MS,
+            max_delay_ms=settings.AUDIO_FRAME_MAX_DELAY_MS
+        )
+
+        # Bounded queues decouple the stages, so a slow browser can't stall
+        # the Gemini reader (and vice versa) or grow memory. Compressed input
+        # can't lose bytes, so the transcoder's queue blocks instead.
+        self.transcode_in = None
+        if transcoder is not None:
+            self.transcode_in = RelayQueue(
+                "transcode_in",
+                maxsize=settings.RELAY_TRANSCODE_QUEUE_SIZE,
+                policy=OverflowPolicy.BLOCK,
+                on_delivered=telemetry.queue_observer("transcode_in")
+            )
+        self.upstream = RelayQueue(
+            "upstream",
+            maxsize=settings.RELAY_UPSTREAM_QUEUE_SIZE,
+            policy=settings.RELAY_UPSTREAM_POLICY,
+            max_age_ms=settings.RELAY_UPSTREAM_MAX_AGE_MS,
+            on_delivered=telemetry.queue_observer("upstream")
+        )
+        if downstream is None:
+            downstream = RelayQueue(
+                "downstream",
+                maxsize=settings.RELAY_DOWNSTREAM_QUEUE_SIZE,
+                policy=settings.RELAY_DOWNSTREAM_POLICY,
+                max_age_ms=settings.RELAY_DOWNSTREAM_MAX_AGE_MS,
+                on_delivered=telemetry.queue_observer("downstream")
+            )
+        self.downstream = downstream
+
+    async def open_outbound(
+        self, sender: AudioSender, codec: Optional[str] = None, on_frame: Optional[Callable[[int, bytes], None]] = None
+    ) -> OutboundAudio:
+        """Sets up the deliver stage: model audio framed, paced and encoded as `codec` if possible."""
+        def frame_sent(seq: int, payload: bytes):
+            self.telemetry.downstream(len(payload))
+            if on_frame is not None:
+                on_frame(seq, payload)
+
+        self.outbound = await OutboundAudio.open(sender, codec, on_frame=frame_sent)
+        return self.outbound
+
+    async def run(self, session: Any, replay: Iterable[bytes] = (), extra_stages: Iterable[Awaitable[None]] = ()) -> None:
+        """
+        Relays between the client and `session` until either side goes away.
+
+        Args:
+            session: The connected Gemini Live session
+            replay: Encoded frames to resend before anything new (a resumed session's)
+            extra_stages: Router-specific stages; the first stage to exit ends the relay
+
+        The downstream queue stays open: if the router parks the session, its
+        unsent replies go to the next socket.
+        """
+        self.session = session
+        stages = [
+            self._ingest(), self._send_upstream(), self._watch_framer(), self._receive_upstream(), self._deliver(replay),
+        ]
+        if self.transcoder is not None:
+            stages += [self._feed_transcoder(), self._read_transcoder(), self._watch_transcoder()]
+
+        with self.telemetry:
+            try:
+                await run_stages(*stages, *extra_stages)
+            finally:
+                for queue in self.queues():
+                    if queue is not self.downstream:
+                        queue.close()
+                    self.telemetry.record_queue(queue)
+                logger.info("📊 Session stats", extra={"endpoint": self.state.endpoint, **self.stats()})
+
+    async def send_error(self, message: str) -> None:
+        try:
+            await self.websocket.send_json({"type": "error", "message": message})
+        except Exception:
+            pass  # Client already gone
+
+    async def close(self) -> None:
+        """Releases what the stream leased for the session (its Opus encoder)."""
+        if self.outbound is not None:
+            await self.outbound.close()
+
+    def queues(self) -> List[RelayQueue]:
+        return [queue for queue in (self.transcode_in, self.upstream, self.downstream) if queue is not None]
+
+    def stats(self) -> dict:
+        stats = {queue.name: queue.stats() for queue in self.queues()}
+        stats.update({
+            "turns": {"user": self.state.user_turns, "replies": self.state.replies, "interrupted": self.state.interruptions},
+            "bad_messages": self.state.bad_messages,
+            "framing": self.framer.stats(),
+            "outbound": self.outbound.stats() if self.outbound else None,
+            "preprocessing": self.preprocessor.stats(),
+        })
+        return stats
+
+    # ============================================
+    # STAGES
+    # ============================================
+
+    async def _ingest(self):
+        """Client -> upstream queue (or the transcoder's)"""
+        target = self.upstream if self.transcode_in is None else self.transcode_in
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", CLOSE_NORMAL))
+                try:
+                    items = self.decode(message)
+                except (ValueError, KeyError, TypeError) as e:
+                    # ProtocolError, bad JSON or base64, a missing field: skip this one message
+                    if not await self._bad_message(e):
+                        break
+                    continue
+                if items is None:
+                    self.state.client_closed = True
+                    logger.info("👋 Client requested close (%s)", self.state.endpoint)
+                    break
+                for kind, payload in items:
+                    await target.put((kind, payload), droppable=kind == AUDIO)
+        except WebSocketDisconnect as e:
+            self.state.client_dropped = e.code != CLOSE_NORMAL
+            logger.info("❌ Client disconnected (%s, %s)", self.state.endpoint, e.code)
+        except Exception as e:
+            self.telemetry.error("receive_from_client")
+            logger.warning("❌ Error receiving from client (%s): %s", self.state.endpoint, e)
+
+    async def _feed_transcoder(self):
+        """Transcoder queue -> ffmpeg"""
+        try:
+            async for kind, data in self.transcode_in:
+                if kind == AUDIO:
+                    await self.transcoder.write(data)
+        except Exception as e:
+            self.telemetry.error("feed_transcoder")
+            logger.warning("❌ Error feeding the transcoder: %s", e)
+        finally:
+            self.transcoder.close_input()
+
+    async def _read_transcoder(self):
+        """ffmpeg -> upstream queue"""
+        try:
+            while True:
+                # Takes whatever PCM is ready (up to 16 KB) per wakeup
+                data = await self.transcoder.read()
+                if not data:
+                    logger.debug("FFMPEG: Output stream ended")
+                    break
+                await self.upstream.put((AUDIO, data))
+        except Exception as e:
+            self.telemetry.error("read_transcoder")
+            logger.warning("❌ Error reading the transcoder: %s", e)
+
+    async def _watch_transcoder(self):
+        # ffmpeg runs with -loglevel error, so anything on stderr is an error
+        errors = await self.transcoder.read_errors()
+        if errors:
+            self.telemetry.error("ffmpeg")
+            logger.warning("FFMPEG LOG: %s", errors)
+        # Keep this stage alive: stderr closing alone shouldn't end the session
+        await asyncio.Event().wait()
+
+    async def _send_upstream(self):
+        """Upstream queue -> preprocessing -> frames -> Gemini"""
+        try:
+            async for kind, audio in self.upstream:
+                if kind == AUDIO:
+                    processed = self.preprocessor.process(audio)
+                    await self.framer.push(processed.audio)
+                    if processed.end_of_turn:
+                        await self._close_turn("silence")
+                elif self.preprocessor.end_turn():
+                    # Skip the client's end_turn if silence already closed this turn
+                    await self._close_turn("client")
+        except Exception as e:
+            self.state.upstream_failed = True
+            self.telemetry.error("send_to_gemini")
+            logger.warning("❌ Error sending to Gemini (%s): %s", self.state.endpoint, e)
+        finally:
+            try:
+                await self.framer.close()
+            except Exception:
+                pass  # Upstream already gone; nothing left to flush to
+
+    async def _watch_framer(self):
+        # A partial frame flushed by the framer's timer failed to send
+        error = await self.framer.wait_failed()
+        self.state.upstream_failed = True
+        self.telemetry.error("send_to_gemini")
+        logger.warning("❌ Error sending to Gemini (%s): %s", self.state.endpoint, error)
+
+    async def _receive_upstream(self):
+        """Gemini -> downstream queue"""
+        downstream = self.downstream
+        try:
+            while True:
+                async for response in self.session.receive():
+                    # Kept so the session can reconnect if this connection is lost
+                    update = response.session_resumption_update
+                    if update and update.resumable and update.new_handle and self.on_handle is not None:
+                        self.on_handle(update.new_handle)
+
+                    content = response.server_content
+                    if content is None:
+                        continue
+
+                    if content.interrupted:
+                        # The user talked over the model: the rest of this reply is moot
+                        self.state.interruptions += 1
+                        downstream.drop_pending()
+                        await downstream.put((INTERRUPTED, None), droppable=False)
+
+                    if content.model_turn:
+                        for part in content.model_turn.parts:
+                            if part.inline_data:
+                                await downstream.put((AUDIO, part.inline_data.data))
+                            elif part.text:
+                                logger.debug("Gemini: %s", part.text)
+
+                    # Transcripts ride the same queue so the client sees them in order;
+                    # recording them is an in-memory append (stored in batches later)
+                    if self.recorder is not None:
+                        if content.input_transcription and content.input_transcription.text:
+                            await downstream.put((TEXT, self.recorder.add("user", content.input_transcription.text)), droppable=False)
+                        if content.output_transcription and content.output_transcription.text:
+                            await downstream.put((TEXT, self.recorder.add("tutor", content.output_transcription.text)), droppable=False)
+
+                    if content.turn_complete:
+                        self.state.replies += 1
+                        if self.recorder is not None:
+                            self.recorder.complete_turn()
+                        await downstream.put((TURN_COMPLETE, None), droppable=False)
+
+        except Exception as e:
+            self.state.upstream_failed = True
+            self.telemetry.error("receive_from_gemini")
+            logger.warning("❌ Error receiving from Gemini (%s): %s", self.state.endpoint, e)
+            await self.send_error(str(e))
+
+    async def _deliver(self, replay: Iterable[bytes]):
+        """Downstream queue -> client: audio framed and paced, in the negotiated format"""
+        outbound = self.outbound
+        # Bare-audio clients have no channel for control messages
+        notify = outbound.sender.protocol != PROTOCOL_RAW
+        try:
+            for frame in replay:
+                await outbound.replay(frame)
+            async for kind, payload in self.downstream:
+                if kind == AUDIO:
+                    # Waits here while the client has enough audio ahead
+                    await outbound.send(payload)
+                elif kind == TEXT:
+                    await self.websocket.send_json(payload)
+                elif kind == TURN_COMPLETE:
+                    await outbound.end_turn()
+                elif kind == INTERRUPTED:
+                    await outbound.interrupt()
+                    if notify:
+                        await self.websocket.send_json({"type": "interrupted"})
+        except Exception as e:
+            self.state.client_dropped = True
+            self.telemetry.error("send_to_client")
+            logger.warning("❌ Error sending to client (%s): %s", self.state.endpoint, e)
+
+    # ============================================
+    # HELPERS
+    # ============================================
+
+    async def _bad_message(self, error: Exception) -> bool:
+        """Reports a message that didn't decode. Returns False once the client has sent too many."""
+        self.state.bad_messages += 1
+        self.telemetry.error("bad_message")
+        logger.info("⚠️ Bad message from client (%s): %s", self.state.endpoint, error)
+        if self.state.bad_messages < settings.RELAY_MAX_BAD_MESSAGES:
+            await self.send_error(f"Invalid message: {error}")
+            return True
+
+        logger.warning("❌ Closing %s session after %d bad messages", self.state.endpoint, self.state.bad_messages)
+        await self.send_error("Too many invalid messages")
+        try:
+            await self.websocket.close(code=CLOSE_POLICY_VIOLATION)
+        except Exception:
+            pass  # Client already gone
+        return False
+
+    async def _send_frame(self, frame: bytes):
+        await self.send_audio(self.session, frame)
+        self.telemetry.upstream(len(frame))
+
+    async def _close_turn(self, reason: str):
+        # Flush the partial frame first so the turn ends after all its audio
+        await self.framer.flush()
+        await self.session.send(input=b"", end_of_turn=True)
+        self.state.user_turns += 1
+        self.telemetry.end_of_turn()
+        logger.debug("🎤 User finished speaking (%s)", reason)
@@ -0,0 +1,134 @@
+"""
+Coalesces inbound PCM into fixed-duration frames before it goes upstream.
+
+Browsers deliver microphone audio in many small, irregular chunks. Sending
+each one with `session.send` pays the per-call overhead of the upstream
+socket many times a second. `AudioFramer` buffers the audio and emits
+frames of exactly `frame_ms` milliseconds. Whatever is left over is flushed
+at end of turn, or by a timer once it has waited `max_delay_ms`, so
+framing never holds audio back for more than about one frame. The timer
+only runs while a partial frame is waiting, and a send it makes that fails
+is raised by the next `push()`/`flush()` and by `wait_failed()`, so the
+session sees it even while the client is silent.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class AudioFramer:
+    def __init__(
+        self,
+        send: Callable[[bytes], Awaitable[None]],
+        frame_ms: int = 40,
+        sample_rate: int = 16000,
+        sample_width: int = 2,
+        channels: int = 1,
+        max_delay_ms: Optional[int] = None,
+    ):
+        """
+        Args:
+            send: Coroutine that delivers one frame upstream
+            frame_ms: Target frame duration
+            sample_rate, sample_width, channels: PCM format of the input
+            max_delay_ms: Longest a partial frame may wait (defaults to frame_ms)
+        """
+        self._send = send
+        self.frame_ms = frame_ms
+        self._sample_bytes = sample_width * channels
+        self.frame_bytes = sample_rate * self._sample_bytes * frame_ms // 1000
+        self.max_delay = (max_delay_ms if max_delay_ms is not None else frame_ms) / 1000
+
+        self._buffer = bytearray()
+        self._oldest_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.error: Optional[BaseException] = None    # Of a timed flush
+        self._failed = asyncio.Event()
+
+        self.frames = 0
+        self.bytes = 0
+        self.chunks_in = 0
+        self._started_at = time.monotonic()
+
+    async def push(self, pcm: bytes) -> None:
+        """Buffers a chunk and sends every complete frame it makes."""
+        self._raise_failure()
+        if not pcm:
+            return
+        self.chunks_in += 1
+        if not self._buffer:
+            self._oldest_at = time.monotonic()
+        self._buffer += pcm
+
+        while len(self._buffer) >= self.frame_bytes:
+            async with self._lock:
+                if len(self._buffer) < self.frame_bytes:
+                    break
+                frame = bytes(self._buffer[:self.frame_bytes])
+                del self._buffer[:self.frame_bytes]
+                self._oldest_at = time.monotonic() if self._buffer else None
+                await self._emit(frame)
+        self._arm_timer()
+
+    async def flush(self) -> None:
+        """Sends any buffered audio now (end of turn, timer, shutdown)."""
+        self._raise_failure()
+        async with self._lock:
+            # Never split a sample across frames
+            usable = len(self._buffer) - len(self._buffer) % self._sample_bytes
+            if not usable:
+                return
+            frame = bytes(self._buffer[:usable])
+            del self._buffer[:usable]
+            self._oldest_at = time.monotonic() if self._buffer else None
+            await self._emit(frame)
+
+    async def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+    async def wait_failed(self) -> BaseException:
+        """Waits until a timed flush fails to send, and returns its error."""
+        await self._failed.wait()
+        return self.error
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self._started_at, 1e-6)
+        return {
+            "frames": self.frames,
+            "chunks_in": self.chunks_in,
+            "frames_per_sec": round(self.frames / elapsed, 2),
+            "avg_frame_bytes": round(self.bytes / self.frames, 1) if self.frames else 0.0,
+        }
+
+    async def _emit(self, frame: bytes) -> None:
+        self.frames += 1
+        self.bytes += len(frame)
+        await self._send(frame)
+
+    def _raise_failure(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    def _arm_timer(self) -> None:
+        if self._oldest_at is not None and (self._timer is None or self._timer.done()):
+            self._timer = asyncio.create_task(self._flush_stale())
+
+    async def _flush_stale(self) -> None:
+        # Sleeps until the oldest buffered audio is due, flushes it and
+        # exits; the next push that leaves a partial frame arms it again
+        try:
+            while self._oldest_at is not None:
+                wait = self._oldest_at + self.max_delay - time.monotonic()
+                if wait <= 0:
+                    await self.flush()
+                    return
+                await asyncio.sleep(wait)
+        except Exception as e:
+            # Nobody awaits this task: hand the error to the session
+            self.error = e
+            self._failed.set()
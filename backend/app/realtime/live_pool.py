@@ -0,0 +1,204 @@
+"""
+Pool of pre-connected Gemini Live sessions.
+
+Opening `client.aio.live.connect(...)` costs a TLS + WebSocket + setup
+handshake, which the user would otherwise sit through between sending their
+config and getting `{"type": "ready"}`. The pool keeps a few sessions already
+connected for each (language, topic, mode) key that has been asked for
+recently and hands them out immediately.
+
+Sessions carry conversation state, so they are single-use: a session handed
+out by `acquire()` is closed by its caller, never returned to the pool. Each
+acquire triggers a background refill for that key. Warm sessions that sit
+unused for `idle_timeout` seconds are closed, and keys nobody asks for simply
+stop being refilled.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any, AsyncContextManager, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SessionKey = Tuple[str, str, str]  # (language, topic, mode)
+
+
+@dataclass
+class LiveSession:
+    key: SessionKey
+    session: Any
+    warm: bool = False  # True when it came pre-connected from the pool
+    created_at: float = field(default_factory=time.monotonic)
+    _stack: AsyncExitStack = field(default_factory=AsyncExitStack, repr=False)
+
+    @classmethod
+    async def open(cls, key: SessionKey, connection: AsyncContextManager[Any]) -> "LiveSession":
+        """Enters a `live.connect(...)` context manager; `close()` exits it."""
+        live = cls(key=key, session=None)
+        try:
+            live.session = await live._stack.enter_async_context(connection)
+        except BaseException:
+            await live._stack.aclose()
+            raise
+        return live
+
+    async def close(self) -> None:
+        try:
+            await self._stack.aclose()
+        except Exception as e:
+            logger.warning("⚠️ Error closing Gemini session %s: %s", self.key, e)
+
+
+class LiveSessionPool:
+    def __init__(
+        self,
+        connect: Callable[[SessionKey], AsyncContextManager[Any]],
+        max_size: int = 8,
+        per_key: int = 1,
+        idle_timeout: float = 60.0,
+    ):
+        """
+        Args:
+            connect: Returns the `live.connect(...)` context manager for a key
+            max_size: Cap on warm + connecting sessions across all keys
+            per_key: How many warm sessions to keep for each requested key
+            idle_timeout: Seconds a warm session may wait before it is closed
+        """
+        self._connect = connect
+        self.max_size = max_size
+        self.per_key = per_key
+        self.idle_timeout = idle_timeout
+
+        self._idle: Dict[SessionKey, List[LiveSession]] = {}
+        self._connecting: Dict[SessionKey, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._reaper: asyncio.Task | None = None
+        self._closed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- public API ----------
+
+    async def acquire(self, key: SessionKey) -> LiveSession:
+        """Returns a connected session for `key`, warm if one is available."""
+        self._ensure_reaper()
+
+        live = self._pop_idle(key)
+        if live is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            live = await self._open(key)
+
+        self._schedule_refill(key)
+        return live
+
+    def prewarm(self, keys: List[SessionKey]) -> None:
+        """Starts connecting warm sessions for keys we expect to see."""
+        self._ensure_reaper()
+        for key in keys:
+            self._schedule_refill(key)
+
+    def flush(self) -> None:
+        """Closes every warm session, e.g. after their config changed. Refills happen on demand."""
+        for key in list(self._idle):
+            for live in self._idle.pop(key):
+                self._discard(live)
+
+    async def close(self) -> None:
+        self._closed = True
+        for task in list(self._tasks) + ([self._reaper] if self._reaper else []):
+            task.cancel()
+        idle = [live for sessions in self._idle.values() for live in sessions]
+        self._idle.clear()
+        await asyncio.gather(*(live.close() for live in idle), return_exceptions=True)
+
+    @property
+    def size(self) -> int:
+        return sum(len(v) for v in self._idle.values()) + sum(self._connecting.values())
+
+    def stats(self) -> dict:
+        return {
+            "warm": sum(len(v) for v in self._idle.values()),
+            "connecting": sum(self._connecting.values()),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    # ---------- internals ----------
+
+    async def _open(self, key: SessionKey) -> LiveSession:
+        return await LiveSession.open(key, self._connect(key))
+
+    def _pop_idle(self, key: SessionKey) -> LiveSession | None:
+        sessions = self._idle.get(key)
+        now = time.monotonic()
+        while sessions:
+            live = sessions.pop(0)  # Oldest first, so nothing sits around for long
+            if now - live.created_at < self.idle_timeout:
+                live.warm = True
+                return live
+            self._discard(live)
+        return None
+
+    def _schedule_refill(self, key: SessionKey) -> None:
+        if self._closed or self.per_key <= 0:
+            return
+        missing = self.per_key - len(self._idle.get(key, [])) - self._connecting.get(key, 0)
+        for _ in range(max(0, missing)):
+            if self.size >= self.max_size:
+                break
+            self._connecting[key] = self._connecting.get(key, 0) + 1
+            self._spawn(self._refill_one(key))
+
+    async def _refill_one(self, key: SessionKey) -> None:
+        try:
+            live = await self._open(key)
+        except Exception as e:
+            logger.warning("⚠️ Could not pre-connect Gemini session %s: %s", key, e)
+            return
+        finally:
+            self._connecting[key] -= 1
+            if not self._connecting[key]:
+                del self._connecting[key]
+
+        if self._closed:
+            await live.close()
+            return
+        self._idle.setdefault(key, []).append(live)
+
+    async def _reap_idle(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            now = time.monotonic()
+            for key in list(self._idle):
+                fresh = []
+                for live in self._idle[key]:
+                    if now - live.created_at < self.idle_timeout:
+                        fresh.append(live)
+                    else:
+                        self._discard(live)
+                if fresh:
+                    self._idle[key] = fresh
+                else:
+                    del self._idle[key]
+
+    def _discard(self, live: LiveSession) -> None:
+        self.evictions += 1
+        self._spawn(live.close())
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
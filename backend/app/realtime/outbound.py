@@ -0,0 +1,426 @@
+"""
+Outbound audio: model speech on its way to the client.
+
+Gemini hands over reply audio in bursts of uneven parts, usually faster than
+real time. Forwarding each part as it arrives sends frames of every size and
+pushes a whole reply down the socket at once. On a weak connection that fills
+the send buffer, and the client's control messages and transcripts queue up
+behind the audio. `OutboundAudio` sits between the downstream queue and the
+socket and:
+
+- gathers model PCM into frames of OUTBOUND_FRAME_MS. A partial frame goes
+  out at once when the client has nothing left to play, so a reply starts as
+  soon as its first audio arrives and framing adds no latency there.
+- paces frames to real time. The client is kept at most OUTBOUND_LEAD_MS
+  ahead of playback, which is enough jitter buffer to ride out a slow frame.
+  The rest of the reply waits in the relay's downstream queue. That queue is
+  parked and resumed with the session (app/realtime/resumption.py), and is
+  cleared when the user interrupts.
+- optionally encodes to Opus for clients on the binary protocol that ask for
+  it. The encoder is a pooled ffmpeg process (app/realtime/transcode.py). It
+  reads 24 kHz PCM on stdin and writes Ogg Opus, which `OggOpusReader`
+  splits back into raw packets, one binary frame each (FRAME_OPUS in
+  app/realtime/protocol.py). The browser decodes them with WebCodecs'
+  AudioDecoder. At 24 kbit/s that is 16x less than raw PCM and 21x less than
+  base64 PCM in JSON. The price is latency: ffmpeg sits on 100-200 ms of
+  input before it encodes it, so each reply starts that much later. It suits
+  clients on slow links. If no encoder is available the session falls back
+  to PCM and says so in its `codec` field.
+"""
+
+import asyncio
+import logging
+import struct
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import register_component
+from app.realtime.protocol import FRAME_OPUS, PROTOCOL_BINARY, PROTOCOL_RAW, AudioSender
+from app.realtime.transcode import Transcoder, TranscoderBusy, TranscoderPool
+
+logger = logging.getLogger(__name__)
+
+CODEC_PCM = "pcm"
+CODEC_OPUS = "opus"
+
+OUTPUT_RATE = 24000     # Gemini Live replies with 24 kHz s16le mono
+SAMPLE_BYTES = 2
+BYTES_PER_MS = OUTPUT_RATE * SAMPLE_BYTES // 1000
+
+# ffmpeg holds on to 100-200 ms of input before encoding it. Audio written to
+# the encoder may run this far ahead of what has been sent...
+ENCODER_AHEAD_MS = 600
+# ...and at the end of a reply, silence is fed for up to this long to push the
+# last of it through
+ENCODER_DRAIN_TIMEOUT_SECONDS = 0.5
+
+
+def opus_command(bitrate_kbps: int, frame_ms: int) -> List[str]:
+    """
+    ffmpeg encoding 24 kHz s16le mono on stdin to Ogg Opus on stdout, one
+    packet per Ogg page so every packet is written as soon as it's encoded.
+    """
+    return [
+        "ffmpeg",
+        "-hide_banner", "-nostats", "-loglevel", "error",
+        "-fflags", "nobuffer",
+        "-probesize", "32", "-analyzeduration", "0",
+        "-f", "s16le", "-ar", str(OUTPUT_RATE), "-ac", "1",
+        "-i", "pipe:0",
+        "-threads", "1",
+        "-c:a", "libopus",
+        "-b:a", f"{bitrate_kbps}k",
+        "-application", "voip",
+        "-frame_duration", str(frame_ms),
+        "-f", "ogg",
+        "-page_duration", str(frame_ms * 1000),  # Microseconds
+        "-flush_packets", "1",
+        "pipe:1",
+    ]
+
+
+def negotiate_codec(requested: Optional[str], protocol: str) -> str:
+    """Opus for clients that ask for it and can take binary frames, PCM otherwise."""
+    if requested == CODEC_OPUS and settings.OUTBOUND_OPUS_ENABLED and protocol in (PROTOCOL_BINARY, PROTOCOL_RAW):
+        return CODEC_OPUS
+    return CODEC_PCM
+
+
+# --- Opus packets out of an Ogg stream ---
+
+_OGG_PAGE = struct.Struct("<4sBBqIIIB")  # capture, version, flags, granule, serial, page no, crc, segments
+
+# Frame duration in ms by TOC config number (RFC 6716, section 3.1)
+_SILK_MS = (10, 20, 40, 60)
+_HYBRID_MS = (10, 20)
+_CELT_MS = (2.5, 5, 10, 20)
+
+
+def opus_packet_ms(packet: bytes) -> float:
+    """Duration of the audio in one Opus packet, from its TOC byte."""
+    config = packet[0] >> 3
+    if config < 12:
+        frame_ms = _SILK_MS[config % 4]
+    elif config < 16:
+        frame_ms = _HYBRID_MS[config % 2]
+    else:
+        frame_ms = _CELT_MS[config % 4]
+    code = packet[0] & 0x03
+    frames = 1 if code == 0 else 2 if code in (1, 2) else packet[1] & 0x3F
+    return frame_ms * frames
+
+
+class OggOpusReader:
+    """
+    Splits a streamed Ogg Opus file into raw Opus packets. The two header
+    packets (OpusHead, OpusTags) are skipped; the client configures its
+    decoder from the `ready` message instead.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._partial = bytearray()     # Packet continued on the next page
+        self._headers_left = 2
+
+    def feed(self, data: bytes) -> List[bytes]:
+        self._buffer += data
+        packets = []
+        while len(self._buffer) >= _OGG_PAGE.size:
+            capture, _, _, _, _, _, _, n_segments = _OGG_PAGE.unpack_from(self._buffer)
+            if capture != b"OggS":
+                raise ValueError("Lost Ogg page sync")
+            header_size = _OGG_PAGE.size + n_segments
+            if len(self._buffer) < header_size:
+                break
+            lacing = self._buffer[_OGG_PAGE.size:header_size]
+            if len(self._buffer) < header_size + sum(lacing):
+                break
+
+            offset = header_size
+            for size in lacing:
+                self._partial += self._buffer[offset:offset + size]
+                offset += size
+                if size < 255:
+                    packet, self._partial = bytes(self._partial), bytearray()
+                    if self._headers_left:
+                        self._headers_left -= 1
+                    elif packet:
+                        packets.append(packet)
+            del self._buffer[:offset]
+        return packets
+
+
+# --- Pacing ---
+
+class Pacer:
+    """
+    Tracks how much audio the client has buffered, assuming it plays what it
+    gets in real time, and holds the sender back once that is more than
+    `lead_ms`. With `enabled=False` it only keeps the books.
+    """
+
+    def __init__(self, lead_ms: int, enabled: bool = True):
+        self.lead = lead_ms / 1000
+        self.enabled = enabled
+        self._play_until = 0.0      # When the client runs out of audio (monotonic)
+
+        self.waited = 0.0
+
+    def ahead(self) -> float:
+        """Seconds of audio the client still has to play."""
+        return max(self._play_until - time.monotonic(), 0.0)
+
+    async def wait(self, duration_ms: float) -> None:
+        """Waits until a frame of `duration_ms` may be sent, and books it."""
+        now = time.monotonic()
+        if self._play_until < now:
+            self._play_until = now  # Client ran dry (or a new reply): start from now
+        early = self._play_until - now - self.lead
+        if self.enabled and early > 0:
+            self.waited += early
+            await asyncio.sleep(early)
+        self._play_until += duration_ms / 1000
+
+    def reset(self) -> None:
+        """The client dropped what it had buffered (interrupted)."""
+        self._play_until = 0.0
+
+
+# --- The outbound stage ---
+
+opus_encoders = TranscoderPool(
+    command=opus_command(settings.OUTBOUND_OPUS_BITRATE_KBPS, settings.OUTBOUND_FRAME_MS),
+    max_workers=settings.OUTBOUND_OPUS_MAX_ENCODERS,
+    warm=settings.OUTBOUND_OPUS_WARM,
+    acquire_timeout=settings.OUTBOUND_OPUS_ACQUIRE_TIMEOUT_SECONDS,
+)
+register_component("opus_encoder_pool", opus_encoders.stats)
+
+
+class OutboundAudio:
+    def __init__(
+        self,
+        sender: AudioSender,
+        encoder: Optional[Transcoder] = None,
+        frame_ms: int = 40,
+        lead_ms: int = 300,
+        pacing: bool = True,
+        on_frame: Optional[Callable[[int, bytes], None]] = None,
+    ):
+        """
+        Args:
+            sender: Delivers frames in the client's protocol (numbering them)
+            encoder: Leased Opus encoder, or None to send PCM
+            frame_ms: Outbound frame duration
+            lead_ms: How far ahead of playback the client may be sent
+            pacing: False sends frames as soon as they're complete
+            on_frame: Called with (seq, payload) right before each frame is sent
+        """
+        self.sender = sender
+        self.encoder = encoder
+        self.codec = CODEC_OPUS if encoder is not None else CODEC_PCM
+        self.frame_ms = frame_ms
+        self.frame_bytes = frame_ms * BYTES_PER_MS
+        self.pacer = Pacer(lead_ms, enabled=pacing)
+        self._on_frame = on_frame
+
+        self._pcm = bytearray()         # PCM mode: audio not yet framed
+
+        # Opus mode: ffmpeg holds on to some input before it encodes it, so
+        # packets come back on their own schedule. One task collects them,
+        # another paces them out. Positions are ms into the encoded stream.
+        self._packets: deque = deque()  # (position, packet)
+        self._packet_ready = asyncio.Event()
+        self._progress = asyncio.Event()
+        self._written_ms = 0.0          # Handed to the encoder
+        self._encoded_ms = 0.0          # Came back as packets
+        self._sent_ms = 0.0             # Sent to the client, or skipped
+        self._skip: deque = deque()     # [from, to) ranges never sent: padding, interrupted replies
+        self._failed: Optional[Exception] = None
+        self._tasks: List[asyncio.Task] = []
+        if encoder is not None:
+            self._tasks = [asyncio.create_task(self._read_packets()), asyncio.create_task(self._pump())]
+
+        self.frames = 0
+        self.bytes = 0
+        self.pcm_bytes = 0
+        self.interrupted = 0
+
+    @classmethod
+    async def open(cls, sender: AudioSender, requested_codec: Optional[str] = None, **kwargs) -> "OutboundAudio":
+        """
+        Sets up the outbound stage for a session, leasing an Opus encoder if
+        the client asked for Opus. Without one (pool busy, no ffmpeg) the
+        session gets PCM.
+        """
+        encoder = None
+        if negotiate_codec(requested_codec, sender.protocol) == CODEC_OPUS:
+            try:
+                encoder = await opus_encoders.acquire()
+            except (TranscoderBusy, OSError) as e:
+                logger.warning("OUTBOUND: no Opus encoder, sending PCM - %s", e)
+        if encoder is not None:
+            sender.kind = FRAME_OPUS
+        return cls(
+            sender,
+            encoder=encoder,
+            frame_ms=settings.OUTBOUND_FRAME_MS,
+            lead_ms=settings.OUTBOUND_LEAD_MS,
+            pacing=settings.OUTBOUND_PACING_ENABLED,
+            **kwargs,
+        )
+
+    async def send(self, pcm: bytes) -> None:
+        """
+        Takes model audio. Waits while the client (plus, for Opus, the
+        encoder) already has enough ahead, so the rest of the reply stays
+        in the caller's queue.
+        """
+        self.pcm_bytes += len(pcm)
+        if self.encoder is not None:
+            await self._encode(pcm)
+            await self._wait_sent(self._written_ms - ENCODER_AHEAD_MS)
+            return
+
+        self._pcm += pcm
+        while len(self._pcm) >= self.frame_bytes:
+            frame = bytes(self._pcm[:self.frame_bytes])
+            del self._pcm[:self.frame_bytes]
+            await self._send_frame(frame, self.frame_ms)
+        if self._pcm and self.pacer.ahead() == 0:
+            # The client would go quiet waiting for a full frame
+            await self._flush_pcm()
+
+    async def replay(self, payload: bytes) -> None:
+        """Resends a frame from before a reconnect, as is (already encoded)."""
+        await self.sender.send(payload)
+
+    async def end_turn(self) -> None:
+        """The reply is complete: sends the last partial frame."""
+        if self.encoder is None:
+            await self._flush_pcm()
+            return
+
+        # Feed silence until the end of the reply has been encoded. The
+        # silence itself is skipped, also where it comes out ahead of the
+        # next reply.
+        await self._pad_to_frame()
+        end = self._written_ms
+        padding = [end, float("inf")]
+        self._skip.append(padding)
+        deadline = time.monotonic() + ENCODER_DRAIN_TIMEOUT_SECONDS
+        while self._encoded_ms < end - 1e-6 and time.monotonic() < deadline:
+            await self._encode(bytes(self.frame_bytes))
+            await asyncio.sleep(self.frame_ms / 2000)
+        padding[1] = self._written_ms
+        self._check()
+
+    async def interrupt(self) -> None:
+        """The user barged in: drops the rest of the reply, here and at the client."""
+        self.interrupted += 1
+        self._pcm.clear()
+        if self.encoder is not None:
+            await self._pad_to_frame()
+            self._skip.append([self._sent_ms, self._written_ms])
+        self.pacer.reset()
+
+    async def close(self) -> None:
+        """Returns the encoder to the pool. Audio not sent yet is dropped."""
+        for task in self._tasks:
+            task.cancel()
+        if self.encoder is not None:
+            encoder, self.encoder = self.encoder, None
+            await opus_encoders.release(encoder)
+
+    def stats(self) -> dict:
+        return {
+            "codec": self.codec,
+            "frames": self.frames,
+            "avg_frame_bytes": round(self.bytes / self.frames, 1) if self.frames else 0.0,
+            "compression": round(self.pcm_bytes / self.bytes, 1) if self.bytes else 0.0,
+            "paced_ms": round(self.pacer.waited * 1000, 1),
+            "interrupted": self.interrupted,
+        }
+
+    # --- internals ---
+
+    async def _send_frame(self, payload: bytes, duration_ms: float) -> None:
+        await self.pacer.wait(duration_ms)
+        if self._on_frame is not None:
+            self._on_frame(self.sender.seq, payload)
+        await self.sender.send(payload)
+        self.frames += 1
+        self.bytes += len(payload)
+
+    async def _flush_pcm(self) -> None:
+        usable = len(self._pcm) - len(self._pcm) % SAMPLE_BYTES
+        if usable:
+            frame = bytes(self._pcm[:usable])
+            del self._pcm[:usable]
+            await self._send_frame(frame, usable / BYTES_PER_MS)
+
+    def _check(self) -> None:
+        if self._failed is not None:
+            raise self._failed
+
+    async def _encode(self, pcm: bytes) -> None:
+        self._check()
+        self._written_ms += len(pcm) / BYTES_PER_MS
+        await self.encoder.write(pcm)
+
+    async def _pad_to_frame(self) -> None:
+        # The encoder only emits whole frames; silence completes the last one
+        remainder = self._written_ms % self.frame_ms
+        if remainder > 1e-6:
+            await self._encode(bytes(round((self.frame_ms - remainder) * BYTES_PER_MS) // SAMPLE_BYTES * SAMPLE_BYTES))
+
+    async def _wait_sent(self, position: float) -> None:
+        while True:
+            self._check()
+            if self._sent_ms >= position - 1e-6:
+                return
+            self._progress.clear()
+            await self._progress.wait()
+
+    def _skipped(self, position: float) -> bool:
+        while self._skip and self._skip[0][1] <= position:
+            self._skip.popleft()    # Positions only grow
+        return any(start <= position < end for start, end in self._skip)
+
+    async def _read_packets(self) -> None:
+        reader = OggOpusReader()
+        try:
+            while True:
+                data = await self.encoder.read()
+                if not data:
+                    raise ConnectionError(f"ffmpeg exited: {await self.encoder.read_errors()}")
+                for packet in reader.feed(data):
+                    self._packets.append((self._encoded_ms, packet))
+                    self._encoded_ms += opus_packet_ms(packet)
+                self._packet_ready.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("OUTBOUND: Opus encoder failed - %s", e)
+            self._failed = e
+            self._progress.set()
+
+    async def _pump(self) -> None:
+        try:
+            while True:
+                while not self._packets:
+                    self._packet_ready.clear()
+                    await self._packet_ready.wait()
+                position, packet = self._packets.popleft()
+                duration = opus_packet_ms(packet)
+                if not self._skipped(position):
+                    await self._send_frame(packet, duration)
+                self._sent_ms = position + duration
+                self._progress.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._failed = e
+            self._progress.set()
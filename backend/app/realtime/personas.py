@@ -0,0 +1,237 @@
+"""
+Tutor personas for the Gemini Live routers.
+
+Voices and instructions live in a data file (personas.json next to this
+module, or PERSONAS_FILE). Editing them doesn't need a deploy. `load()`
+validates the file and builds a typed `LiveConnectConfig` for every
+language x topic x mode it lists, so opening a session picks a finished
+config instead of assembling prompt strings and dicts per connection.
+Languages and topics the file doesn't list still work. Their configs are
+built on demand and not kept, because those keys come straight from
+clients.
+
+Building the configs needs the Gemini SDK's types, which take longer to
+import than the rest of the app. So at startup `check()` only validates
+the file, and `warm()` builds the configs in a thread once the worker is
+serving. A session that arrives first builds them itself.
+
+`watch()` polls the file's modification time. A change is loaded and
+swapped in whole. An invalid file is logged and the previous personas stay
+active. Reload callbacks let the speaking router drop warm sessions that
+were opened with the old instructions.
+
+Model-side context caching doesn't apply here. Live sessions take no
+cached content, and a persona prompt is a few dozen tokens, far below
+the minimum size for a cache entry. What the registry saves is the
+per-session setup work.
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict
+
+from app.core.config import settings
+from app.realtime.live_pool import SessionKey
+from app.realtime.transcripts import TRANSCRIPTION_CONFIG
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FILE = Path(__file__).with_name("personas.json")
+
+
+# ---------- file format ----------
+
+class SpeakingPersonas(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    voice: str
+    default_persona: str            # For languages without their own entry
+    style: List[str]                # Shared by every language
+    topic: str                      # Template with {topic}
+    mode: str                       # Template with {mode}
+    topics: List[str]               # Prebuilt for every language and mode
+    modes: List[str]
+    languages: Dict[str, List[str]]
+
+
+class ChatPersona(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    voice: str
+    greeting: str                   # Sent as the first turn so the tutor speaks first
+
+
+class PersonaFile(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    speaking: SpeakingPersonas
+    chat: ChatPersona
+
+
+# ---------- registry ----------
+
+def _speech_config(voice: str) -> "types.SpeechConfig":
+    from google.genai import types
+
+    return types.SpeechConfig(
+        voice_config=types.VoiceConfig(prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice))
+    )
+
+
+class PersonaSet:
+    """One loaded version of the persona file, with its prebuilt configs."""
+
+    def __init__(self, data: PersonaFile):
+        from google.genai import types
+
+        self.data = data
+        self.chat_config = types.LiveConnectConfig(
+            response_modalities=[types.Modality.AUDIO],
+            speech_config=_speech_config(data.chat.voice),
+            **TRANSCRIPTION_CONFIG,
+        )
+        speaking = data.speaking
+        self._speech = _speech_config(speaking.voice)
+        self.speaking: Dict[SessionKey, "types.LiveConnectConfig"] = {
+            (language, topic, mode): self.build_speaking(language, topic, mode)
+            for language in speaking.languages
+            for topic in speaking.topics
+            for mode in speaking.modes
+        }
+
+    def system_instruction(self, language: str, topic: str, mode: str) -> str:
+        speaking = self.data.speaking
+        lines = speaking.languages.get(language) or [speaking.default_persona]
+        return "\n".join([
+            *lines,
+            *speaking.style,
+            speaking.topic.format(topic=topic),
+            speaking.mode.format(mode=mode),
+        ])
+
+    def build_speaking(self, language: str, topic: str, mode: str) -> "types.LiveConnectConfig":
+        from google.genai import types
+
+        return types.LiveConnectConfig(
+            response_modalities=[types.Modality.AUDIO],
+            speech_config=self._speech,
+            system_instruction=self.system_instruction(language, topic, mode),
+            # Gemini sends handles that reopen the conversation after a drop
+            session_resumption=types.SessionResumptionConfig() if settings.SESSION_RESUME_ENABLED else None,
+            **TRANSCRIPTION_CONFIG,
+        )
+
+
+class PersonaRegistry:
+    def __init__(self, path: Path, reload_interval: float = 0.0):
+        """
+        Args:
+            path: The persona JSON file
+            reload_interval: Seconds between checks for changes (0 = never reload)
+        """
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self._current: Optional[PersonaSet] = None
+        self._mtime: Optional[int] = None
+        self._callbacks: List[Callable[[], None]] = []
+
+        self.reloads = 0
+        self.reload_errors = 0
+
+    def check(self) -> None:
+        """Validates the file without building anything. Raises if it's missing or invalid."""
+        PersonaFile.model_validate_json(self.path.read_bytes())
+
+    def load(self) -> None:
+        """Reads, validates and builds the file. Raises if it's missing or invalid."""
+        mtime, personas = self._read()
+        self._current, self._mtime = personas, mtime
+
+    async def warm(self) -> None:
+        """Builds the configs in a thread, unless a session already needed them."""
+        if self._current is None:
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as e:
+                logger.error("Could not build personas from %s: %s", self.path, e)
+
+    def _read(self) -> Tuple[int, PersonaSet]:
+        mtime = os.stat(self.path).st_mtime_ns
+        return mtime, PersonaSet(PersonaFile.model_validate_json(self.path.read_bytes()))
+
+    @property
+    def current(self) -> PersonaSet:
+        if self._current is None:
+            self.load()
+        return self._current
+
+    def speaking_config(self, language: str, topic: str, mode: str, handle: Optional[str] = None) -> "types.LiveConnectConfig":
+        """The Live config for a speaking session, continuing the session behind `handle` if given."""
+        from google.genai import types
+
+        personas = self.current
+        config = personas.speaking.get((language, topic, mode)) or personas.build_speaking(language, topic, mode)
+        if handle is not None and config.session_resumption is not None:
+            # Prebuilt configs are shared, so never modified in place
+            config = config.model_copy(update={"session_resumption": types.SessionResumptionConfig(handle=handle)})
+        return config
+
+    def chat_config(self) -> "types.LiveConnectConfig":
+        return self.current.chat_config
+
+    @property
+    def chat_greeting(self) -> str:
+        return self.current.data.chat.greeting
+
+    def on_reload(self, callback: Callable[[], None]) -> None:
+        """Calls `callback()` after each successful reload."""
+        self._callbacks.append(callback)
+
+    async def watch(self) -> None:
+        """Reloads the file whenever it changes. Runs until cancelled."""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                logger.warning("Persona file %s unreadable: %s", self.path, e)
+                continue
+            if mtime == self._mtime:
+                continue
+            try:
+                mtime, personas = await asyncio.to_thread(self._read)
+            except Exception as e:
+                # Don't retry the same broken version every poll
+                self._mtime = mtime
+                self.reload_errors += 1
+                logger.error("Persona file %s is invalid, keeping the previous personas: %s", self.path, e)
+                continue
+
+            self._current, self._mtime = personas, mtime
+            self.reloads += 1
+            logger.info("Reloaded %d speaking personas from %s", len(personas.speaking), self.path)
+            for callback in self._callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.warning("Persona reload callback failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "speaking_configs": len(self._current.speaking) if self._current is not None else 0,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+
+personas = PersonaRegistry(
+    Path(settings.PERSONAS_FILE) if settings.PERSONAS_FILE else DEFAULT_FILE,
+    reload_interval=settings.PERSONAS_RELOAD_SECONDS,
+)
@@ -0,0 +1,120 @@
+"""
+Wire format for realtime audio WebSockets.
+
+Two protocols are spoken on the same sockets:
+
+- "json" (legacy): every audio chunk is base64 inside a JSON envelope.
+- "binary": audio travels as raw PCM in binary WebSocket frames, prefixed
+  with a 6-byte header. JSON text frames are kept for control messages only
+  (config, ready, end_turn, close, error, ...).
+
+Binary frame layout (network byte order):
+
+    +--------+--------+--------------------+----------------------+
+    | type   | flags  | sequence number    | payload              |
+    | uint8  | uint8  | uint32             | ...                  |
+    +--------+--------+--------------------+----------------------+
+
+Audio frames (type 0x01) carry raw PCM. Outbound audio may instead be one
+Opus packet per frame (type 0x02) when the client asked for it (see
+app/realtime/outbound.py).
+
+The client picks the protocol when it connects; inbound binary frames are
+accepted either way so clients can migrate one direction at a time. The
+test router speaks "raw": bare audio in binary frames, no header at all.
+"""
+
+import base64
+import json
+import struct
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from fastapi import WebSocket
+
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+PROTOCOL_RAW = "raw"
+
+HEADER = struct.Struct("!BBI")
+
+# Frame types
+FRAME_AUDIO = 0x01
+FRAME_OPUS = 0x02   # Outbound only
+
+# Flags
+FLAG_END_OF_TURN = 0x01
+
+_SEQ_MODULO = 1 << 32
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+@dataclass
+class Frame:
+    kind: int
+    flags: int
+    seq: int
+    payload: bytes
+
+    @property
+    def end_of_turn(self) -> bool:
+        return bool(self.flags & FLAG_END_OF_TURN)
+
+
+def pack_frame(kind: int, seq: int, payload: bytes, flags: int = 0) -> bytes:
+    return HEADER.pack(kind, flags, seq % _SEQ_MODULO) + payload
+
+
+def unpack_frame(data: bytes) -> Frame:
+    if len(data) < HEADER.size:
+        raise ProtocolError(f"Binary frame too short ({len(data)} bytes)")
+    kind, flags, seq = HEADER.unpack_from(data)
+    if kind != FRAME_AUDIO:
+        raise ProtocolError(f"Unknown binary frame type {kind}")
+    return Frame(kind, flags, seq, data[HEADER.size:])
+
+
+def negotiate(requested: Optional[str]) -> str:
+    return PROTOCOL_BINARY if requested == PROTOCOL_BINARY else PROTOCOL_JSON
+
+
+def parse_message(message: dict) -> Union[Frame, dict]:
+    """
+    Parses a received "websocket.receive" message: a `Frame` for binary
+    frames, or the decoded JSON object for text frames.
+    """
+    data = message.get("bytes")
+    if data is not None:
+        return unpack_frame(data)
+    return json.loads(message.get("text") or "{}")
+
+
+class AudioSender:
+    """
+    Sends outbound audio in whichever protocol the client negotiated,
+    numbering binary frames as it goes.
+    """
+
+    def __init__(self, websocket: WebSocket, protocol: str, json_key: str = "data", json_type: Optional[str] = "audio", seq: int = 0):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.kind = FRAME_AUDIO
+        self.seq = seq  # Resumed sessions continue the numbering of the dropped socket
+        # Legacy envelopes differ per endpoint: {"type": "audio", "data": ...} vs {"audio": ...}
+        self._json_key = json_key
+        self._json_type = json_type
+
+    async def send(self, audio: bytes) -> None:
+        if self.protocol == PROTOCOL_BINARY:
+            await self.websocket.send_bytes(pack_frame(self.kind, self.seq, audio))
+        elif self.protocol == PROTOCOL_RAW:
+            await self.websocket.send_bytes(audio)
+        else:
+            envelope = {self._json_key: base64.b64encode(audio).decode("ascii")}
+            if self._json_type:
+                envelope = {"type": self._json_type, **envelope}
+            await self.websocket.send_json(envelope)
+        self.seq += 1
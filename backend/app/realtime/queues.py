@@ -0,0 +1,179 @@
+"""
+Bounded queues between the stages of a realtime relay.
+
+Each WebSocket handler is a small pipeline (browser -> Gemini and
+Gemini -> browser). When the stages are joined by direct awaits, the slowest
+side sets the pace for everything: a phone on a bad network stalls the
+Gemini reader, and a slow upstream stalls the browser reader. `RelayQueue`
+puts a bounded buffer between stages with an explicit overflow policy:
+
+- "block":       the producer waits (for streams that can't lose bytes, e.g. WebM)
+- "drop_oldest": evict the oldest droppable item (live audio: newest matters most)
+- "drop_newest": discard the incoming item
+
+Items can also expire: with `max_age_ms` set, droppable items that waited
+longer than that are skipped on the way out, because late audio is worse
+than no audio. Control items (end of turn, close) are enqueued with
+`droppable=False` and are never dropped or skipped.
+"""
+
+import asyncio
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, Optional
+
+
+class OverflowPolicy(str, Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+
+
+class QueueClosed(Exception):
+    pass
+
+
+class RelayQueue:
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        max_age_ms: int = 0,
+        on_delivered: Optional[Callable[[float], None]] = None,
+    ):
+        """
+        Args:
+            name: Stage name used in stats and metrics
+            maxsize: Droppable items held before the overflow policy applies
+            policy: What to do with a droppable item when the queue is full
+            max_age_ms: Skip droppable items older than this on get (0 = never)
+            on_delivered: Called with each delivered item's wait in seconds
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = OverflowPolicy(policy)
+        self.max_age = max_age_ms / 1000 if max_age_ms else None
+        self._on_delivered = on_delivered
+
+        self._items: deque = deque()  # (enqueued_at, item, droppable)
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._closed = False
+
+        # Per-session metrics
+        self.high_water_mark = 0
+        self.dropped = 0
+        self.stale = 0
+        self.delivered = 0
+        self._delay_total = 0.0
+        self.max_delay = 0.0
+
+    async def put(self, item: Any, droppable: bool = True) -> None:
+        if self._closed:
+            raise QueueClosed(self.name)
+
+        if droppable and len(self._items) >= self.maxsize:
+            if self.policy is OverflowPolicy.BLOCK:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._not_full.clear()
+                    await self._not_full.wait()
+                if self._closed:
+                    raise QueueClosed(self.name)
+            elif self.policy is OverflowPolicy.DROP_NEWEST:
+                self.dropped += 1
+                return
+            else:
+                # If only control items are queued, this one goes in over the limit
+                self._drop_oldest()
+
+        self._items.append((time.monotonic(), item, droppable))
+        self.high_water_mark = max(self.high_water_mark, len(self._items))
+        self._not_empty.set()
+
+    async def get(self) -> Any:
+        while True:
+            while not self._items:
+                if self._closed:
+                    raise QueueClosed(self.name)
+                self._not_empty.clear()
+                await self._not_empty.wait()
+
+            enqueued_at, item, droppable = self._items.popleft()
+            self._not_full.set()
+
+            waited = time.monotonic() - enqueued_at
+            if droppable and self.max_age is not None and waited > self.max_age:
+                self.stale += 1
+                continue
+
+            self.delivered += 1
+            self._delay_total += waited
+            self.max_delay = max(self.max_delay, waited)
+            if self._on_delivered is not None:
+                self._on_delivered(waited)
+            return item
+
+    def drop_pending(self) -> int:
+        """Discards every droppable item still queued (e.g. the rest of an interrupted reply)."""
+        kept = deque(entry for entry in self._items if not entry[2])
+        dropped = len(self._items) - len(kept)
+        self._items = kept
+        self.dropped += dropped
+        self._not_full.set()
+        return dropped
+
+    def close(self) -> None:
+        """Producers get QueueClosed; consumers drain what's left, then get it too."""
+        self._closed = True
+        self._not_empty.set()
+        self._not_full.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.get()
+        except QueueClosed:
+            raise StopAsyncIteration
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        return {
+            "high_water_mark": self.high_water_mark,
+            "maxsize": self.maxsize,
+            "dropped": self.dropped,
+            "stale": self.stale,
+            "delivered": self.delivered,
+            "avg_delay_ms": round(self._delay_total / self.delivered * 1000, 2) if self.delivered else 0.0,
+            "max_delay_ms": round(self.max_delay * 1000, 2),
+        }
+
+    def _drop_oldest(self) -> bool:
+        for index, (_, _, droppable) in enumerate(self._items):
+            if droppable:
+                del self._items[index]
+                self.dropped += 1
+                return True
+        return False
+
+
+async def run_stages(*stages: Awaitable[None]) -> None:
+    """
+    Runs relay stages until the first one exits, then cancels the rest.
+
+    `asyncio.gather` keeps waiting for every stage, so one side finishing
+    (client closed, upstream ended) could leave the other blocked forever.
+    """
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,156 @@
+"""
+Per-client limits for the realtime WebSockets.
+
+admission.py caps how many sessions a worker holds. This module caps what
+one caller may use. A caller is identified by IP, and also by user when the
+socket URL carries `?token=<session token>`. Each caller is limited to:
+
+- REALTIME_PER_MINUTE_IP new sessions per minute (a token bucket)
+- REALTIME_SESSIONS_PER_IP / _PER_USER concurrent sessions
+- REALTIME_MINUTES_PER_DAY_IP / _PER_USER session minutes per UTC day
+
+Minutes are wall time from admission to release and are charged when a
+session ends. A lease records how many minutes were left when the session
+started, and admission.py ends the session once they are used up.
+"""
+
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+from app.core.ratelimit import Rate, RateLimiter, client_ip, limiter
+from app.core.security import verify_session_token
+
+# Session counters outlive a worker that died holding slots by at most this long
+SLOT_TTL_SECONDS = 24 * 3600
+
+
+def seconds_until_tomorrow() -> float:
+    now = datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+def socket_user_id(websocket: WebSocket) -> Optional[str]:
+    """The user a realtime socket was opened for (`?token=<session token>`), or None."""
+    token = websocket.query_params.get("token")
+    payload = verify_session_token(token) if token else None
+    return payload["sub"] if payload else None
+
+
+@dataclass(eq=False)
+class QuotaLease:
+    slots: List[str]            # Session counters this session is counted in
+    minute_keys: List[str]      # Daily usage counters it is charged to
+    minutes_left: float         # math.inf when no daily quota applies
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def seconds_left(self) -> float:
+        return self.minutes_left * 60 - (time.monotonic() - self.started_at)
+
+
+class RealtimeQuotas:
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        per_minute_ip: int,
+        sessions_per_ip: int,
+        sessions_per_user: int,
+        minutes_per_day_ip: int,
+        minutes_per_day_user: int,
+        retry_after: int = 5,
+    ):
+        """
+        Args:
+            limiter: Shared limiter; its store holds the counters
+            per_minute_ip: New sessions per IP per minute
+            sessions_per_ip / sessions_per_user: Concurrent sessions
+            minutes_per_day_ip / minutes_per_day_user: Session minutes per UTC day
+            retry_after: Seconds callers over their concurrent limit are told to wait
+
+        A limit of 0 disables it.
+        """
+        self.limiter = limiter
+        self.connect_rate = Rate(per_minute_ip)
+        self.limits = {
+            "ip": (sessions_per_ip, minutes_per_day_ip),
+            "user": (sessions_per_user, minutes_per_day_user),
+        }
+        self.retry_after = retry_after
+        self.minutes_charged = 0.0
+
+    async def acquire(self, websocket: WebSocket) -> Optional[QuotaLease]:
+        """
+        Checks the caller's limits and counts the session against them.
+        Raises RateLimited if any is exceeded. Returns None when limits are
+        disabled; otherwise the lease must be passed to `release()`.
+        """
+        if not self.limiter.enabled:
+            return None
+        store = self.limiter.store
+        ip = client_ip(websocket)
+        await self.limiter.hit("realtime", f"ip:{ip}", self.connect_rate)
+
+        callers: List[Tuple[str, str]] = [("ip", ip)]
+        user_id = socket_user_id(websocket)
+        if user_id is not None:
+            callers.append(("user", user_id))
+
+        # 1. Daily minutes: the caller with the least left decides
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        minute_keys, minutes_left = [], math.inf
+        for kind, caller in callers:
+            per_day = self.limits[kind][1]
+            if per_day:
+                key = f"realtime_minutes:{day}:{kind}:{caller}"
+                minute_keys.append(key)
+                minutes_left = min(minutes_left, per_day - await store.get(key))
+        if minutes_left <= 0:
+            raise self.limiter.reject("realtime_minutes", seconds_until_tomorrow())
+
+        # 2. Concurrent sessions: count this one, back out if it's one too many
+        slots: List[str] = []
+        for kind, caller in callers:
+            max_sessions = self.limits[kind][0]
+            if not max_sessions:
+                continue
+            key = f"realtime_sessions:{kind}:{caller}"
+            slots.append(key)
+            if await store.incr(key, 1, SLOT_TTL_SECONDS) > max_sessions:
+                for held in slots:
+                    await store.incr(held, -1, SLOT_TTL_SECONDS)
+                raise self.limiter.reject("realtime_sessions", self.retry_after)
+
+        return QuotaLease(slots=slots, minute_keys=minute_keys, minutes_left=minutes_left)
+
+    async def release(self, lease: QuotaLease) -> None:
+        """Frees the lease's session slots and charges the minutes it ran."""
+        store = self.limiter.store
+        for key in lease.slots:
+            await store.incr(key, -1, SLOT_TTL_SECONDS)
+
+        minutes = (time.monotonic() - lease.started_at) / 60
+        ttl = seconds_until_tomorrow() + 3600
+        for key in lease.minute_keys:
+            await store.incr(key, minutes, ttl)
+        self.minutes_charged += minutes
+
+    def stats(self) -> dict:
+        return {"minutes_charged": round(self.minutes_charged, 2)}
+
+
+realtime_quotas = RealtimeQuotas(
+    limiter,
+    per_minute_ip=settings.REALTIME_PER_MINUTE_IP,
+    sessions_per_ip=settings.REALTIME_SESSIONS_PER_IP,
+    sessions_per_user=settings.REALTIME_SESSIONS_PER_USER,
+    minutes_per_day_ip=settings.REALTIME_MINUTES_PER_DAY_IP,
+    minutes_per_day_user=settings.REALTIME_MINUTES_PER_DAY_USER,
+    retry_after=settings.REALTIME_RETRY_AFTER_SECONDS,
+)
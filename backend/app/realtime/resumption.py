@@ -0,0 +1,258 @@
+"""
+Resumable speaking sessions.
+
+Mobile clients lose their WebSocket all the time: a network switch, a
+tunnel, the app going to the background. Without resumption the handler
+tears down the Gemini Live session with the socket. The client then redoes
+config and the upstream handshake, and the tutor forgets the conversation.
+
+Instead, when a client goes away without sending "close" (and without a
+normal 1000 closure), the handler parks its `ResumableSession` here for
+SESSION_RESUME_GRACE_SECONDS. A parked session keeps:
+
+- the open Gemini session. Nothing reads from it while parked, so whatever
+  Gemini says meanwhile waits in its socket. If that session failed too, the
+  latest Gemini resumption handle is kept instead, which reconnects with the
+  conversation intact.
+- the transcript recorder, so the session keeps its id, turns and summary
+- the downstream queue: replies already read from Gemini but not yet sent
+- a replay buffer of the last audio frames sent. The frames in flight when
+  the socket died were most likely lost.
+
+A reconnecting client sends its usual config message with
+`"resume": {"session_id": "...", "resume_key": "...", "received": N}`, where
+N is the number of audio frames it has received. The resume key comes with
+`ready` and is never shown anywhere else (unlike the session id, which also
+fetches the summary). A session started with `?token=` can only be resumed
+by a socket with a token for the same user. If the session is still parked here,
+`claim()` hands it over. Clients often notice a dead connection before the
+server does. If the old socket's handler is still relaying, `claim()` makes
+it stop and park the session, then takes the session over. The client gets `ready` with `"resumed": true`,
+then every buffered frame from N on, then the rest of the reply. That takes
+one round trip and no upstream handshake. Otherwise the same message starts
+a fresh session. Sessions nobody claims in time are closed and summarized
+as if the client had said "close".
+
+Parked sessions live in the worker's memory, so a reconnect has to reach the
+same worker (sticky sessions on the load balancer).
+"""
+
+import asyncio
+import hmac
+import logging
+import secrets
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.realtime.live_pool import LiveSession, SessionKey
+from app.realtime.queues import RelayQueue
+from app.realtime.transcripts import TranscriptRecorder
+
+logger = logging.getLogger(__name__)
+
+# Close code of a client that left on purpose (anything else may come back)
+CLOSE_NORMAL = 1000
+
+
+class ReplayBuffer:
+    """The most recent outbound audio frames, with the sequence numbers they were sent under."""
+
+    def __init__(self, max_frames: int):
+        self._frames: deque = deque(maxlen=max_frames)  # (seq, pcm)
+
+    def append(self, seq: int, pcm: bytes) -> None:
+        self._frames.append((seq, pcm))
+
+    def since(self, seq: int) -> List[Tuple[int, bytes]]:
+        """Frames numbered `seq` and later; older ones have already been evicted or were received."""
+        return [(s, pcm) for s, pcm in self._frames if s >= seq]
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+@dataclass(eq=False)
+class ResumableSession:
+    session_id: str
+    endpoint: str
+    key: SessionKey
+    live: Optional[LiveSession]
+    recorder: TranscriptRecorder
+    downstream: RelayQueue
+    replay: ReplayBuffer
+    owner: Optional[str] = None     # User id of the token the session was started with
+    resume_key: str = field(default_factory=lambda: secrets.token_urlsafe(16), repr=False)
+    handle: Optional[str] = None    # Latest Gemini resumption handle
+    next_seq: int = 0               # Sequence number of the next outbound audio frame
+    codec: str = "pcm"              # Of the frames in `replay`; kept when the client resumes
+    parked_at: Optional[float] = None
+    # Set when the client reconnects before its old socket's handler noticed the drop
+    superseded: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _on_parked: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _expiry: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    async def reattach(self, connect: Callable[[SessionKey, Optional[str]], AsyncContextManager[Any]]) -> LiveSession:
+        """Returns the parked Gemini session, or reconnects with the resumption handle if it was lost."""
+        if self.live is None:
+            self.live = await LiveSession.open(self.key, connect(self.key, self.handle))
+        return self.live
+
+    def belongs_to(self, owner: Optional[str], resume_key: Optional[str]) -> bool:
+        return owner == self.owner and hmac.compare_digest(str(resume_key or ""), self.resume_key)
+
+    async def close_live(self) -> None:
+        """Closes the Gemini session, if one is open."""
+        live, self.live = self.live, None
+        if live is not None:
+            await live.close()
+
+    async def close(self) -> None:
+        """Ends the session for good: closes the Gemini session and stores the summary."""
+        await self.close_live()
+        await self.recorder.finish()
+
+
+class ResumptionRegistry:
+    def __init__(self, grace_seconds: float, max_parked: int, takeover_timeout: float = 2.0, enabled: bool = True):
+        """
+        Args:
+            grace_seconds: How long a parked session waits for its client
+            max_parked: Parked sessions this worker holds (each may keep a Gemini connection open)
+            takeover_timeout: How long a reconnect waits for the old socket's handler to let go
+            enabled: When False nothing is parked and every reconnect starts fresh
+        """
+        self.grace_seconds = grace_seconds
+        self.max_parked = max_parked
+        self.takeover_timeout = takeover_timeout
+        self.enabled = enabled
+
+        self._sessions: Dict[str, ResumableSession] = {}   # Relaying or parked
+
+        self.parked = 0
+        self.resumed = 0
+        self.takeovers = 0
+        self.expired = 0
+        self.rejected = 0
+        self.denied = 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for s in self._sessions.values() if s.parked_at is not None)
+
+    def track(self, session: ResumableSession) -> None:
+        """Registers a session that is relaying, so its client can take it over from a new socket."""
+        if self.enabled:
+            self._sessions[session.session_id] = session
+
+    def forget(self, session: ResumableSession) -> None:
+        """The session ended for good."""
+        if self._sessions.get(session.session_id) is session:
+            del self._sessions[session.session_id]
+
+    async def park(self, session: ResumableSession, upstream_ok: bool = True) -> bool:
+        """
+        Keeps `session` for its client to reclaim. Returns False when it
+        can't be resumed (resumption disabled, registry full, or the Gemini
+        session failed with no handle to reconnect). The caller then closes
+        it as usual.
+        """
+        if not self.enabled:
+            return False
+        if self.waiting >= self.max_parked:
+            self.rejected += 1
+            self.forget(session)
+            return False
+        if not upstream_ok:
+            if session.handle is None:
+                self.forget(session)
+                return False
+            # Keep only the handle; reattach() reconnects with it
+            lost, session.live = session.live, None
+            if lost is not None:
+                await lost.close()
+
+        session.parked_at = time.monotonic()
+        session._expiry = asyncio.create_task(self._expire(session))
+        self._sessions[session.session_id] = session
+        self.parked += 1
+        session._on_parked.set()
+        logger.info("⏸️ Parked %s session %s for %.0fs", session.endpoint, session.session_id, self.grace_seconds)
+        return True
+
+    async def claim(
+        self, session_id: Optional[str], endpoint: str, owner: Optional[str] = None, resume_key: Optional[str] = None
+    ) -> Optional[ResumableSession]:
+        """
+        Hands a session back to its reconnecting client, or returns None if
+        it's gone or the caller isn't the one who started it (other user,
+        wrong resume key). A client often notices a dead connection before
+        the server does; if the session is still relaying to the old socket,
+        that relay is ended and the session parked first.
+        """
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None or session.endpoint != endpoint:
+            return None
+        # Checked before a takeover, so a stranger can't even end the live relay
+        if not session.belongs_to(owner, resume_key):
+            self.denied += 1
+            logger.warning("🚫 Refused to resume %s session %s for another caller", endpoint, session_id)
+            return None
+
+        if session.parked_at is None:
+            session.superseded.set()
+            try:
+                await asyncio.wait_for(session._on_parked.wait(), self.takeover_timeout)
+            except asyncio.TimeoutError:
+                return None
+            if self._sessions.get(session_id) is not session or session.parked_at is None:
+                return None  # Not resumable after all, or another reconnect got it first
+            self.takeovers += 1
+
+        logger.info("▶️ Resumed %s session %s after %.1fs", endpoint, session_id, time.monotonic() - session.parked_at)
+        session._expiry.cancel()
+        session.parked_at = None
+        session.superseded.clear()
+        session._on_parked.clear()
+        self.resumed += 1
+        return session
+
+    async def _expire(self, session: ResumableSession) -> None:
+        await asyncio.sleep(self.grace_seconds)
+        if self._sessions.get(session.session_id) is not session or session.parked_at is None:
+            return
+        del self._sessions[session.session_id]
+        self.expired += 1
+        logger.info("⌛ Parked %s session %s expired", session.endpoint, session.session_id)
+        await session.close()
+
+    async def close(self) -> None:
+        """Shutdown: ends every parked session now."""
+        sessions = [s for s in self._sessions.values() if s.parked_at is not None]
+        self._sessions.clear()
+        for session in sessions:
+            session._expiry.cancel()
+        await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "max_parked": self.max_parked,
+            "parked": self.parked,
+            "resumed": self.resumed,
+            "takeovers": self.takeovers,
+            "expired": self.expired,
+            "rejected": self.rejected,
+            "denied": self.denied,
+        }
+
+
+# Shared by every realtime router on this worker
+resumption_registry = ResumptionRegistry(
+    grace_seconds=settings.SESSION_RESUME_GRACE_SECONDS,
+    max_parked=settings.SESSION_RESUME_MAX_PARKED,
+    takeover_timeout=settings.SESSION_RESUME_TAKEOVER_SECONDS,
+    enabled=settings.SESSION_RESUME_ENABLED,
+)
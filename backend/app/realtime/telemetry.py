@@ -0,0 +1,74 @@
+"""
+Per-session instrumentation for the realtime relays.
+
+A `SessionTelemetry` is opened for every WebSocket session and feeds the
+process-wide metrics in app/core/metrics.py: active sessions, time to first
+audio, per-turn latency, bytes and frames in each direction, relay queue
+delays and drops, and errors per stage. Label lookups are resolved once per
+session, so the per-frame cost is a couple of float additions.
+"""
+
+import time
+from typing import Callable, Optional
+
+from app.core import metrics
+from app.realtime.queues import RelayQueue
+
+UPSTREAM = "upstream"
+DOWNSTREAM = "downstream"
+
+
+class SessionTelemetry:
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started_at = time.monotonic()
+        self._first_audio_sent = False
+        self._turn_ended_at: Optional[float] = None
+
+        self._bytes = {d: metrics.AUDIO_BYTES.labels(endpoint, d) for d in (UPSTREAM, DOWNSTREAM)}
+        self._frames = {d: metrics.AUDIO_FRAMES.labels(endpoint, d) for d in (UPSTREAM, DOWNSTREAM)}
+
+    def __enter__(self) -> "SessionTelemetry":
+        metrics.ACTIVE_SESSIONS.labels(self.endpoint).inc()
+        metrics.SESSIONS_TOTAL.labels(self.endpoint).inc()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        metrics.ACTIVE_SESSIONS.labels(self.endpoint).dec()
+
+    def upstream(self, n_bytes: int) -> None:
+        """One frame sent to Gemini."""
+        self._bytes[UPSTREAM].inc(n_bytes)
+        self._frames[UPSTREAM].inc()
+
+    def downstream(self, n_bytes: int) -> None:
+        """One audio frame sent to the client."""
+        self._bytes[DOWNSTREAM].inc(n_bytes)
+        self._frames[DOWNSTREAM].inc()
+
+        now = time.monotonic()
+        if not self._first_audio_sent:
+            self._first_audio_sent = True
+            metrics.TIME_TO_FIRST_AUDIO.labels(self.endpoint).observe(now - self.started_at)
+        if self._turn_ended_at is not None:
+            metrics.TURN_LATENCY.labels(self.endpoint).observe(now - self._turn_ended_at)
+            self._turn_ended_at = None
+
+    def end_of_turn(self) -> None:
+        """The user's turn was closed; the next downstream audio measures response latency."""
+        self._turn_ended_at = time.monotonic()
+
+    def error(self, stage: str) -> None:
+        metrics.SESSION_ERRORS.labels(self.endpoint, stage).inc()
+
+    def queue_observer(self, stage: str) -> Callable[[float], None]:
+        """Callback for RelayQueue(on_delivered=...) recording per-item queue delay."""
+        return metrics.QUEUE_DELAY.labels(self.endpoint, stage).observe
+
+    def record_queue(self, queue: RelayQueue) -> None:
+        """Folds a finished session's queue counters into the process metrics."""
+        metrics.QUEUE_HIGH_WATER.labels(self.endpoint, queue.name).observe(queue.high_water_mark)
+        if queue.dropped:
+            metrics.QUEUE_DROPPED.labels(self.endpoint, queue.name, "overflow").inc(queue.dropped)
+        if queue.stale:
+            metrics.QUEUE_DROPPED.labels(self.endpoint, queue.name, "stale").inc(queue.stale)
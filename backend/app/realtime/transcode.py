@@ -0,0 +1,208 @@
+"""
+Pooled ffmpeg transcoding for browser audio.
+
+Browsers record WebM/Opus, but Gemini Live wants 16 kHz s16le PCM. The test
+router used to spawn a fresh ffmpeg for every WebSocket, which put process
+start-up on the connect path and let the number of decoders grow without
+bound.
+
+An ffmpeg process decoding a WebM stream from stdin can't be rewound for a
+second stream, so a decoder can't be shared by two sessions. The pool
+therefore reuses the slots and takes spawning off the hot path:
+
+- at most `max_workers` decoders run at once; later sessions wait in a queue
+  for up to `acquire_timeout` seconds before getting `TranscoderBusy`
+- `warm` idle processes are spawned ahead of time, so a session gets a
+  decoder that is already running, and each one taken is replaced in the
+  background
+- clients that already send PCM don't need a decoder at all (see
+  `PCM_PASSTHROUGH` in the router)
+"""
+
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Low-latency decode of a WebM stream on stdin to 16 kHz mono s16le on stdout.
+# -loglevel error keeps stderr quiet, so it only needs draining, not parsing.
+FFMPEG_WEBM_TO_PCM = [
+    "ffmpeg",
+    "-hide_banner", "-nostats", "-loglevel", "error",
+    "-fflags", "nobuffer",
+    "-probesize", "32", "-analyzeduration", "0",
+    "-f", "webm",               # Force input format
+    "-i", "pipe:0",             # Read from stdin
+    "-threads", "1",
+    "-f", "s16le",              # Output format
+    "-acodec", "pcm_s16le",     # Audio codec
+    "-ac", "1",                 # Channels
+    "-ar", "16000",             # Sample Rate
+    "pipe:1",                   # Write to stdout
+]
+
+# Read whatever ffmpeg has produced, up to this much, per wakeup
+READ_SIZE = 16384
+
+
+class TranscoderBusy(Exception):
+    pass
+
+
+class Transcoder:
+    """One leased ffmpeg process."""
+
+    def __init__(self, process: asyncio.subprocess.Process, spawned_at: float):
+        self.process = process
+        self.spawned_at = spawned_at
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    async def write(self, data: bytes) -> None:
+        self.process.stdin.write(data)
+        await self.process.stdin.drain()
+
+    async def read(self) -> bytes:
+        """Returns the next decoded PCM available, or b"" once output has ended."""
+        return await self.process.stdout.read(READ_SIZE)
+
+    def close_input(self) -> None:
+        if not self.process.stdin.is_closing():
+            self.process.stdin.close()
+
+    async def read_errors(self) -> str:
+        """Collects everything ffmpeg writes to stderr until it exits."""
+        return (await self.process.stderr.read()).decode(errors="replace").strip()
+
+    async def terminate(self, timeout: float = 2.0) -> None:
+        if self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+
+class TranscoderPool:
+    def __init__(self, command: List[str] = FFMPEG_WEBM_TO_PCM, max_workers: int = 32, warm: int = 2, acquire_timeout: float = 2.0):
+        self.command = command
+        self.max_workers = max_workers
+        self.warm = warm
+        self.acquire_timeout = acquire_timeout
+
+        self._slots = asyncio.Semaphore(max_workers)
+        self._idle: List[Transcoder] = []
+        self._refilling = 0
+        self._closed = False
+        self._tasks: set[asyncio.Task] = set()
+
+        self.active = 0
+        self.waiting = 0
+        self.spawned = 0
+        self.warm_hits = 0
+        self.rejected = 0
+
+    async def acquire(self) -> Transcoder:
+        """
+        Leases a decoder, waiting in line if all `max_workers` are busy.
+        Raises TranscoderBusy if no slot frees up within `acquire_timeout`.
+        """
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise TranscoderBusy(f"All {self.max_workers} transcoders busy")
+        finally:
+            self.waiting -= 1
+
+        try:
+            transcoder = self._pop_idle()
+            if transcoder is not None:
+                self.warm_hits += 1
+            else:
+                transcoder = await self._spawn()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self.active += 1
+        self._schedule_refill()
+        return transcoder
+
+    async def release(self, transcoder: Transcoder) -> None:
+        try:
+            transcoder.close_input()
+            await transcoder.terminate()
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def prewarm(self) -> None:
+        self._schedule_refill()
+
+    async def close(self) -> None:
+        self._closed = True
+        for task in list(self._tasks):
+            task.cancel()
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(t.terminate() for t in idle), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "warm": len(self._idle),
+            "waiting": self.waiting,
+            "max_workers": self.max_workers,
+            "spawned": self.spawned,
+            "warm_hits": self.warm_hits,
+            "rejected": self.rejected,
+        }
+
+    async def _spawn(self) -> Transcoder:
+        process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self.spawned += 1
+        return Transcoder(process, time.monotonic())
+
+    def _pop_idle(self) -> Optional[Transcoder]:
+        while self._idle:
+            transcoder = self._idle.pop()
+            if transcoder.process.returncode is None:
+                return transcoder
+        return None
+
+    def _schedule_refill(self) -> None:
+        if self._closed:
+            return
+        # Warm processes don't hold a slot, but never keep more than could be used
+        target = min(self.warm, self.max_workers - self.active)
+        for _ in range(target - len(self._idle) - self._refilling):
+            self._refilling += 1
+            task = asyncio.create_task(self._refill_one())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _refill_one(self) -> None:
+        try:
+            transcoder = await self._spawn()
+        except Exception as e:
+            logger.warning("TRANSCODER: could not pre-spawn ffmpeg - %s", e)
+            return
+        finally:
+            self._refilling -= 1
+
+        if self._closed:
+            await transcoder.terminate()
+        else:
+            self._idle.append(transcoder)
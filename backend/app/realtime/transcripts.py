@@ -0,0 +1,175 @@
+"""
+Transcripts of speaking and chat sessions.
+
+Gemini Live transcribes both sides of the conversation when the session is
+opened with TRANSCRIPTION_CONFIG. The relay hands every fragment to the
+session's TranscriptRecorder, which:
+
+- returns the `{"type": "text", "role": ..., "data": ...}` message to
+  forward to the client
+- joins fragments into whole turns and queues each finished turn on
+  `transcript_writer` (a BatchWriter), so on the relay path storing a
+  transcript is an in-memory append and the inserts happen elsewhere
+
+When the session ends, `finish()` asks a text model for a few lines of
+tutor notes. The call is bounded by TRANSCRIPT_SUMMARY_TIMEOUT_SECONDS,
+with a plain fallback. The notes are stored as a SessionSummary and
+returned as the client's `{"type": "summary"}` message, ready to send as
+`new_notes` to /lessons/complete.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import WebSocket
+
+from app.core.batching import BatchWriter
+from app.core.config import settings
+from app.core.gemini import get_client
+from app.schemas.transcript import SessionSummary, TranscriptTurn
+
+logger = logging.getLogger(__name__)
+
+# Added to the Live connect config of every transcribed session
+TRANSCRIPTION_CONFIG = {"input_audio_transcription": {}, "output_audio_transcription": {}}
+
+SPEAKERS = {"user": "Learner", "tutor": "Tutor"}
+
+SUMMARY_PROMPT = """You are a language tutor writing notes for your next lesson with this learner.
+Below is the transcript of a spoken {language} practice session{topic}.
+In 2-3 short sentences of English, note what the learner did well, what they
+struggled with (grammar, vocabulary, pronunciation) and what to practise next.
+Reply with the notes only.
+
+{transcript}"""
+
+transcript_writer = BatchWriter(
+    "transcript turns",
+    TranscriptTurn.get_motor_collection,
+    batch_size=settings.TRANSCRIPT_BATCH_SIZE,
+    flush_interval=settings.TRANSCRIPT_FLUSH_SECONDS,
+    max_buffer=settings.TRANSCRIPT_MAX_BUFFER,
+)
+
+
+class TranscriptRecorder:
+    def __init__(
+        self,
+        endpoint: str,
+        language: Optional[str] = None,
+        topic: Optional[str] = None,
+        mode: Optional[str] = None,
+        owner: Optional[str] = None,
+    ):
+        self.session_id = uuid.uuid4().hex
+        self.owner = owner  # User id from the socket's token; None for anonymous sessions
+        self.endpoint = endpoint
+        self.language = language
+        self.topic = topic
+        self.mode = mode
+        self.started_at = datetime.now(timezone.utc)
+
+        self.turns: List[Tuple[str, str]] = []      # (role, text), in speaking order
+        self._pending: Dict[str, List[str]] = {}    # Fragments of the turn in progress, per role
+
+    def add(self, role: str, text: str) -> dict:
+        """Records one transcription fragment and returns the message for the client."""
+        self._pending.setdefault(role, []).append(text)
+        return {"type": "text", "role": role, "data": text}
+
+    def complete_turn(self) -> None:
+        """Closes the exchange in progress: each side's fragments become one stored turn."""
+        now = datetime.now(timezone.utc)
+        for role, fragments in self._pending.items():
+            text = " ".join("".join(fragments).split())
+            if not text:
+                continue
+            self.turns.append((role, text))
+            if settings.TRANSCRIPTS_ENABLED:
+                transcript_writer.record({
+                    "session_id": self.session_id,
+                    "user_id": self.owner,
+                    "seq": len(self.turns) - 1,
+                    "role": role,
+                    "text": text,
+                    "created_at": now,
+                })
+        self._pending.clear()
+
+    def _transcript(self) -> str:
+        lines = [f"{SPEAKERS[role]}: {text}" for role, text in self.turns]
+        # Keep the most recent part of long sessions
+        return "\n".join(lines)[-settings.TRANSCRIPT_SUMMARY_MAX_CHARS:]
+
+    def _fallback_notes(self) -> str:
+        said = [text for role, text in self.turns if role == "user"]
+        if not said:
+            return "No speech from the learner was recorded in this session."
+        about = f" about {self.topic}" if self.topic else ""
+        words = sum(len(text.split()) for text in said)
+        return f'Spoke {len(said)} time(s){about}, {words} words in total. Last said: "{said[-1][:200]}"'
+
+    async def summarize(self) -> Tuple[str, str]:
+        """Returns (notes, source) where source is "model" or "fallback"."""
+        if not any(role == "user" for role, _ in self.turns):
+            return self._fallback_notes(), "fallback"
+
+        prompt = SUMMARY_PROMPT.format(
+            language=self.language or "language",
+            topic=f" about {self.topic}" if self.topic else "",
+            transcript=self._transcript(),
+        )
+        try:
+            response = await asyncio.wait_for(
+                get_client("v1beta").aio.models.generate_content(model=settings.TRANSCRIPT_SUMMARY_MODEL, contents=prompt),
+                settings.TRANSCRIPT_SUMMARY_TIMEOUT_SECONDS,
+            )
+            notes = (response.text or "").strip()
+            if notes:
+                return notes, "model"
+        except Exception as e:
+            logger.warning("Transcript summary failed for %s: %s", self.session_id, e)
+        return self._fallback_notes(), "fallback"
+
+    async def finish(self) -> Optional[dict]:
+        """
+        Ends the session: stores the last turn, summarizes and stores the
+        summary. Returns the client's summary message, or None when there's
+        nothing to summarize.
+        """
+        self.complete_turn()
+        if not settings.TRANSCRIPTS_ENABLED or not self.turns:
+            return None
+
+        notes, source = await self.summarize()
+        try:
+            await SessionSummary.get_motor_collection().insert_one({
+                "session_id": self.session_id,
+                "user_id": self.owner,
+                "endpoint": self.endpoint,
+                "language": self.language,
+                "topic": self.topic,
+                "mode": self.mode,
+                "started_at": self.started_at,
+                "ended_at": datetime.now(timezone.utc),
+                "turns": len(self.turns),
+                "notes": notes,
+                "source": source,
+            })
+        except Exception as e:
+            logger.warning("Storing the summary of %s failed: %s", self.session_id, e)
+        return {"type": "summary", "session_id": self.session_id, "notes": notes}
+
+
+async def send_summary(recorder: TranscriptRecorder, websocket: WebSocket) -> None:
+    """Finishes the transcript and, if the client is still connected, sends it the summary."""
+    message = await recorder.finish()
+    if message is None:
+        return
+    try:
+        await websocket.send_json(message)
+    except Exception:
+        pass  # Client already gone; it can fetch the summary by session id
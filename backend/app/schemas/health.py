@@ -1,6 +1,19 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class HealthResponse(BaseModel):
     status: str
     version: str
-    environment: str = "production"
\ No newline at end of file
+    environment: str = "production"
+
+class PoolUsage(BaseModel):
+    open: int
+    in_use: int
+    max_size: int
+
+
+class ReadinessResponse(BaseModel):
+    status: str                                 # "ready", "unavailable" or "draining"
+    database: str                               # "ok", "connecting" or "unreachable"
+    ping_ms: Optional[float] = None
+    pool: PoolUsage
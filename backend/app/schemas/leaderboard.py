@@ -0,0 +1,60 @@
+from datetime import date, datetime
+from typing import List, Optional
+from pydantic import BaseModel
+from beanie import Document, PydanticObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Scope of the global board. Language boards are namespaced, so no language
+# name (not even "global") can land on the global board's entries.
+GLOBAL_SCOPE = "global"
+LANGUAGE_SCOPE_PREFIX = "lang:"
+
+
+def language_scope(language: str) -> str:
+    return f"{LANGUAGE_SCOPE_PREFIX}{language}"
+
+class LeaderboardEntry(Document):
+    """
+    One user's standing on one board, kept up to date by lesson completions
+    so leaderboards never have to sort the `users` collection.
+    """
+    user_id: PydanticObjectId
+    scope: str                              # GLOBAL_SCOPE or language_scope(<language>)
+    first_name: str
+
+    lessons: int = 0                        # Global: all lessons; language boards: lessons in that language
+    streak: int = 0
+    minutes: int = 0                        # Global board only
+    last_active_date: Optional[date] = None
+    version: int = 0                        # users.version this entry was built from
+    updated_at: datetime
+
+    class Settings:
+        name = "leaderboard"
+        indexes = [
+            # Upserts and "my entries"; user_id first so it also serves user-only lookups
+            IndexModel([("user_id", ASCENDING), ("scope", ASCENDING)], unique=True),
+            # One per ranking: top-N is an index walk, "my rank" an index-only count
+            IndexModel([("scope", ASCENDING), ("lessons", DESCENDING), ("user_id", ASCENDING)]),
+            # Streak boards only rank live streaks; last_active_date keeps that filter in the index
+            IndexModel([("scope", ASCENDING), ("streak", DESCENDING), ("user_id", ASCENDING), ("last_active_date", ASCENDING)]),
+            IndexModel([("scope", ASCENDING), ("minutes", DESCENDING), ("user_id", ASCENDING)]),
+        ]
+
+class LeaderboardRow(BaseModel):
+    rank: int
+    user_id: str
+    first_name: str
+    value: int
+
+class LeaderboardResponse(BaseModel):
+    scope: str                              # "global" or the language name
+    metric: str
+    entries: List[LeaderboardRow]
+
+class RankResponse(BaseModel):
+    scope: str                              # "global" or the language name
+    metric: str
+    rank: Optional[int] = None              # None until the user has an entry on this board
+    value: int = 0
+    out_of: int
@@ -1,16 +1,64 @@
-from pydantic import BaseModel
-from typing import Optional
+import re
+from datetime import date
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
 
-class LessonCompletionRequest(BaseModel):
-    # Auth credentials (hackathon style)
-    email: str
-    password_hash: str
+from app.schemas.user import UserProfile
 
-    # Lesson Details
+# Language names become field names (`languages_studied.<language>`), so
+# they can't contain "." or start with "$"
+LANGUAGE_PATTERN = re.compile(r"^[^\W\d_][\w '()\-]{0,39}$")
+
+
+def validate_language(value: str) -> str:
+    value = value.strip()
+    if not LANGUAGE_PATTERN.match(value):
+        raise ValueError("language must be a name of up to 40 letters, spaces, hyphens or apostrophes")
+    return value
+
+
+class LessonDetails(BaseModel):
     language: str          # e.g., "Spanish"
     lesson_id: str         # e.g., "span_01"
     time_spent: int        # in minutes
     rating: int            # 1-5
     
     # Generated by LLM
-    new_notes: str         # "User struggled with..."
\ No newline at end of file
+    new_notes: str         # "User struggled with..."
+
+    @field_validator("language")
+    @classmethod
+    def check_language(cls, value: str) -> str:
+        return validate_language(value)
+
+
+class LessonCompletionRequest(LessonDetails):
+    # Auth credentials (hackathon style). Optional when the request carries
+    # an `Authorization: Bearer <session token>` header instead.
+    email: Optional[str] = None
+    password_hash: Optional[str] = None
+
+
+# Offline sync: completions recorded on the device, replayed in one request
+class LessonSyncItem(LessonDetails):
+    idempotency_key: str = Field(min_length=1, max_length=64)   # Generated by the client per completion
+    completed_on: date     # Learner's local date when the lesson was finished
+
+
+class LessonSyncRequest(BaseModel):
+    email: Optional[str] = None
+    password_hash: Optional[str] = None
+    completions: List[LessonSyncItem]
+
+
+class LessonSyncResult(BaseModel):
+    idempotency_key: str
+    # applied: counted now / duplicate: already counted by an earlier sync /
+    # rejected: not counted (see `detail`)
+    status: Literal["applied", "duplicate", "rejected"]
+    detail: Optional[str] = None
+
+
+class LessonSyncResponse(BaseModel):
+    results: List[LessonSyncResult]    # Same order as the request
+    user: UserProfile
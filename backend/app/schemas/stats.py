@@ -0,0 +1,101 @@
+from datetime import date, datetime
+from typing import List, Optional
+from pydantic import BaseModel
+from beanie import Document, Granularity, PydanticObjectId, TimeSeriesConfig
+from pymongo import ASCENDING, IndexModel
+
+from app.core.config import settings
+
+class LessonEvent(Document):
+    """
+    One lesson completion, written once and never updated. The counters on
+    User answer "how much so far"; these answer "what happened when".
+    """
+    timestamp: datetime                     # When the server recorded it (UTC)
+    language: str                           # Meta field: one language's events share buckets
+    user_id: PydanticObjectId
+    lesson_id: str
+    time_spent: int                         # Minutes
+    rating: int
+    completed_on: date                      # Learner's local date; rollups bucket by this (earlier than timestamp for offline sync)
+    source: str = "complete"                # "complete" or "sync"
+
+    class Settings:
+        name = "lesson_events"
+        timeseries = TimeSeriesConfig(
+            time_field="timestamp",
+            meta_field="language",
+            granularity=Granularity.minutes,
+            expire_after_seconds=settings.LESSON_EVENTS_RETENTION_DAYS * 86400 or None,
+        ) if settings.LESSON_EVENTS_TIMESERIES else None
+
+class DailyUserStats(Document):
+    """Rollup: one user's activity in one language on one day (completed_on)."""
+    day: date
+    user_id: PydanticObjectId
+    language: str
+    lessons: int = 0
+    minutes: int = 0
+    rating_sum: int = 0
+    rating_count: int = 0
+
+    class Settings:
+        name = "stats_daily_user"
+        indexes = [
+            # $merge key; user first so it also serves "my stats" range reads
+            IndexModel([("user_id", ASCENDING), ("day", ASCENDING), ("language", ASCENDING)], unique=True),
+            # Re-aggregating a day into DailyLanguageStats
+            IndexModel([("day", ASCENDING)]),
+        ]
+
+class DailyLanguageStats(Document):
+    """Rollup: everyone's activity in one language on one day (completed_on)."""
+    day: date
+    language: str
+    lessons: int = 0
+    minutes: int = 0
+    rating_sum: int = 0
+    rating_count: int = 0
+    learners: int = 0                       # Distinct users active that day
+
+    class Settings:
+        name = "stats_daily_language"
+        indexes = [
+            IndexModel([("day", ASCENDING), ("language", ASCENDING)], unique=True),
+        ]
+
+class DailyStatsRow(BaseModel):
+    day: date
+    lessons: int
+    minutes: int
+    average_rating: Optional[float] = None
+    learners: Optional[int] = None          # Summed across languages on the global series
+
+class DailyStatsResponse(BaseModel):
+    language: Optional[str] = None          # None = all languages
+    days: List[DailyStatsRow]
+
+class LanguageStatsRow(BaseModel):
+    language: str
+    lessons: int
+    minutes: int
+    average_rating: Optional[float] = None
+    learner_days: int                       # Sum of daily distinct learners
+
+class LanguageStatsResponse(BaseModel):
+    since: date
+    languages: List[LanguageStatsRow]
+
+class UserDayRow(BaseModel):
+    day: date
+    language: str
+    lessons: int
+    minutes: int
+    average_rating: Optional[float] = None
+
+class UserStatsResponse(BaseModel):
+    since: date
+    lessons: int
+    minutes: int
+    active_days: int
+    days: List[UserDayRow]
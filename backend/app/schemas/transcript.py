@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+from beanie import Document, Indexed
+from pymongo import ASCENDING, IndexModel
+
+Role = Literal["user", "tutor"]
+
+class TranscriptTurn(Document):
+    """One uninterrupted utterance in a speaking or chat session; written once, in batches."""
+    session_id: str
+    user_id: Optional[str] = None           # Owner, when the session was opened with a token
+    seq: int                                # Order within the session
+    role: Role
+    text: str
+    created_at: datetime
+
+    class Settings:
+        name = "transcript_turns"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("seq", ASCENDING)]),
+        ]
+
+class SessionSummary(Document):
+    """Written once when a session ends; `notes` pre-fills new_notes for /lessons/complete."""
+    session_id: Indexed(str, unique=True)
+    user_id: Optional[str] = None           # Owner, when the session was opened with a token
+    endpoint: str                           # "speaking" or "chat"
+    language: Optional[str] = None
+    topic: Optional[str] = None
+    mode: Optional[str] = None
+    started_at: datetime
+    ended_at: datetime
+    turns: int
+    notes: str
+    source: Literal["model", "fallback"]    # fallback: the summary model failed or timed out
+
+    class Settings:
+        name = "session_summaries"
+
+class SummaryResponse(BaseModel):
+    session_id: str
+    language: Optional[str] = None
+    topic: Optional[str] = None
+    turns: int
+    notes: str
+
+class TranscriptLine(BaseModel):
+    seq: int
+    role: Role
+    text: str
+
+class TranscriptResponse(BaseModel):
+    session_id: str
+    turns: List[TranscriptLine]
@@ -1,18 +1,18 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 from datetime import date, datetime  # <--- NEW IMPORT
-from pydantic import BaseModel
-from beanie import Document, Indexed
+from pydantic import AliasChoices, BaseModel, Field, field_validator
+from beanie import Document, Indexed, PydanticObjectId
 
 class LanguageProgress(BaseModel):
     language: str              
     level: str                 
-    completed_lessons: List[str] 
+    completed_lessons: Set[str] = set()  # Stored as an array, updated with set semantics
     last_lesson_rating: Optional[int] = None 
     previous_lesson_notes: Optional[str] = None 
 
 class User(Document):
     email: Indexed(str, unique=True)
-    password_hash: str
+    password_hash: str      # bcrypt (app/core/passwords.py); as sent for accounts not logged into since
     first_name: str
     
     # Stats
@@ -23,12 +23,115 @@ class User(Document):
     total_time_spent: int = 0 # <--- NEW: Minutes spent learning
     
     last_lesson_language: Optional[str] = None
-    languages_studied: List[LanguageProgress] = []
+    # Keyed by language name, so one language is read/updated by path
+    # (`languages_studied.Spanish`) instead of scanning a list
+    languages_studied: Dict[str, LanguageProgress] = {}
+
+    # Bumped by every write that changes the profile; the profile ETag
+    version: int = 0
+
+    @field_validator("languages_studied", mode="before")
+    @classmethod
+    def key_legacy_progress(cls, value):
+        # Documents written before the keyed layout hold a list of entries;
+        # they're converted on their next lesson completion or by the migration
+        if isinstance(value, list):
+            return {entry["language"]: entry for entry in value}
+        return value
 
     class Settings:
         name = "users"
         
+# Legacy documents still hold a list of entries (see key_legacy_progress)
+_PROGRESS_ENTRIES = {
+    "$cond": [
+        {"$isArray": "$languages_studied"},
+        {"$map": {"input": "$languages_studied", "as": "p", "in": {"k": "$$p.language", "v": "$$p"}}},
+        {"$objectToArray": {"$ifNull": ["$languages_studied", {}]}},
+    ]
+}
+
+
+class LanguageSummary(BaseModel):
+    language: str
+    level: str
+    completed_count: int = 0
+    last_lesson_rating: Optional[int] = None
+
+
+class UserProfile(BaseModel):
+    """
+    What clients get back instead of the User document: no password hash,
+    no lesson notes, and a count instead of every completed lesson id. The
+    projection computes it inside MongoDB, so neither side of the wire
+    grows with the user's history.
+    """
+    id: PydanticObjectId = Field(validation_alias=AliasChoices("_id", "id"))
+    email: str
+    first_name: str
+    daily_streak: int = 0
+    last_active_date: Optional[date] = None
+    total_lessons_completed: int = 0
+    total_time_spent: int = 0
+    last_lesson_language: Optional[str] = None
+    languages_studied: Dict[str, LanguageSummary] = {}
+    version: int = 0
+
+    class Settings:
+        projection = {
+            "email": 1,
+            "first_name": 1,
+            "daily_streak": 1,
+            "last_active_date": 1,
+            "total_lessons_completed": 1,
+            "total_time_spent": 1,
+            "last_lesson_language": 1,
+            "version": 1,
+            "languages_studied": {
+                "$arrayToObject": {
+                    "$map": {
+                        "input": _PROGRESS_ENTRIES,
+                        "as": "entry",
+                        "in": {
+                            "k": "$$entry.k",
+                            "v": {
+                                "language": "$$entry.v.language",
+                                "level": "$$entry.v.level",
+                                "completed_count": {"$size": {"$ifNull": ["$$entry.v.completed_lessons", []]}},
+                                "last_lesson_rating": "$$entry.v.last_lesson_rating",
+                            },
+                        },
+                    }
+                }
+            },
+        }
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserProfile":
+        """Same shape as the projection, for a User that's already in memory."""
+        data = user.model_dump(include=set(cls.model_fields) - {"id", "languages_studied"})
+        return cls(
+            id=user.id,
+            languages_studied={
+                key: LanguageSummary(
+                    language=progress.language,
+                    level=progress.level,
+                    completed_count=len(progress.completed_lessons),
+                    last_lesson_rating=progress.last_lesson_rating,
+                )
+                for key, progress in user.languages_studied.items()
+            },
+            **data,
+        )
+
+
 class UserSignup(BaseModel):
     email: str
     password_hash: str
-    first_name: str
\ No newline at end of file
+    first_name: str
+
+# What a session token resolves to (kept in the in-process identity cache)
+class SessionIdentity(BaseModel):
+    user_id: str
+    email: str
+    first_name: str
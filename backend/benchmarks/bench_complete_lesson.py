@@ -0,0 +1,132 @@
+"""
+Concurrent lesson completions for a single user.
+
+Compares the old load/modify/save flow against the atomic pipeline update
+used by POST /lessons/complete. For each strategy it fires N completions for
+the same user with a fixed number in flight, then reports throughput and how
+many updates were lost (expected vs. stored `total_lessons_completed`).
+
+Usage:
+    python -m benchmarks.bench_complete_lesson --concurrency 50 --requests 500
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+import certifi
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+
+from app.api.routes.lessons import build_completion_pipeline
+from app.core.config import settings
+from app.schemas.lesson import LessonCompletionRequest
+from app.schemas.user import LanguageProgress, User
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-hash"
+
+
+def make_payload(i: int) -> LessonCompletionRequest:
+    return LessonCompletionRequest(
+        email=EMAIL,
+        password_hash=PASSWORD,
+        language="Spanish",
+        lesson_id=f"span_{i % 40:02d}",
+        time_spent=5,
+        rating=4,
+        new_notes="User struggled with the subjunctive. " * 10,
+    )
+
+
+async def legacy_complete(payload: LessonCompletionRequest):
+    """The pre-pipeline implementation: two round trips and a full-document write."""
+    user = await User.find_one(User.email == payload.email)
+    today = date.today()
+    if user.last_active_date == today:
+        pass
+    elif user.last_active_date == today - timedelta(days=1):
+        user.daily_streak += 1
+    else:
+        user.daily_streak = 1
+    user.last_active_date = today
+    user.total_lessons_completed += 1
+    user.total_time_spent += payload.time_spent
+    user.last_lesson_language = payload.language
+
+    target = user.languages_studied.get(payload.language)
+    if target:
+        target.completed_lessons.add(payload.lesson_id)
+        target.last_lesson_rating = payload.rating
+        target.previous_lesson_notes = payload.new_notes
+    else:
+        user.languages_studied[payload.language] = LanguageProgress(
+            language=payload.language,
+            level="Beginner",
+            completed_lessons={payload.lesson_id},
+            last_lesson_rating=payload.rating,
+            previous_lesson_notes=payload.new_notes,
+        )
+    await user.save()
+
+
+async def atomic_complete(payload: LessonCompletionRequest):
+    await User.get_motor_collection().find_one_and_update(
+        {"email": payload.email, "password_hash": payload.password_hash},
+        build_completion_pipeline(payload, date.today()),
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run(strategy, total: int, concurrency: int) -> dict:
+    await User.find(User.email == EMAIL).delete()
+    await User(email=EMAIL, password_hash=PASSWORD, first_name="Bench").insert()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await strategy(make_payload(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    user = await User.find_one(User.email == EMAIL)
+    return {
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed,
+        "stored_total": user.total_lessons_completed,
+        "lost_updates": total - user.total_lessons_completed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--database", default=None, help="Database to use (default: <app db>_bench)")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL, tlsCAFile=certifi.where())
+    db_name = args.database or f"{client.get_default_database().name}_bench"
+    await init_beanie(database=client[db_name], document_models=[User])
+
+    try:
+        for name, strategy in (("legacy load/save", legacy_complete), ("atomic pipeline", atomic_complete)):
+            result = await run(strategy, args.requests, args.concurrency)
+            print(
+                f"{name:<18} {result['throughput_rps']:8.1f} req/s  "
+                f"{result['elapsed_s']:6.2f}s  "
+                f"stored={result['stored_total']}/{args.requests}  "
+                f"lost={result['lost_updates']}"
+            )
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
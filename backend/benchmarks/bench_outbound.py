@@ -0,0 +1,150 @@
+"""
+What a client receives for a model reply: forwarded as it arrives vs. framed
+and paced by `OutboundAudio`, as PCM or as Opus.
+
+Replays Gemini-like replies (uneven parts, several times faster than real
+time) through each mode into a fake socket, concurrently for `--sessions`
+sessions, in process and without a server. Reports per reply:
+
+- messages and wire KB (base64 + JSON for the legacy protocol)
+- frame_cv: spread of frame durations (stdev / mean; 0 = all the same)
+- peak_lead_ms: the most audio the client ever held beyond what it had
+  played. Everything above the pacing lead sat in network buffers ahead of
+  the next control message.
+- first_ms: reply start to its first frame
+- cpu_ms_per_s: CPU per second of reply audio (Opus includes ffmpeg)
+
+    python -m benchmarks.bench_outbound --sessions 20 --replies 3
+    python -m benchmarks.bench_outbound --modes forward-json,pcm
+
+The opus mode needs ffmpeg with libopus on PATH and is skipped without it.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import time
+
+os.environ.setdefault("MONGODB_URL", "mongodb://in-memory/bench")
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+
+from app.realtime.outbound import BYTES_PER_MS, OutboundAudio, opus_encoders, opus_packet_ms  # noqa: E402
+from app.realtime.protocol import HEADER, PROTOCOL_BINARY, PROTOCOL_JSON, AudioSender  # noqa: E402
+from benchmarks.fakes import OUTPUT_RATE, synthetic_pcm  # noqa: E402
+
+MODES = ("forward-json", "forward-binary", "pcm", "opus")
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.frames = []    # (received_at, wire bytes, audio ms)
+        self.codec = "pcm"
+
+    def _audio_ms(self, payload: bytes) -> float:
+        return opus_packet_ms(payload) if self.codec == "opus" else len(payload) / BYTES_PER_MS
+
+    async def send_bytes(self, data: bytes):
+        self.frames.append((time.monotonic(), len(data), self._audio_ms(data[HEADER.size:])))
+
+    async def send_json(self, message: dict):
+        wire = json.dumps(message)
+        self.frames.append((time.monotonic(), len(wire), len(message["data"]) * 3 / 4 / BYTES_PER_MS))
+
+
+def reply_parts(reply_ms: int, rng: random.Random) -> list:
+    """Uneven parts, 20-120 ms each, like the Live API's."""
+    parts, left = [], reply_ms
+    while left > 0:
+        ms = min(left, rng.choice((20, 40, 40, 60, 80, 120)))
+        parts.append(synthetic_pcm(ms, rate=OUTPUT_RATE))
+        left -= ms
+    return parts
+
+
+def reply_stats(frames: list, started: float) -> dict:
+    durations = [ms for _, _, ms in frames]
+    first = frames[0][0]
+    # The client plays what it has in real time and waits when it runs out
+    peak, buffered_until = 0.0, first
+    for at, _, ms in frames:
+        buffered_until = max(buffered_until, at) + ms / 1000
+        peak = max(peak, (buffered_until - at) * 1000)
+    mean = statistics.mean(durations)
+    return {
+        "messages": len(frames),
+        "wire_kb": sum(n for _, n, _ in frames) / 1024,
+        "frame_cv": statistics.pstdev(durations) / mean if mean else 0.0,
+        "peak_lead_ms": peak,
+        "first_ms": (first - started) * 1000,
+    }
+
+
+async def run_session(mode: str, args, seed: int) -> list:
+    rng = random.Random(seed)
+    socket = RecordingSocket()
+    protocol = PROTOCOL_JSON if mode == "forward-json" else PROTOCOL_BINARY
+    sender = AudioSender(socket, protocol)
+    outbound = None
+    if mode in ("pcm", "opus"):
+        outbound = await OutboundAudio.open(sender, mode)
+        socket.codec = outbound.codec
+    results = []
+    try:
+        for _ in range(args.replies):
+            parts = reply_parts(args.reply_ms, rng)
+            gap = args.reply_ms / len(parts) / args.speedup / 1000
+            mark = len(socket.frames)
+            started = time.monotonic()
+            for pcm in parts:
+                if outbound is None:
+                    await sender.send(pcm)
+                else:
+                    await outbound.send(pcm)
+                await asyncio.sleep(gap)
+            if outbound is not None:
+                await outbound.end_turn()
+            # Let the reply play out before the next one, like a conversation
+            await asyncio.sleep(args.reply_ms / 1000 + 0.3)
+            results.append(reply_stats(socket.frames[mark:], started))
+    finally:
+        if outbound is not None:
+            await outbound.close()
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions per mode")
+    parser.add_argument("--replies", type=int, default=3, help="Replies per session")
+    parser.add_argument("--reply-ms", type=int, default=4000)
+    parser.add_argument("--speedup", type=float, default=4.0, help="How much faster than real time replies arrive")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.replies} replies of {args.reply_ms} ms, arriving {args.speedup}x real time")
+    print(f"{'mode':<15} {'messages':>8} {'wire_kb':>8} {'frame_cv':>8} {'peak_lead_ms':>12} {'first_ms':>8} {'cpu_ms_per_s':>12}")
+    for mode in args.modes.split(","):
+        if mode == "opus" and not shutil.which("ffmpeg"):
+            print(f"{mode:<15} skipped: ffmpeg not found")
+            continue
+        cpu_before = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+        sessions = await asyncio.gather(*(run_session(mode, args, seed) for seed in range(args.sessions)))
+        cpu_after = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = sum(a.ru_utime + a.ru_stime - b.ru_utime - b.ru_stime for a, b in zip(cpu_after, cpu_before))
+        replies = [r for s in sessions for r in s]
+        audio_s = len(replies) * args.reply_ms / 1000
+
+        def median(key):
+            return statistics.median(r[key] for r in replies)
+        print(f"{mode:<15} {median('messages'):>8.0f} {median('wire_kb'):>8.1f} {median('frame_cv'):>8.2f} "
+              f"{median('peak_lead_ms'):>12.0f} {median('first_ms'):>8.1f} {cpu * 1000 / audio_s:>12.2f}")
+    await opus_encoders.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Cost of a rate limit check with the in-memory store.
+
+Times `limiter.hit()` (one token bucket, as on every HTTP request) and a
+realtime `acquire()` + `release()` pair (connect bucket, daily minutes and
+session counters for an IP and a user) over many distinct callers, in
+process and without a server:
+
+    python -m benchmarks.bench_ratelimit --callers 10000 --checks 200000
+
+A store shared across workers adds its own round trip on top of this.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("MONGODB_URL", "mongodb://in-memory/bench")
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("SESSION_SECRET", "bench-secret")
+
+from app.core.ratelimit import MemoryRateLimitStore, Rate, RateLimited, RateLimiter  # noqa: E402
+from app.core.security import create_session_token  # noqa: E402
+from app.realtime.quotas import RealtimeQuotas  # noqa: E402
+from app.schemas.user import SessionIdentity  # noqa: E402
+
+
+class FakeSocket:
+    def __init__(self, ip: str, token: str):
+        self.client = type("Address", (), {"host": ip})()
+        self.headers = {}
+        self.query_params = {"token": token}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=10_000)
+    parser.add_argument("--checks", type=int, default=200_000)
+    args = parser.parse_args()
+
+    limiter = RateLimiter(MemoryRateLimitStore(max_keys=args.callers * 4))
+    rate = Rate(1_000_000)  # Never limited: measures the allowed path
+    keys = [f"ip:10.0.{i // 256}.{i % 256}" for i in range(args.callers)]
+
+    started = time.perf_counter()
+    for i in range(args.checks):
+        await limiter.hit("api", keys[i % args.callers], rate)
+    per_check = (time.perf_counter() - started) / args.checks * 1e6
+    print(f"hit              {per_check:6.2f} us/check  ({args.checks} checks, {args.callers} callers)")
+
+    quotas = RealtimeQuotas(limiter, per_minute_ip=1_000_000, sessions_per_ip=10, sessions_per_user=2,
+                            minutes_per_day_ip=600, minutes_per_day_user=120)
+    sockets = [
+        FakeSocket(f"10.1.{i // 256}.{i % 256}",
+                   create_session_token(SessionIdentity(user_id=f"{i:024x}", email=f"u{i}@example.com", first_name="U")))
+        for i in range(min(args.callers, 2000))
+    ]
+    sessions = args.checks // 10
+    started = time.perf_counter()
+    for i in range(sessions):
+        lease = await quotas.acquire(sockets[i % len(sockets)])
+        await quotas.release(lease)
+    per_session = (time.perf_counter() - started) / sessions * 1e6
+    print(f"realtime session {per_session:6.2f} us/session  (acquire + release, IP and user)")
+
+    # And the limited path, once a caller is over its rate
+    tight = Rate(1)
+    await limiter.hit("login", "email:x", tight)
+    started = time.perf_counter()
+    for _ in range(args.checks):
+        try:
+            await limiter.hit("login", "email:x", tight)
+        except RateLimited:
+            pass
+    per_check = (time.perf_counter() - started) / args.checks * 1e6
+    print(f"rejected hit     {per_check:6.2f} us/check")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Config-to-ready latency of the speaking WebSocket.
+
+Opens sessions against a running server, sends the config message and times
+how long `{"type": "ready"}` takes to arrive. Run it once against a server
+started normally and once with GEMINI_SESSION_POOL_ENABLED=false to compare
+warm (pooled) and cold (connect-on-demand) setup:
+
+    uvicorn app.main:app --port 8000
+    python -m benchmarks.bench_speaking_ready --sessions 20
+
+    GEMINI_SESSION_POOL_ENABLED=false uvicorn app.main:app --port 8000
+    python -m benchmarks.bench_speaking_ready --sessions 20
+
+`--pause` leaves time between sessions for the pool to refill, which is
+what a real user sees; set it to 0 to measure a burst that drains the pool.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+
+async def one_session(url: str, language: str, topic: str, mode: str) -> dict:
+    async with websockets.connect(url) as ws:
+        sent_at = time.perf_counter()
+        await ws.send(json.dumps({"type": "config", "language": language, "topic": topic, "mode": mode}))
+        while True:
+            message = json.loads(await ws.recv())
+            if message.get("type") == "ready":
+                elapsed_ms = (time.perf_counter() - sent_at) * 1000
+                await ws.send(json.dumps({"type": "close"}))
+                return {"ms": elapsed_ms, "warm": bool(message.get("warm"))}
+            if message.get("type") == "error":
+                raise RuntimeError(message.get("message"))
+
+
+def summarize(label: str, samples: list) -> None:
+    if not samples:
+        return
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:<6} n={len(samples):<4} "
+        f"mean={statistics.mean(samples):8.1f} ms  "
+        f"p50={statistics.median(samples):8.1f} ms  "
+        f"p95={p95:8.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000/api/v1/speaking/ws/audio-chat")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--pause", type=float, default=2.0, help="Seconds between sessions")
+    parser.add_argument("--language", default="Spanish")
+    parser.add_argument("--topic", default="Greetings")
+    parser.add_argument("--mode", default="Assisted")
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.sessions):
+        results.append(await one_session(args.url, args.language, args.topic, args.mode))
+        await asyncio.sleep(args.pause)
+
+    summarize("all", [r["ms"] for r in results])
+    summarize("warm", [r["ms"] for r in results if r["warm"]])
+    summarize("cold", [r["ms"] for r in results if not r["warm"]])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
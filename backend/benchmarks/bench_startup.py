@@ -0,0 +1,116 @@
+"""
+Cold start of a worker: how long until it answers, and what its first
+realtime session costs.
+
+Each run starts a fresh `fake_server.py` (the real app with Gemini and
+MongoDB faked, see fakes.py) and records:
+
+- import_ms: `import app.main` on its own, in a separate interpreter
+- health_ms: process start to the first 200 from /health, which is what a
+  scale-to-zero deploy keeps its first user waiting for
+- first_session_ms: speaking socket opened to `ready` for the first
+  session, `--settle` seconds after the server became healthy (a user
+  logs in before they start talking). The fake connects instantly, so
+  this is the app's own first-use work: persona configs and the SDK
+  client, unless the worker built them while settling.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --settle 0     # Session right away: worst case
+    python -m benchmarks.bench_startup --runs 5 --disable test
+
+`--disable` is passed on as ROUTERS_DISABLED.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+
+from benchmarks.loadtest import API, free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print((time.perf_counter() - t) * 1000)"
+
+
+def server_env(disabled: list) -> dict:
+    env = dict(os.environ)
+    env.setdefault("MONGODB_URL", "mongodb://in-memory/bench")
+    env.setdefault("GEMINI_API_KEY", "fake-key")
+    env.setdefault("SESSION_SECRET", "bench-secret")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.setdefault("LESSON_EVENTS_TIMESERIES", "0")
+    env["ROUTERS_DISABLED"] = json.dumps(disabled)
+    return env
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+async def measure_start(env: dict, settle: float) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_server", "--port", str(port), "--users", "0", "--connect-ms", "0"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        async with httpx.AsyncClient() as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"fake server exited with code {server.returncode}")
+                try:
+                    if (await client.get(f"http://127.0.0.1:{port}{API}/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.005)
+        health_ms = (time.perf_counter() - started) * 1000
+
+        await asyncio.sleep(settle)
+        opened = time.perf_counter()
+        async with websockets.connect(f"ws://127.0.0.1:{port}{API}/speaking/ws/audio-chat") as ws:
+            await ws.send(json.dumps({"type": "config", "language": "Spanish", "topic": "Travel", "mode": "Assisted"}))
+            while json.loads(await ws.recv()).get("type") != "ready":
+                pass
+            first_session_ms = (time.perf_counter() - opened) * 1000
+            await ws.send(json.dumps({"type": "close"}))
+            async for _ in ws:
+                pass  # Until the server has finished the session, so shutdown doesn't wait on it
+        return {"health_ms": health_ms, "first_session_ms": first_session_ms}
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds between healthy and the first session")
+    parser.add_argument("--disable", action="append", default=[], help="Router to turn off (repeatable)")
+    args = parser.parse_args()
+
+    env = server_env(args.disable)
+    samples = {"import_ms": [], "health_ms": [], "first_session_ms": []}
+    for _ in range(args.runs):
+        samples["import_ms"].append(measure_import(env))
+        for key, value in (await measure_start(env, args.settle)).items():
+            samples[key].append(value)
+
+    print(f"routers disabled: {', '.join(args.disable) or 'none'}  ({args.runs} runs)")
+    for key, values in samples.items():
+        print(f"  {key:<17} median={statistics.median(values):8.1f} ms  min={min(values):8.1f}  max={max(values):8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
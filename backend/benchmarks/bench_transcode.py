@@ -0,0 +1,157 @@
+"""
+Sessions per core: spawn-per-connection ffmpeg vs. the pooled transcoder.
+
+Generates a short WebM/Opus clip with ffmpeg, then runs N concurrent
+"sessions" that each push the clip through a decoder and read the PCM back:
+
+- spawn: the old test_ws behaviour, one fresh ffmpeg per session with the
+         original command line, spawned when the session starts
+- pool:  TranscoderPool with pre-spawned decoders and the tuned command line
+
+For each mode it reports time to first PCM byte (what a user feels at
+connect), wall time, and CPU seconds (ffmpeg children + this process).
+"Sessions per core" is how many real-time streams of the clip one core
+could sustain: audio seconds decoded / CPU seconds spent.
+
+Usage:
+    python -m benchmarks.bench_transcode --sessions 32 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import tempfile
+import time
+
+from app.realtime.transcode import TranscoderPool
+
+LEGACY_CMD = [
+    "ffmpeg", "-f", "webm", "-i", "pipe:0",
+    "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", "16000", "pipe:1",
+]
+
+PCM_BYTES_PER_SECOND = 16000 * 2
+CHUNK = 4096  # Roughly what MediaRecorder hands the browser per timeslice
+
+
+def make_sample(seconds: float) -> bytes:
+    path = os.path.join(tempfile.mkdtemp(), "sample.webm")
+    os.system(
+        f"ffmpeg -loglevel error -y -f lavfi -i sine=frequency=440:duration={seconds} "
+        f"-c:a libopus -b:a 32k -f webm {path}"
+    )
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def decode(write, read, close_input, sample: bytes) -> tuple[float, int]:
+    start = time.perf_counter()
+    first_byte = None
+    total = 0
+
+    async def feed():
+        for i in range(0, len(sample), CHUNK):
+            await write(sample[i:i + CHUNK])
+        close_input()
+
+    feeder = asyncio.create_task(feed())
+    while True:
+        data = await read()
+        if not data:
+            break
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        total += len(data)
+    await feeder
+    return (first_byte or 0.0), total
+
+
+async def spawn_session(sample: bytes) -> tuple[float, int]:
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *LEGACY_CMD,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    spawn = time.perf_counter() - start
+
+    async def write(data):
+        process.stdin.write(data)
+        await process.stdin.drain()
+
+    first_byte, total = await decode(write, lambda: process.stdout.read(4096), process.stdin.close, sample)
+    await process.wait()
+    return spawn + first_byte, total
+
+
+async def pooled_session(pool: TranscoderPool, sample: bytes) -> tuple[float, int]:
+    start = time.perf_counter()
+    transcoder = await pool.acquire()
+    lease = time.perf_counter() - start
+    try:
+        first_byte, total = await decode(transcoder.write, transcoder.read, transcoder.close_input, sample)
+    finally:
+        await pool.release(transcoder)
+    return lease + first_byte, total
+
+
+async def run(mode: str, sample: bytes, sessions: int, concurrency: int) -> dict:
+    pool = None
+    if mode == "pool":
+        pool = TranscoderPool(max_workers=concurrency, warm=concurrency, acquire_timeout=60)
+        pool.prewarm()
+        await asyncio.sleep(1.0)  # Let the warm decoders come up, as they would at startup
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            if pool:
+                return await pooled_session(pool, sample)
+            return await spawn_session(sample)
+
+    cpu_before = resource.getrusage(resource.RUSAGE_CHILDREN), resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(sessions)))
+    wall = time.perf_counter() - wall_start
+    if pool:
+        await pool.close()
+    cpu_after = resource.getrusage(resource.RUSAGE_CHILDREN), resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu = sum(
+        (after.ru_utime + after.ru_stime) - (before.ru_utime + before.ru_stime)
+        for before, after in zip(cpu_before, cpu_after)
+    )
+    audio_seconds = sum(total for _, total in results) / PCM_BYTES_PER_SECOND
+    first_bytes = [fb * 1000 for fb, _ in results]
+    return {
+        "first_pcm_p50_ms": statistics.median(first_bytes),
+        "first_pcm_max_ms": max(first_bytes),
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "sessions_per_core": audio_seconds / cpu if cpu else float("inf"),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--clip-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    sample = make_sample(args.clip_seconds)
+    for mode in ("spawn", "pool"):
+        r = await run(mode, sample, args.sessions, args.concurrency)
+        print(
+            f"{mode:<6} first PCM p50={r['first_pcm_p50_ms']:7.1f} ms max={r['first_pcm_max_ms']:7.1f} ms  "
+            f"wall={r['wall_s']:6.2f}s cpu={r['cpu_s']:6.2f}s  "
+            f"sessions/core={r['sessions_per_core']:6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+Runs `app.main:app` against the fakes in benchmarks/fakes.py.
+
+Nothing leaves the machine: Gemini Live is simulated and MongoDB is an
+in-memory database seeded with `--users` accounts (bench<i>@example.com,
+password hash "bench-hash"). The load test starts this in a subprocess so
+it can measure the server's CPU and memory on their own, but it can also be
+run by hand and pointed at with any client:
+
+    python -m benchmarks.fake_server --port 8765 --first-audio-ms 600
+"""
+
+import argparse
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--connect-ms", type=float, default=300.0, help="Simulated Live API handshake")
+    parser.add_argument("--first-audio-ms", type=float, default=600.0, help="End of turn to first reply chunk")
+    parser.add_argument("--response-ms", type=int, default=1500, help="Length of each spoken reply")
+    parser.add_argument("--chunk-interval-ms", type=float, default=20.0, help="Gap between reply chunks")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so fill in what the fakes make unnecessary first
+    os.environ.setdefault("MONGODB_URL", "mongodb://in-memory/bench")
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    os.environ.setdefault("SESSION_SECRET", "bench-secret")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("TRANSCODER_WARM", "0")  # The load test streams PCM, so ffmpeg isn't needed
+    os.environ.setdefault("LESSON_EVENTS_TIMESERIES", "0")  # mongomock can't create time-series collections
+    # All load comes from one IP: keep the limit checks on the path, but out of reach
+    for limit in (
+        "RATE_LIMIT_API_PER_MINUTE_IP", "RATE_LIMIT_API_PER_MINUTE_USER", "RATE_LIMIT_LOGIN_PER_MINUTE_IP",
+        "RATE_LIMIT_LOGIN_PER_MINUTE_EMAIL", "RATE_LIMIT_SIGNUP_PER_MINUTE_IP", "REALTIME_PER_MINUTE_IP",
+        "REALTIME_SESSIONS_PER_IP", "REALTIME_MINUTES_PER_DAY_IP",
+    ):
+        os.environ.setdefault(limit, "1000000")
+
+    import uvicorn
+
+    import app.main
+    from benchmarks.fakes import LiveLatency, install
+
+    install(
+        app.main,
+        LiveLatency(
+            connect_ms=args.connect_ms,
+            first_audio_ms=args.first_audio_ms,
+            response_ms=args.response_ms,
+            chunk_interval_ms=args.chunk_interval_ms,
+        ),
+        users=args.users,
+    )
+    uvicorn.run(app.main.app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
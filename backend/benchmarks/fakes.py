@@ -0,0 +1,554 @@
+"""
+Local stand-ins for Gemini Live and MongoDB, used by the load test.
+
+- `FakeLiveClient` replaces `client.aio.live.connect(...)`. Its sessions
+  accept audio like the real API and answer every end of turn with a
+  transcript of the user's turn and synthetic 24 kHz PCM (with its own
+  transcript) after a configurable delay. Replies are buffered until read,
+  like on the real socket, so a parked session resumes mid-reply. `client.aio.models` answers
+  summary requests with canned text.
+- `init_memory_db()` replaces `app.core.database.init_db` with a
+  mongomock-motor client seeded with benchmark users. mongomock's own
+  aggregation engine doesn't evaluate the nested expressions our update
+  pipelines use, so pipeline updates go through `apply_pipeline` instead,
+  and `bulk_write` is replayed as individual writes. The same evaluator
+  computes find projections that contain expressions, and `$merge` is
+  implemented for aggregations.
+
+`install()` patches both into the app; call it before the lifespan starts.
+"""
+
+import asyncio
+import copy
+import math
+import sys
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    # Imported where used, like the app does, so startup timings stay honest
+    from google.genai import types
+
+MISSING = object()
+OUTPUT_RATE = 24000  # Gemini Live replies with 24 kHz s16le mono
+
+
+def synthetic_pcm(ms: int, rate: int = 16000, freq: float = 220.0, amplitude: float = 0.3) -> bytes:
+    """A sine tone loud enough to pass the VAD gate, as s16le mono."""
+    n = rate * ms // 1000
+    peak = int(32767 * amplitude)
+    samples = (int(peak * math.sin(2 * math.pi * freq * i / rate)) for i in range(n))
+    return b"".join(s.to_bytes(2, "little", signed=True) for s in samples)
+
+
+# ============================================
+# Gemini Live
+# ============================================
+
+@dataclass
+class LiveLatency:
+    connect_ms: float = 300.0       # TLS + WebSocket + setup handshake
+    first_audio_ms: float = 600.0   # End of user turn to first reply chunk
+    response_ms: int = 1500         # Length of each spoken reply
+    chunk_ms: int = 40              # Reply audio per message
+    chunk_interval_ms: float = 20.0 # Gap between reply messages (faster than real time, like the API)
+
+
+class FakeLiveSession:
+    def __init__(self, latency: LiveLatency):
+        self.latency = latency
+        self.bytes_received = 0
+        self._turns: asyncio.Queue = asyncio.Queue()
+        # Server messages waiting to be read, like the real session's socket
+        # buffer: a caller that stops reading mid-reply gets the rest later
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._speaker: Optional[asyncio.Task] = None
+        self._chunk = synthetic_pcm(latency.chunk_ms, rate=OUTPUT_RATE)
+
+    async def send(self, input: Any = None, end_of_turn: bool = False, **kwargs) -> None:
+        if isinstance(input, dict):
+            input = input.get("data", b"")
+        if isinstance(input, (bytes, bytearray)):
+            self.bytes_received += len(input)
+        if end_of_turn:
+            if self._speaker is None:
+                self._speaker = asyncio.create_task(self._speak())
+            self._turns.put_nowait(asyncio.get_running_loop().time())
+
+    async def _speak(self) -> None:
+        """Answers each end of turn in order, whether or not anyone is reading yet."""
+        from google.genai import types
+
+        while True:
+            await self._turns.get()
+            self._inbox.put_nowait(types.LiveServerMessage(server_content=types.LiveServerContent(
+                input_transcription=types.Transcription(text="Hola, me llamo Bench."),
+            )))
+            await asyncio.sleep(self.latency.first_audio_ms / 1000)
+            chunks = max(1, self.latency.response_ms // self.latency.chunk_ms)
+            for i in range(chunks):
+                self._inbox.put_nowait(types.LiveServerMessage(server_content=types.LiveServerContent(
+                    model_turn=types.Content(parts=[types.Part(
+                        inline_data=types.Blob(data=self._chunk, mime_type=f"audio/pcm;rate={OUTPUT_RATE}")
+                    )]),
+                    # Transcript fragments arrive interleaved with the audio, a few words at a time
+                    output_transcription=types.Transcription(text=" ¡Hola Bench!" if i == 0 else " ¿Qué tal?") if i in (0, chunks // 2) else None,
+                )))
+                await asyncio.sleep(self.latency.chunk_interval_ms / 1000)
+            self._inbox.put_nowait(types.LiveServerMessage(session_resumption_update=types.LiveServerSessionResumptionUpdate(
+                new_handle=f"fake-handle-{id(self)}", resumable=True,
+            )))
+            self._inbox.put_nowait(types.LiveServerMessage(server_content=types.LiveServerContent(turn_complete=True)))
+
+    async def receive(self):
+        """Yields one model turn, then stops - like the SDK, callers loop to get the next."""
+        while True:
+            message = await self._inbox.get()
+            yield message
+            if message.server_content and message.server_content.turn_complete:
+                return
+
+    def close(self) -> None:
+        if self._speaker is not None:
+            self._speaker.cancel()
+
+
+class _FakeConnection:
+    def __init__(self, latency: LiveLatency):
+        self.latency = latency
+        self.session: Optional[FakeLiveSession] = None
+
+    async def __aenter__(self) -> FakeLiveSession:
+        await asyncio.sleep(self.latency.connect_ms / 1000)
+        self.session = FakeLiveSession(self.latency)
+        return self.session
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self.session is not None:
+            self.session.close()
+
+
+class _FakeLive:
+    def __init__(self, latency: LiveLatency):
+        self.latency = latency
+        self.connections = 0
+
+    def connect(self, model: str = "", config: Any = None) -> _FakeConnection:
+        self.connections += 1
+        return _FakeConnection(self.latency)
+
+
+class _FakeModels:
+    def __init__(self, latency_ms: float = 200.0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    async def generate_content(self, model: str = "", contents: Any = None, **kwargs) -> "types.GenerateContentResponse":
+        from google.genai import types
+
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+            role="model", parts=[types.Part(text="Greets confidently; practise question forms next.")]
+        ))])
+
+
+class FakeLiveClient:
+    """Duck-types the part of `genai.Client` the routers use: `client.aio.live.connect` and `client.aio.models`."""
+
+    def __init__(self, latency: Optional[LiveLatency] = None):
+        self.latency = latency or LiveLatency()
+        self.live = _FakeLive(self.latency)
+        self.models = _FakeModels()
+        self.aio = self
+
+
+# ============================================
+# Aggregation pipeline updates
+# ============================================
+
+def _get_path(value: Any, path: str) -> Any:
+    for key in path.split("."):
+        if isinstance(value, list):
+            # Like MongoDB: a path through an array maps over its elements
+            value = [v for v in (_get_path(item, key) for item in value) if v is not MISSING]
+        elif isinstance(value, dict):
+            value = value.get(key, MISSING)
+        else:
+            return MISSING
+    return value
+
+
+def _null(value: Any) -> bool:
+    return value is None or value is MISSING
+
+
+def _clean(value: Any) -> Any:
+    return None if value is MISSING else value
+
+
+def evaluate(expr: Any, doc: dict, variables: Dict[str, Any]) -> Any:
+    """Evaluates an aggregation expression against `doc` (the subset our pipelines use)."""
+    if isinstance(expr, str):
+        if expr.startswith("$$"):
+            name, _, rest = expr[2:].partition(".")
+            value = doc if name in ("ROOT", "CURRENT") else variables.get(name, MISSING)
+            return _get_path(value, rest) if rest else value
+        if expr.startswith("$"):
+            return _get_path(doc, expr[1:])
+        return expr
+    if isinstance(expr, list):
+        return [_clean(evaluate(e, doc, variables)) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) == 1:
+        op, arg = next(iter(expr.items()))
+        if op.startswith("$"):
+            return _operator(op, arg, doc, variables)
+    result = {}
+    for key, sub in expr.items():
+        value = evaluate(sub, doc, variables)
+        if value is not MISSING:
+            result[key] = value
+    return result
+
+
+def _operator(op: str, arg: Any, doc: dict, variables: Dict[str, Any]) -> Any:
+    ev = lambda e, v=variables: evaluate(e, doc, v)
+
+    if op == "$literal":
+        return arg
+    if op == "$let":
+        scope = dict(variables)
+        scope.update({k: ev(v) for k, v in arg["vars"].items()})
+        return ev(arg["in"], scope)
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg["if"], arg["then"], arg["else"]]
+        return ev(arg[1]) if _truthy(ev(arg[0])) else ev(arg[2])
+    if op == "$switch":
+        for branch in arg["branches"]:
+            if _truthy(ev(branch["case"])):
+                return ev(branch["then"])
+        return ev(arg.get("default"))
+    if op == "$ifNull":
+        values = [ev(e) for e in arg]
+        return next((v for v in values[:-1] if not _null(v)), values[-1])
+    if op == "$map":
+        items = ev(arg["input"])
+        if _null(items):
+            return None
+        name = arg.get("as", "this")
+        return [_clean(ev(arg["in"], {**variables, name: item})) for item in items]
+    if op == "$filter":
+        items = ev(arg["input"])
+        if _null(items):
+            return None
+        name = arg.get("as", "this")
+        return [item for item in items if _truthy(ev(arg["cond"], {**variables, name: item}))]
+    if op == "$reduce":
+        value = ev(arg["initialValue"])
+        for item in ev(arg["input"]) or []:
+            value = ev(arg["in"], {**variables, "this": item, "value": value})
+        return value
+
+    if op in ("$not", "$size", "$isArray", "$type", "$arrayToObject", "$objectToArray"):
+        # Single-argument operators take either `expr` or `[expr]`
+        value = ev(arg[0] if isinstance(arg, list) and len(arg) == 1 else arg)
+        if op == "$not":
+            return not _truthy(value)
+        if op == "$size":
+            return len(value)
+        if op == "$isArray":
+            return isinstance(value, list)
+        if op == "$arrayToObject":
+            return {p["k"] if isinstance(p, dict) else p[0]: p["v"] if isinstance(p, dict) else p[1] for p in value}
+        if op == "$objectToArray":
+            return [{"k": k, "v": v} for k, v in (value or {}).items()]
+        if value is MISSING:
+            return "missing"
+        return {dict: "object", list: "array", str: "string", bool: "bool", type(None): "null"}.get(type(value), "number")
+
+    args = ev(arg)
+    if not isinstance(args, list):
+        args = [args]
+
+    if op == "$eq":
+        return args[0] == args[1]
+    if op == "$ne":
+        return args[0] != args[1]
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        a, b = args
+        if a is None or b is None:
+            return False
+        return {"$gt": a > b, "$gte": a >= b, "$lt": a < b, "$lte": a <= b}[op]
+    if op == "$and":
+        return all(_truthy(a) for a in args)
+    if op == "$or":
+        return any(_truthy(a) for a in args)
+    if op == "$in":
+        return args[0] in (args[1] or [])
+    if op == "$add":
+        return None if any(a is None for a in args) else sum(args)
+    if op == "$subtract":
+        return None if any(a is None for a in args) else args[0] - args[1]
+    if op in ("$max", "$min"):
+        values = [a for a in args if a is not None]
+        return (max if op == "$max" else min)(values) if values else None
+    if op == "$concatArrays":
+        return None if any(a is None for a in args) else [x for a in args for x in a]
+    if op == "$setUnion":
+        out = []
+        for a in args:
+            for x in a or []:
+                if x not in out:
+                    out.append(x)
+        return out
+    if op == "$slice":
+        items, n = args[0], args[-1]
+        if len(args) == 3:
+            return None if items is None else items[args[1]:args[1] + n]
+        return None if items is None else (items[n:] if n < 0 else items[:n])
+    if op == "$mergeObjects":
+        merged = {}
+        for a in args:
+            if isinstance(a, dict):
+                merged.update(a)
+        return merged
+    if op == "$getField":
+        spec = arg if isinstance(arg, dict) else {"field": arg, "input": "$$CURRENT"}
+        source = ev(spec.get("input", "$$CURRENT"))
+        return source.get(ev(spec["field"]), MISSING) if isinstance(source, dict) else MISSING
+    raise NotImplementedError(f"Aggregation operator {op} is not supported by the in-memory database")
+
+
+def _truthy(value: Any) -> bool:
+    return not (_null(value) or value is False or value == 0)
+
+
+def apply_pipeline(doc: dict, pipeline: List[dict]) -> dict:
+    """Applies the `$set` / `$unset` / `$replaceWith` stages of an update pipeline."""
+    doc = copy.deepcopy(doc)
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name in ("$set", "$addFields"):
+            values = {field: evaluate(expr, doc, {}) for field, expr in spec.items()}
+            for field, value in values.items():
+                target = doc
+                *parents, leaf = field.split(".")
+                for key in parents:
+                    target = target.setdefault(key, {})
+                if value is MISSING:
+                    target.pop(leaf, None)
+                else:
+                    target[leaf] = value
+        elif name in ("$unset", "$project") and (isinstance(spec, (str, list))):
+            for field in [spec] if isinstance(spec, str) else spec:
+                doc.pop(field, None)
+        elif name in ("$replaceWith", "$replaceRoot"):
+            new_root = evaluate(spec.get("newRoot", spec) if name == "$replaceRoot" else spec, doc, {})
+            new_root.setdefault("_id", doc["_id"])
+            doc = new_root
+        else:
+            raise NotImplementedError(f"Update stage {name} is not supported by the in-memory database")
+    return doc
+
+
+def _merge_stage(docs, database, options):
+    """`$merge` into a collection of the same database (the options our rollups use)."""
+    if isinstance(options, str):
+        options = {"into": options}
+    into = options["into"]
+    target = database[into if isinstance(into, str) else into["coll"]]
+    on = options.get("on", "_id")
+    on = [on] if isinstance(on, str) else on
+    when_matched = options.get("whenMatched", "merge")
+    when_not_matched = options.get("whenNotMatched", "insert")
+
+    for doc in docs:
+        existing = target.find_one({field: doc.get(field) for field in on})
+        if existing is None:
+            if when_not_matched == "insert":
+                target.insert_one(dict(doc))
+            elif when_not_matched == "fail":
+                raise ValueError(f"$merge found no match for {doc}")
+        elif when_matched == "replace":
+            target.replace_one({"_id": existing["_id"]}, {**doc, "_id": existing["_id"]})
+        elif when_matched == "merge":
+            target.update_one({"_id": existing["_id"]}, {"$set": {k: v for k, v in doc.items() if k != "_id"}})
+        elif when_matched == "fail":
+            raise ValueError(f"$merge matched an existing document for {doc}")
+    return []
+
+
+def _patch_pipeline_updates() -> None:
+    from mongomock import aggregate as mongomock_aggregate
+    from mongomock.collection import Collection
+    from mongomock.results import UpdateResult
+    from pymongo import ReturnDocument
+
+    if getattr(Collection, "_pipeline_patched", False):
+        return
+    original_find_one_and_update = Collection.find_one_and_update
+    original_update_one = Collection.update_one
+    original_update_many = Collection.update_many
+    original_copy_only_fields = Collection._copy_only_fields
+
+    # Every call below is synchronous (mongomock-motor doesn't use threads),
+    # so read-modify-replace is atomic with respect to other coroutines
+    def _apply(self, filter, pipeline, upsert=False, sort=None):
+        before = self.find_one(filter, sort=sort)
+        if before is None:
+            if not upsert:
+                return None, None
+            seed = {k: v for k, v in filter.items() if not k.startswith("$") and not isinstance(v, dict)}
+            after = apply_pipeline(seed, pipeline)
+            self.insert_one(after)
+            return None, after
+        after = apply_pipeline(before, pipeline)
+        self.replace_one({"_id": before["_id"]}, after)
+        return before, after
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        if not isinstance(update, list):
+            return original_find_one_and_update(self, filter, update, projection=projection, sort=sort,
+                                                upsert=upsert, return_document=return_document, **kwargs)
+        before, after = _apply(self, filter, update, upsert=upsert, sort=sort)
+        result = after if return_document == ReturnDocument.AFTER else before
+        return None if result is None else self._copy_only_fields(result, projection, dict)
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        if not isinstance(update, list):
+            return original_update_one(self, filter, update, upsert=upsert, **kwargs)
+        before, after = _apply(self, filter, update, upsert=upsert)
+        matched = int(before is not None)
+        raw = {"n": matched or int(after is not None), "nModified": int(matched and before != after),
+               "updatedExisting": bool(matched), "ok": 1.0}
+        if not matched and after is not None:
+            raw["upserted"] = after["_id"]
+        return UpdateResult(raw, acknowledged=True)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        if not isinstance(update, list):
+            return original_update_many(self, filter, update, upsert=upsert, **kwargs)
+        ids = [d["_id"] for d in self.find(filter, {"_id": 1})]
+        modified = 0
+        for _id in ids:
+            before, after = _apply(self, {"_id": _id}, update)
+            modified += int(before != after)
+        return UpdateResult({"n": len(ids), "nModified": modified, "updatedExisting": bool(ids), "ok": 1.0},
+                            acknowledged=True)
+
+    def _copy_only_fields(self, doc, fields, container):
+        # Find projections may hold aggregation expressions (MongoDB 4.4+);
+        # those fields are computed, the rest is projected as usual
+        if not isinstance(fields, dict):
+            return original_copy_only_fields(self, doc, fields, container)
+        computed = {
+            k: v for k, v in fields.items()
+            if (isinstance(v, str) and v.startswith("$"))
+            or (isinstance(v, dict) and not set(v) <= {"$elemMatch", "$slice"})
+        }
+        if not computed:
+            return original_copy_only_fields(self, doc, fields, container)
+        plain = {k: v for k, v in fields.items() if k not in computed}
+        projected = original_copy_only_fields(self, doc, plain or {"_id": 1}, container)
+        for k, expr in computed.items():
+            value = evaluate(expr, doc, {})
+            if value is not MISSING:
+                projected[k] = value
+        return projected
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        # mongomock's bulk builder rejects the arguments newer pymongo
+        # operations pass it, so apply each operation on its own
+        from mongomock.results import BulkWriteResult
+        from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nUpserted": 0, "nRemoved": 0, "upserted": []}
+        for index, op in enumerate(requests):
+            if isinstance(op, InsertOne):
+                self.insert_one(op._doc)
+                counts["nInserted"] += 1
+            elif isinstance(op, (UpdateOne, UpdateMany, ReplaceOne)):
+                if isinstance(op, ReplaceOne):
+                    result = self.replace_one(op._filter, op._doc, upsert=op._upsert)
+                elif isinstance(op, UpdateOne):
+                    result = self.update_one(op._filter, op._doc, upsert=op._upsert)
+                else:
+                    result = self.update_many(op._filter, op._doc, upsert=op._upsert)
+                counts["nMatched"] += result.matched_count
+                counts["nModified"] += result.modified_count
+                if result.upserted_id is not None:
+                    counts["nUpserted"] += 1
+                    counts["upserted"].append({"index": index, "_id": result.upserted_id})
+            elif isinstance(op, (DeleteOne, DeleteMany)):
+                delete = self.delete_one if isinstance(op, DeleteOne) else self.delete_many
+                counts["nRemoved"] += delete(op._filter).deleted_count
+        return BulkWriteResult(counts, acknowledged=True)
+
+    Collection.find_one_and_update = find_one_and_update
+    Collection.update_one = update_one
+    Collection.update_many = update_many
+    Collection.bulk_write = bulk_write
+    mongomock_aggregate._PIPELINE_HANDLERS["$merge"] = _merge_stage
+    Collection._copy_only_fields = _copy_only_fields
+    Collection._pipeline_patched = True
+
+
+# ============================================
+# MongoDB
+# ============================================
+
+BENCH_PASSWORD = "bench-hash"
+
+
+def bench_email(i: int) -> str:
+    return f"bench{i}@example.com"
+
+
+async def init_memory_db(users: int = 100):
+    """Drop-in for `app.core.database.init_db` backed by mongomock-motor."""
+    from beanie import init_beanie
+    from mongomock_motor import AsyncMongoMockClient
+
+    from app.core.database import DOCUMENT_MODELS
+    from app.schemas.user import User
+
+    _patch_pipeline_updates()
+    client = AsyncMongoMockClient()
+    await init_beanie(database=client["bench"], document_models=DOCUMENT_MODELS)
+    # One hash serves every account (they share the password); hashing each
+    # would take minutes at the production cost
+    from app.core.passwords import password_hasher
+
+    password_hash = password_hasher.hash_sync(BENCH_PASSWORD) if users else ""
+    for i in range(users):
+        await User(email=bench_email(i), password_hash=password_hash, first_name=f"Bench{i}").insert()
+    return client
+
+
+# Modules that took `get_client` from app.core.gemini
+LIVE_CLIENT_USERS = (
+    "app.api.routes.chat",
+    "app.api.routes.speaking_realtime",
+    "app.api.routes.test_ws",
+    "app.realtime.transcripts",
+)
+
+
+def install(app_module, latency: LiveLatency, users: int = 100) -> FakeLiveClient:
+    """Points every router at the fake Gemini client and the app lifespan at the in-memory DB."""
+    fake = FakeLiveClient(latency)
+    # Only the routers the app loaded (see ROUTERS_DISABLED)
+    for name in LIVE_CLIENT_USERS:
+        module = sys.modules.get(name)
+        if module is not None:
+            module.get_client = lambda api_version="v1alpha": fake
+
+    async def init_db():
+        return await init_memory_db(users)
+
+    app_module.init_db = init_db
+    return fake
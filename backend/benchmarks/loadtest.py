@@ -0,0 +1,531 @@
+"""
+Offline load test for the whole service.
+
+Starts `benchmarks.fake_server` (the real app with Gemini Live and MongoDB
+replaced by local fakes) in a subprocess, then drives it with:
+
+- N concurrent WebSocket sessions on each realtime router (speaking, chat,
+  test), each streaming synthetic speech in real time for a few turns
+- "resume": speaking sessions whose socket is cut mid-reply after every turn
+  but the last, each reconnecting with its session id and resume key
+- concurrent POST /auth/login and POST /lessons/complete traffic
+
+and reports p50/p99 latency, throughput and the server's CPU time and
+memory per session or request. Results can be saved as a baseline and later
+runs compared against it:
+
+    python -m benchmarks.loadtest --sessions 20 --save benchmarks/baseline.json
+    python -m benchmarks.loadtest --sessions 20 --compare benchmarks/baseline.json
+
+Latencies measured:
+    setup   WebSocket open (speaking: config sent) until the session is usable
+    turn    end of the user's turn until the first reply audio arrives; on the
+            test router turns end on trailing silence, so the clock starts once
+            --eot-silence-ms of silence has been sent
+    resume  reconnect after a dropped socket until `ready` (resumed sessions
+            only; a reconnect that started a fresh session counts as an error)
+
+Requires the benchmark extras: pip install -r benchmarks/requirements.txt
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+import psutil
+import websockets
+
+from app.realtime.protocol import FLAG_END_OF_TURN, FRAME_AUDIO, pack_frame
+from benchmarks.fakes import BENCH_PASSWORD, bench_email, synthetic_pcm
+
+API = "/api/v1"
+CHUNK_MS = 20
+INPUT_RATE = 16000
+REPLY_IDLE_S = 0.3  # Reply is considered finished after this long without audio
+
+# Lower is better for these, higher for everything ending in _per_s
+LOWER_IS_BETTER = ("p50", "p99", "mean", "cpu_ms", "rss_mb", "errors")
+
+
+# ============================================
+# Stats
+# ============================================
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def summarize(samples: List[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "mean": round(statistics.mean(samples), 2),
+        "p50": round(percentile(samples, 0.50), 2),
+        "p99": round(percentile(samples, 0.99), 2),
+    }
+
+
+class ResourceMonitor:
+    """Samples the server process's CPU time and RSS while a scenario runs."""
+
+    def __init__(self, pid: Optional[int]):
+        self.process = psutil.Process(pid) if pid else None
+        self.peak_rss = 0
+        self._task = None
+
+    def _cpu(self) -> float:
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+    async def _sample(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            await asyncio.sleep(0.05)
+
+    def __enter__(self):
+        if self.process:
+            self.cpu_start = self._cpu()
+            self.rss_start = self.peak_rss = self.process.memory_info().rss
+            self._task = asyncio.create_task(self._sample())
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall = time.perf_counter() - self.wall_start
+        if self.process:
+            self._task.cancel()
+            self.cpu = self._cpu() - self.cpu_start
+
+    def per(self, units: int, concurrent: int) -> dict:
+        if not self.process or not units:
+            return {}
+        return {
+            "cpu_ms": round(self.cpu * 1000 / units, 2),
+            "rss_mb": round((self.peak_rss - self.rss_start) / 2**20 / max(1, concurrent), 3),
+        }
+
+
+# ============================================
+# Realtime sessions
+# ============================================
+
+@dataclass
+class SessionResult:
+    setup_ms: List[float] = field(default_factory=list)
+    turn_ms: List[float] = field(default_factory=list)
+    resume_ms: List[float] = field(default_factory=list)
+    audio_bytes: int = 0
+    errors: int = 0
+
+
+class RealtimeClient:
+    """One simulated user: streams speech turns and times the replies."""
+
+    def __init__(self, router: str, base: str, args, result: SessionResult):
+        self.router = router
+        self.base = base
+        self.args = args
+        self.result = result
+        self.seq = 0
+        self.turn_started: Optional[float] = None
+        self.first_audio = asyncio.Event()
+        self.last_audio_at = 0.0
+        self.frames_received = 0
+        self.failure: Optional[str] = None
+        self.speech = synthetic_pcm(CHUNK_MS, rate=INPUT_RATE)
+        self.silence = bytes(len(self.speech))
+
+    def url(self) -> str:
+        return {
+            "speaking": f"{self.base}{API}/speaking/ws/audio-chat",
+            "resume": f"{self.base}{API}/speaking/ws/audio-chat",
+            "chat": f"{self.base}{API}/chat/ws?protocol=binary&codec={self.args.codec}",
+            "test": f"{self.base}{API}/test/gemini-live?format=pcm&codec={self.args.codec}",
+        }[self.router]
+
+    async def send_audio(self, ws, pcm: bytes, end_of_turn: bool = False):
+        if self.router == "test":
+            await ws.send(pcm)
+            return
+        self.seq += 1
+        await ws.send(pack_frame(FRAME_AUDIO, self.seq, pcm, FLAG_END_OF_TURN if end_of_turn else 0))
+
+    async def stream(self, ws, chunk: bytes, ms: int, end_of_turn: bool = False):
+        """Sends `ms` of audio paced in real time, like a microphone."""
+        n = max(1, ms // CHUNK_MS)
+        start = time.perf_counter()
+        for i in range(n):
+            await self.send_audio(ws, chunk, end_of_turn and i == n - 1)
+            delay = start + (i + 1) * CHUNK_MS / 1000 - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def reader(self, ws):
+        async for message in ws:
+            if isinstance(message, bytes):
+                now = time.perf_counter()
+                self.result.audio_bytes += len(message)
+                self.frames_received += 1
+                self.last_audio_at = now
+                if self.turn_started is not None:
+                    self.result.turn_ms.append((now - self.turn_started) * 1000)
+                    self.turn_started = None
+                self.first_audio.set()
+            elif json.loads(message).get("type") in ("busy", "error"):
+                # Busy (admission control) or an upstream error ends the session
+                self.failure = message
+                self.first_audio.set()
+
+    async def wait_for_reply(self):
+        await asyncio.wait_for(self.first_audio.wait(), self.args.reply_timeout)
+        if self.failure:
+            raise RuntimeError(self.failure)
+        while time.perf_counter() - self.last_audio_at < REPLY_IDLE_S:
+            await asyncio.sleep(REPLY_IDLE_S / 3)
+
+    async def connect(self, resume: Optional[dict] = None):
+        """Opens the socket and, on the speaking router, waits for ready. Returns (ws, ready message)."""
+        ws = await websockets.connect(self.url(), max_size=None)
+        if self.router not in ("speaking", "resume"):
+            return ws, {}
+        config = {"type": "config", "language": "Spanish", "topic": "Greetings",
+                  "mode": "Assisted", "protocol": "binary", "sample_rate": INPUT_RATE, "codec": self.args.codec}
+        if resume:
+            config["resume"] = resume
+        await ws.send(json.dumps(config))
+        while True:
+            message = json.loads(await ws.recv())
+            if message.get("type") == "ready":
+                return ws, message
+            if message.get("type") in ("busy", "error"):
+                await ws.close()
+                raise RuntimeError(message)
+
+    async def drop_and_resume(self, ws, ready: dict):
+        """Cuts the connection without a close handshake, like a phone changing networks, then resumes."""
+        ws.transport.abort()
+        reconnect_at = time.perf_counter()
+        resume = {"session_id": ready["session_id"], "resume_key": ready["resume_key"], "received": self.frames_received}
+        ws, ready = await self.connect(resume)
+        if not ready.get("resumed"):
+            await ws.close()
+            raise RuntimeError("reconnect started a fresh session")
+        self.result.resume_ms.append((time.perf_counter() - reconnect_at) * 1000)
+        return ws, ready
+
+    async def run(self):
+        opened_at = time.perf_counter()
+        ws, ready = await self.connect()
+        self.result.setup_ms.append((time.perf_counter() - opened_at) * 1000)
+
+        reader = asyncio.create_task(self.reader(ws))
+        try:
+            if self.router == "chat":
+                # Chat greets the user first
+                await self.wait_for_reply()
+
+            for turn in range(self.args.turns):
+                self.first_audio.clear()
+                if self.router == "test":
+                    # No end-of-turn message on this router: trailing silence ends the turn
+                    await self.stream(ws, self.speech, self.args.speech_ms)
+                    await self.stream(ws, self.silence, self.args.eot_silence_ms)
+                    self.turn_started = time.perf_counter()
+                    await self.stream(ws, self.silence, CHUNK_MS * 10)
+                else:
+                    await self.stream(ws, self.speech, self.args.speech_ms, end_of_turn=True)
+                    self.turn_started = time.perf_counter()
+                if self.router == "resume" and turn < self.args.turns - 1:
+                    # Drop mid-reply; the rest of the reply has to arrive on the new socket
+                    await asyncio.wait_for(self.first_audio.wait(), self.args.reply_timeout)
+                    reader.cancel()
+                    ws, ready = await self.drop_and_resume(ws, ready)
+                    reader = asyncio.create_task(self.reader(ws))
+                await self.wait_for_reply()
+        finally:
+            reader.cancel()
+            await ws.close()
+
+
+async def login_load(base: str, args, stop: asyncio.Event) -> dict:
+    """Keeps `--login-load` clients logging in until `stop` is set."""
+    latencies: List[float] = []
+    http_base = base.replace("ws", "http", 1)
+
+    async with httpx.AsyncClient(base_url=http_base, timeout=30) as client:
+        async def worker(w: int):
+            email = bench_email(w % args.users)
+            while not stop.is_set():
+                start = time.perf_counter()
+                await client.post(f"{API}/auth/login", json={"email": email, "password_hash": BENCH_PASSWORD})
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(args.login_load)))
+    return {
+        "login_ms": summarize(latencies),
+        "logins_per_s": round(len(latencies) / (time.perf_counter() - started), 1),
+    }
+
+
+async def run_realtime(router: str, base: str, args, pid: Optional[int]) -> dict:
+    result = SessionResult()
+    stop_logins = asyncio.Event()
+    logins = asyncio.create_task(login_load(base, args, stop_logins)) if args.login_load else None
+
+    async def one(i: int):
+        await asyncio.sleep(args.ramp_s * i / max(1, args.sessions))
+        try:
+            await RealtimeClient(router, base, args, result).run()
+        except Exception as e:
+            result.errors += 1
+            if args.verbose:
+                print(f"  {router} session {i}: {e!r}")
+
+    with ResourceMonitor(pid) as monitor:
+        await asyncio.gather(*(one(i) for i in range(args.sessions)))
+    stop_logins.set()
+
+    completed = args.sessions - result.errors
+    return {
+        "setup_ms": summarize(result.setup_ms),
+        "turn_ms": summarize(result.turn_ms),
+        **({"resume_ms": summarize(result.resume_ms)} if router == "resume" else {}),
+        "sessions": args.sessions,
+        "errors": result.errors,
+        "turns_per_s": round(len(result.turn_ms) / monitor.wall, 2),
+        "reply_kb_per_s": round(result.audio_bytes / 1024 / monitor.wall, 1),
+        **monitor.per(completed, args.sessions),
+        **(await logins if logins is not None else {}),
+    }
+
+
+# ============================================
+# HTTP
+# ============================================
+
+async def run_http(scenario: str, base: str, args, pid: Optional[int]) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(args.login_requests if scenario == "login" else args.requests))
+
+    async with httpx.AsyncClient(base_url=base, timeout=30) as client:
+        async def log_in(w: int) -> dict:
+            response = await client.post(f"{API}/auth/login", json={"email": bench_email(w % args.users), "password_hash": BENCH_PASSWORD})
+            return {"Authorization": f"Bearer {response.headers.get('X-Session-Token', '')}"}
+
+        # Logins are slow by design (bcrypt), so they happen before the measurement
+        tokens = await asyncio.gather(*(log_in(w) for w in range(args.concurrency))) if scenario == "complete" else None
+
+        async def worker(w: int):
+            nonlocal errors
+            email = bench_email(w % args.users)
+            headers = tokens[w] if tokens else {}
+
+            for i in remaining:
+                if scenario == "login":
+                    request = client.post(f"{API}/auth/login", json={"email": email, "password_hash": BENCH_PASSWORD})
+                else:
+                    request = client.post(f"{API}/lessons/complete", headers=headers, json={
+                        "language": ("Spanish", "French", "German")[i % 3],
+                        "lesson_id": f"lesson_{i % 40:02d}",
+                        "time_spent": 5,
+                        "rating": 4,
+                        "new_notes": "Practised greetings.",
+                    })
+                start = time.perf_counter()
+                response = await request
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+                    if args.verbose and errors <= 3:
+                        print(f"  {scenario}: HTTP {response.status_code} {response.text[:200]}")
+
+        with ResourceMonitor(pid) as monitor:
+            await asyncio.gather(*(worker(w) for w in range(args.concurrency)))
+
+    return {
+        "latency_ms": summarize(latencies),
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / monitor.wall, 1),
+        **monitor.per(len(latencies), args.concurrency),
+    }
+
+
+# ============================================
+# Server
+# ============================================
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_server(args) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "benchmarks.fake_server",
+        "--port", str(args.port),
+        "--users", str(args.users),
+        "--connect-ms", str(args.connect_ms),
+        "--first-audio-ms", str(args.first_audio_ms),
+        "--response-ms", str(args.response_ms),
+    ]
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(command, cwd=backend_dir)
+
+    async with httpx.AsyncClient() as client:
+        for _ in range(150):
+            if server.poll() is not None:
+                raise RuntimeError(f"fake server exited with code {server.returncode}")
+            try:
+                if (await client.get(f"http://127.0.0.1:{args.port}{API}/ready")).status_code == 200:
+                    return server
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("fake server did not become ready")
+
+
+# ============================================
+# Baselines
+# ============================================
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Prints current vs. baseline and returns the metrics that regressed beyond `tolerance`."""
+    now, before = flatten(current), flatten(baseline)
+    regressions = []
+    print(f"\n{'metric':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, value in now.items():
+        if name not in before or name.endswith((".n", ".sessions", ".requests")):
+            continue
+        old = before[name]
+        change = (value - old) / old if old else 0.0
+        worse = change > tolerance if name.rsplit(".", 1)[-1] in LOWER_IS_BETTER else change < -tolerance
+        if name.endswith(".errors"):
+            worse = value > old
+        marker = "  <-- regression" if worse else ""
+        print(f"{name:<36} {old:>10} {value:>10} {change:>+8.1%}{marker}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    for scenario, data in results.items():
+        print(f"\n[{scenario}]")
+        for key, value in data.items():
+            if isinstance(value, dict):
+                if value.get("n"):
+                    print(f"  {key:<14} n={value['n']:<5} mean={value['mean']:>9} p50={value['p50']:>9} p99={value['p99']:>9}")
+            else:
+                print(f"  {key:<14} {value}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="speaking,chat,test,login,complete",
+                        help="Comma-separated subset of speaking,resume,chat,test,login,complete")
+    parser.add_argument("--url", help="Use an already running fake_server instead of starting one (no CPU/memory figures)")
+    parser.add_argument("--port", type=int, default=0, help="Port for the spawned server (default: any free port)")
+    # Realtime load
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions per realtime router")
+    parser.add_argument("--turns", type=int, default=3, help="User turns per session")
+    parser.add_argument("--speech-ms", type=int, default=1500, help="Speech per user turn")
+    parser.add_argument("--eot-silence-ms", type=int, default=800, help="Must match AUDIO_END_OF_TURN_SILENCE_MS")
+    parser.add_argument("--ramp-s", type=float, default=1.0, help="Spread session starts over this many seconds")
+    parser.add_argument("--reply-timeout", type=float, default=15.0)
+    parser.add_argument("--codec", default="pcm", choices=("pcm", "opus"), help="Reply audio codec to ask for (opus needs ffmpeg)")
+    # HTTP load
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per HTTP scenario")
+    parser.add_argument("--login-requests", type=int, default=200,
+                        help="Requests for the login scenario (each costs a bcrypt check)")
+    parser.add_argument("--login-load", type=int, default=0,
+                        help="Clients logging in continuously while the realtime scenarios run")
+    parser.add_argument("--users", type=int, default=100, help="Seeded users the HTTP clients spread across")
+    # Fake Gemini
+    parser.add_argument("--connect-ms", type=float, default=300.0)
+    parser.add_argument("--first-audio-ms", type=float, default=600.0)
+    parser.add_argument("--response-ms", type=int, default=1500)
+    # Baselines
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a saved JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression (0.10 = 10%%)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base, pid = args.url.rstrip("/"), None
+    else:
+        args.port = args.port or free_port()
+        server = await start_server(args)
+        base, pid = f"http://127.0.0.1:{args.port}", server.pid
+    ws_base = base.replace("http", "ws", 1)
+
+    results = {}
+    try:
+        for scenario in args.scenarios.split(","):
+            print(f"running {scenario}...", flush=True)
+            if scenario in ("speaking", "resume", "chat", "test"):
+                results[scenario] = await run_realtime(scenario, ws_base, args, pid)
+            else:
+                results[scenario] = await run_http(scenario, base, args, pid)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+
+    print_results(results)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("save", "compare", "url", "port", "verbose")},
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nsaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
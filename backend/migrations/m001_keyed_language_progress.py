@@ -0,0 +1,73 @@
+"""
+Converts `users.languages_studied` from a list of entries to a map keyed by
+language, and de-duplicates each language's completed lessons.
+
+Documents are also converted lazily on their next lesson completion (see
+KEYED_PROGRESS_STAGE in app/api/routes/lessons.py), and the User model reads
+both layouts, so this can run at any time after the deploy. It only touches
+documents still in the old layout, so re-running it is safe.
+
+    python -m migrations.m001_keyed_language_progress --dry-run
+    python -m migrations.m001_keyed_language_progress
+"""
+
+import argparse
+import asyncio
+
+import certifi
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.api.routes.lessons import KEYED_PROGRESS_STAGE
+from app.core.config import settings
+from app.schemas.user import User
+
+LEGACY_FILTER = {"languages_studied": {"$type": "array"}}
+
+DEDUPE_STAGE = {
+    "$set": {
+        "languages_studied": {
+            "$arrayToObject": {
+                "$map": {
+                    "input": {"$objectToArray": "$languages_studied"},
+                    "as": "entry",
+                    "in": {
+                        "k": "$$entry.k",
+                        "v": {
+                            "$mergeObjects": [
+                                "$$entry.v",
+                                {"completed_lessons": {"$setUnion": [{"$ifNull": ["$$entry.v.completed_lessons", []]}]}},
+                            ]
+                        },
+                    },
+                }
+            }
+        }
+    }
+}
+
+# A changed document gets a new version, so profile ETags don't match copies in the old layout
+VERSION_STAGE = {"$set": {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the documents that need converting")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL, tlsCAFile=certifi.where())
+    users = client.get_default_database()[User.Settings.name]
+    try:
+        pending = await users.count_documents(LEGACY_FILTER)
+        print(f"{pending} user(s) with list-based language progress")
+        if args.dry_run or not pending:
+            return
+
+        # One server-side update; no documents are pulled into Python
+        result = await users.update_many(LEGACY_FILTER, [KEYED_PROGRESS_STAGE, DEDUPE_STAGE, VERSION_STAGE])
+        print(f"converted {result.modified_count} user(s)")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
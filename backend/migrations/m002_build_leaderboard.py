@@ -0,0 +1,39 @@
+"""
+Backfills the `leaderboard` collection from `users`.
+
+Lesson completions keep entries current from then on, so this is needed
+once after deploying leaderboards, and again only if `users` is edited
+by hand, or to move language boards to their namespaced scopes
+("lang:<language>"). Safe to re-run: entries are replaced in place. Run it
+after m001_keyed_language_progress so every user has keyed language
+progress.
+
+    python -m migrations.m002_build_leaderboard
+"""
+
+import asyncio
+
+import certifi
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.database import DOCUMENT_MODELS
+from app.core.leaderboard import rebuild_leaderboard
+from app.schemas.leaderboard import LeaderboardEntry
+from app.schemas.user import User
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.MONGODB_URL, tlsCAFile=certifi.where())
+    try:
+        # Creates the leaderboard indexes; $merge needs the unique (user_id, scope) one
+        await init_beanie(database=client.get_default_database(), document_models=DOCUMENT_MODELS)
+        await rebuild_leaderboard(User.get_motor_collection())
+        print(f"leaderboard now has {await LeaderboardEntry.count()} entries")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
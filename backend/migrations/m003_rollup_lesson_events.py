@@ -0,0 +1,41 @@
+"""
+Recomputes the daily stats rollups from the lesson event log.
+
+The rollup job only redoes today, yesterday and the days recent syncs
+reached back to. Run this to cover older days, e.g. after the job was
+disabled or failing for a while. Safe to re-run: each day is replaced as a
+whole.
+
+    python -m migrations.m003_rollup_lesson_events --days 30
+"""
+
+import argparse
+import asyncio
+from datetime import timedelta
+
+import certifi
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.database import DOCUMENT_MODELS
+from app.core.stats import rollup_days, utc_today
+from app.schemas.stats import DailyLanguageStats
+
+
+async def main(days: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL, tlsCAFile=certifi.where())
+    try:
+        # Creates the event collection and the unique indexes $merge needs
+        await init_beanie(database=client.get_default_database(), document_models=DOCUMENT_MODELS)
+        today = utc_today()
+        await rollup_days(today - timedelta(days=n) for n in range(days))
+        print(f"rolled up {days} day(s); {await DailyLanguageStats.count()} daily language rows")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30, help="Days to recompute, counting back from today (UTC)")
+    asyncio.run(main(parser.parse_args().days))
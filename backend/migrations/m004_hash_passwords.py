@@ -0,0 +1,66 @@
+"""
+Replaces passwords stored as sent (from before server-side hashing) with
+bcrypt hashes.
+
+Accounts are also upgraded on their next login (see app/core/passwords.py),
+so this can run at any time after the deploy. It catches the accounts that
+don't log in again. Each update only applies if the stored value hasn't
+changed since it was read, so it is safe alongside live logins and safe to
+re-run.
+
+    python -m migrations.m004_hash_passwords --dry-run
+    python -m migrations.m004_hash_passwords
+"""
+
+import argparse
+import asyncio
+
+import certifi
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.passwords import password_hasher
+from app.schemas.user import User
+
+# Plain strings only: a missing or null hash has nothing to hash, and hashing it would fail
+LEGACY_FILTER = {"password_hash": {"$type": "string", "$not": {"$regex": r"^\$2[aby]\$"}}}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the accounts that need hashing")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL, tlsCAFile=certifi.where())
+    users = client.get_default_database()[User.Settings.name]
+    try:
+        pending = await users.count_documents(LEGACY_FILTER)
+        print(f"{pending} user(s) with an unhashed password")
+        if args.dry_run or not pending:
+            return
+
+        async def upgrade(raw: dict) -> int:
+            new_hash = await password_hasher.hash(raw["password_hash"])
+            result = await users.update_one(
+                {"_id": raw["_id"], "password_hash": raw["password_hash"]},
+                {"$set": {"password_hash": new_hash}, "$inc": {"version": 1}},
+            )
+            return result.modified_count
+
+        # Hashing is the slow part: keep the pool busy, one batch at a time
+        hashed = 0
+        batch = []
+        async for raw in users.find(LEGACY_FILTER, {"password_hash": 1}):
+            batch.append(raw)
+            if len(batch) >= settings.PASSWORD_HASH_MAX_PENDING:
+                hashed += sum(await asyncio.gather(*(upgrade(r) for r in batch)))
+                batch = []
+        hashed += sum(await asyncio.gather(*(upgrade(r) for r in batch)))
+        print(f"hashed {hashed} password(s)")
+    finally:
+        password_hasher.close()
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
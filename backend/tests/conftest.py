@@ -0,0 +1,33 @@
+"""
+Shared fixtures. Settings are read at import time, so the environment the
+app needs is filled in before anything from `app` is imported.
+
+Tests that need MongoDB take the `db` fixture: a fresh mongomock-motor
+database with the same pipeline support the load test's fake server has.
+
+Async tests use AnyIO's pytest plugin (anyio is a FastAPI dependency):
+mark them with `@pytest.mark.anyio`.
+"""
+
+import os
+
+os.environ.setdefault("MONGODB_URL", "mongodb://in-memory/test")
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("SESSION_SECRET", "test-secret")
+os.environ.setdefault("LESSON_EVENTS_TIMESERIES", "0")  # mongomock can't create time-series collections
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    from benchmarks.fakes import init_memory_db
+
+    client = await init_memory_db(users=0)
+    yield client["bench"]
+    client.close()
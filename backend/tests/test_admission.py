@@ -0,0 +1,62 @@
+import pytest
+
+from app.core.ratelimit import RateLimited
+from app.realtime import admission
+from app.realtime.admission import SessionRegistry
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+@pytest.mark.anyio
+async def test_a_failing_quota_check_gives_the_slot_back(monkeypatch):
+    async def broken(websocket):
+        raise TypeError("bad token")
+
+    monkeypatch.setattr(admission.realtime_quotas, "acquire", broken)
+    registry = SessionRegistry(max_sessions=2)
+    for _ in range(3):
+        with pytest.raises(TypeError):
+            await registry.admit("speaking", FakeSocket())
+    assert registry.active == 0
+    assert registry.admitted == 0
+
+
+@pytest.mark.anyio
+async def test_rate_limited_callers_get_busy_and_no_slot(monkeypatch):
+    async def limited(websocket):
+        raise RateLimited("realtime", 3.2)
+
+    monkeypatch.setattr(admission.realtime_quotas, "acquire", limited)
+    registry = SessionRegistry(max_sessions=2)
+    socket = FakeSocket()
+    assert await registry.admit("speaking", socket) is None
+    assert socket.sent == [{"type": "busy", "reason": "rate_limited", "retry_after": 4}]
+    assert socket.closed_with == admission.CLOSE_TRY_AGAIN_LATER
+    assert (registry.active, registry.rate_limited) == (0, 1)
+
+
+@pytest.mark.anyio
+async def test_capacity_is_enforced_and_release_frees_it(monkeypatch):
+    async def unlimited(websocket):
+        return None
+
+    monkeypatch.setattr(admission.realtime_quotas, "acquire", unlimited)
+    registry = SessionRegistry(max_sessions=1)
+    session = await registry.admit("speaking", FakeSocket())
+    assert session is not None
+    busy = FakeSocket()
+    assert await registry.admit("speaking", busy) is None
+    assert busy.sent[0]["reason"] == "capacity"
+
+    session.release()
+    assert registry.active == 0
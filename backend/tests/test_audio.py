@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from app.realtime.audio import AudioPreprocessor, LinearResampler, parse_input_rate
+
+RATE = 16000
+CHUNK = 640     # 20 ms of 16 kHz samples per client chunk
+rng = np.random.default_rng(7)
+
+
+def noise(ms: int, dbfs: float) -> np.ndarray:
+    return rng.normal(0.0, 10 ** (dbfs / 20), RATE * ms // 1000)
+
+
+def tone(ms: int, dbfs: float, freq: float = 220.0, rate: int = RATE) -> np.ndarray:
+    t = np.arange(rate * ms // 1000) / rate
+    return np.sqrt(2) * 10 ** (dbfs / 20) * np.sin(2 * np.pi * freq * t)
+
+
+def feed(preprocessor: AudioPreprocessor, signal: np.ndarray):
+    """Streams `signal` in client-sized chunks. Returns (bytes out, ends of turn)."""
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes()
+    out, turns = 0, 0
+    for i in range(0, len(pcm), CHUNK * 2):
+        processed = preprocessor.process(pcm[i:i + CHUNK * 2])
+        out += len(processed.audio)
+        turns += processed.end_of_turn
+    return out, turns
+
+
+def test_steady_room_noise_above_the_gate_is_learned_and_dropped():
+    preprocessor = AudioPreprocessor()
+    feed(preprocessor, noise(5000, -38))  # Floor adapts
+
+    out, turns = feed(preprocessor, noise(2000, -38))
+    assert out == 0
+    assert turns == 0
+    assert -40 < preprocessor.stats()["noise_floor_dbfs"] < -36
+
+
+def test_speech_over_noise_passes_and_trailing_noise_ends_the_turn():
+    preprocessor = AudioPreprocessor(end_of_turn_silence_ms=800)
+    feed(preprocessor, noise(5000, -38))
+
+    speech = tone(1500, -20) + noise(1500, -38)
+    out, turns = feed(preprocessor, speech)
+    assert out >= len(speech) * 2 * 0.9
+    assert turns == 0
+
+    out, turns = feed(preprocessor, noise(1500, -38))
+    assert turns == 1
+    assert out < 1500 * RATE // 1000 * 2 / 2   # Only the hangover gets through
+
+
+def test_speech_onset_is_not_gated_by_the_floor_it_raises():
+    preprocessor = AudioPreprocessor()
+    speech = tone(1500, -25)
+    out, _ = feed(preprocessor, speech)
+    assert out == len(speech) * 2
+
+
+def test_client_end_turn_is_skipped_after_silence_closed_the_turn():
+    preprocessor = AudioPreprocessor(end_of_turn_silence_ms=400)
+    feed(preprocessor, tone(500, -20))
+    _, turns = feed(preprocessor, np.zeros(RATE // 2))
+    assert turns == 1
+    assert preprocessor.end_turn() is False
+
+
+def test_vad_disabled_still_resamples():
+    preprocessor = AudioPreprocessor(input_rate=48000, vad_enabled=False)
+    samples = (tone(1000, -20, rate=48000) * 32767).astype("<i2").tobytes()
+    processed = preprocessor.process(samples)
+    assert abs(len(processed.audio) - RATE * 2) <= 4
+    assert processed.end_of_turn is False
+    assert preprocessor.end_turn() is True
+
+
+def test_downsampling_filters_out_content_above_the_output_nyquist():
+    resampler = LinearResampler(48000)
+    t = np.arange(48000) / 48000
+    passband = resampler.process(np.sin(2 * np.pi * 1000 * t).astype(np.float32))
+    aliased = LinearResampler(48000).process(np.sin(2 * np.pi * 12000 * t).astype(np.float32))
+    assert np.sqrt(np.mean(passband[100:] ** 2)) > 0.65
+    assert np.sqrt(np.mean(aliased[100:] ** 2)) < 0.01
+
+
+@pytest.mark.parametrize("value, expected", [(16000, 16000), ("48000", 48000), (8000, 8000)])
+def test_input_rates_in_range_are_accepted(value, expected):
+    assert parse_input_rate(value) == expected
+
+
+@pytest.mark.parametrize("value", [0, -16000, 7999, 48001, 1e9, "fast", None, [16000]])
+def test_input_rates_out_of_range_are_refused(value):
+    with pytest.raises(ValueError, match="sample_rate"):
+        parse_input_rate(value)
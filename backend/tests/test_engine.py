@@ -0,0 +1,84 @@
+import base64
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.realtime.admission import CLOSE_POLICY_VIOLATION
+from app.realtime.engine import AUDIO, END_TURN, RealtimeStream
+from app.realtime.protocol import FRAME_AUDIO, pack_frame
+from app.realtime.telemetry import SessionTelemetry
+
+
+class ScriptedSocket:
+    """Hands `_ingest` a fixed list of messages, then a normal disconnect."""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = []
+        self.close_code = None
+
+    async def receive(self):
+        if self.close_code is not None or not self.messages:
+            return {"type": "websocket.disconnect", "code": 1000}
+        return self.messages.pop(0)
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def text(data) -> dict:
+    return {"type": "websocket.receive", "text": data if isinstance(data, str) else json.dumps(data)}
+
+
+def binary(data: bytes) -> dict:
+    return {"type": "websocket.receive", "bytes": data}
+
+
+async def drain(stream: RealtimeStream) -> list:
+    stream.upstream.close()
+    return [item async for item in stream.upstream]
+
+
+GOOD_AUDIO = text({"type": "audio", "data": base64.b64encode(b"\x00\x01").decode()})
+BAD = [
+    text("{not json"),
+    binary(pack_frame(0x7F, 0, b"")),                  # Unknown frame type
+    binary(b"\x01"),                                    # Shorter than the header
+    text({"type": "audio"}),                            # No data
+    text({"type": "audio", "data": "not base64!"}),
+]
+
+
+@pytest.mark.anyio
+async def test_undecodable_messages_are_skipped_and_reported():
+    socket = ScriptedSocket([BAD[0], GOOD_AUDIO, *BAD[1:], text({"type": "end_turn"})])
+    stream = RealtimeStream(socket, SessionTelemetry("speaking"))
+
+    await stream._ingest()
+
+    assert await drain(stream) == [(AUDIO, b"\x00\x01"), (END_TURN, None)]
+    assert stream.state.bad_messages == len(BAD)
+    assert [m["type"] for m in socket.sent] == ["error"] * len(BAD)
+    assert socket.close_code is None
+    assert not stream.state.client_dropped
+
+
+@pytest.mark.anyio
+async def test_socket_is_closed_after_too_many_bad_messages(monkeypatch):
+    monkeypatch.setattr(settings, "RELAY_MAX_BAD_MESSAGES", 3)
+    frame = binary(pack_frame(FRAME_AUDIO, 0, b"\x02\x03"))
+    socket = ScriptedSocket([BAD[0], frame, BAD[1], BAD[2], frame])
+    stream = RealtimeStream(socket, SessionTelemetry("speaking"))
+
+    await stream._ingest()
+
+    assert socket.close_code == CLOSE_POLICY_VIOLATION
+    assert socket.sent[-1] == {"type": "error", "message": "Too many invalid messages"}
+    assert stream.state.bad_messages == 3
+    # Nothing after the last violation is read
+    assert await drain(stream) == [(AUDIO, b"\x02\x03")]
+    assert not stream.state.client_closed and not stream.state.client_dropped
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from app.realtime.framing import AudioFramer
+
+
+def framer_for(sent, frame_ms=40, max_delay_ms=20):
+    async def send(frame: bytes):
+        sent.append(frame)
+    return AudioFramer(send, frame_ms=frame_ms, max_delay_ms=max_delay_ms)
+
+
+@pytest.mark.anyio
+async def test_whole_frames_go_out_at_once_and_the_rest_after_max_delay():
+    sent = []
+    framer = framer_for(sent)           # 40 ms = 1280 bytes
+    await framer.push(b"\x01" * 3000)
+    assert [len(frame) for frame in sent] == [1280, 1280]
+
+    await asyncio.sleep(0.05)
+    assert [len(frame) for frame in sent] == [1280, 1280, 440]
+    await framer.close()
+
+
+@pytest.mark.anyio
+async def test_timer_only_runs_while_audio_is_waiting():
+    sent = []
+    framer = framer_for(sent)
+    await framer.push(b"\x01" * 1280)   # Exactly one frame: nothing left over
+    assert framer._timer is None
+
+    await framer.push(b"\x01" * 100)
+    assert framer._timer is not None
+    await asyncio.sleep(0.05)
+    assert framer._timer.done()
+    assert len(sent) == 2
+
+
+@pytest.mark.anyio
+async def test_a_failed_timed_flush_reaches_the_session():
+    async def send(frame: bytes):
+        raise ConnectionError("upstream closed")
+
+    framer = AudioFramer(send, frame_ms=40, max_delay_ms=10)
+    await framer.push(b"\x01" * 100)
+
+    error = await asyncio.wait_for(framer.wait_failed(), 1)
+    assert isinstance(error, ConnectionError)
+    with pytest.raises(ConnectionError):
+        await framer.push(b"\x01" * 100)
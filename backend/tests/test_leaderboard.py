@@ -0,0 +1,83 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.core.leaderboard import board_size, rank_of, rebuild_leaderboard, refresh_rankings, size_cache, top, top_cache
+from app.schemas.leaderboard import GLOBAL_SCOPE, LeaderboardEntry, language_scope
+from app.schemas.user import User
+
+
+def snapshot(user_id, version, lessons, streak=1, active=None, name="Ana", language="spanish"):
+    """A user document as the lesson routes read it back (UserProfile projection)."""
+    return {
+        "_id": user_id,
+        "first_name": name,
+        "daily_streak": streak,
+        "last_active_date": datetime.combine(active or date.today(), time.min),
+        "total_lessons_completed": lessons,
+        "total_time_spent": lessons * 10,
+        "languages_studied": {language: {"language": language, "level": "Beginner", "completed_count": lessons}},
+        "version": version,
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    top_cache.clear()
+    size_cache.clear()
+
+
+@pytest.mark.anyio
+async def test_an_older_snapshot_never_overwrites_a_newer_one(db):
+    user = ObjectId()
+    # Two completions' refreshes finish out of order
+    await refresh_rankings(snapshot(user, version=2, lessons=2, streak=2))
+    await refresh_rankings(snapshot(user, version=1, lessons=1, streak=1))
+
+    assert await rank_of(user, GLOBAL_SCOPE, "lessons") == (1, 2)
+    assert await rank_of(user, language_scope("spanish"), "lessons") == (1, 2)
+    assert await rank_of(user, GLOBAL_SCOPE, "streak") == (1, 2)
+
+    await refresh_rankings(snapshot(user, version=3, lessons=3, streak=1))
+    assert await rank_of(user, GLOBAL_SCOPE, "streak") == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_streak_boards_count_only_live_streaks(db):
+    alive, lapsed = ObjectId(), ObjectId()
+    await refresh_rankings(snapshot(alive, version=1, lessons=1, streak=3))
+    await refresh_rankings(snapshot(lapsed, version=1, lessons=5, streak=9, active=date.today() - timedelta(days=3)))
+
+    assert await board_size(GLOBAL_SCOPE, "lessons") == 2
+    assert await board_size(GLOBAL_SCOPE, "streak") == 1
+    assert [row.user_id for row in await top(GLOBAL_SCOPE, "streak", 10)] == [str(alive)]
+    assert await rank_of(lapsed, GLOBAL_SCOPE, "streak") is None
+
+
+@pytest.mark.anyio
+async def test_a_language_called_global_gets_its_own_board(db):
+    user = ObjectId()
+    doc = snapshot(user, version=1, lessons=4, language="global")
+    doc["languages_studied"]["global"]["completed_count"] = 1
+    await refresh_rankings(doc)
+
+    assert await rank_of(user, GLOBAL_SCOPE, "lessons") == (1, 4)
+    assert await rank_of(user, language_scope("global"), "lessons") == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_rebuild_writes_namespaced_language_boards_and_drops_old_ones(db):
+    users = User.get_motor_collection()
+    user_id = (await users.insert_one({
+        "email": "ana@example.com", "password_hash": "x", "first_name": "Ana", "daily_streak": 2,
+        "total_lessons_completed": 3, "total_time_spent": 30, "version": 5,
+        "languages_studied": {"global": {"language": "global", "level": "Beginner", "completed_lessons": ["a", "b"]}},
+    })).inserted_id
+    entries = LeaderboardEntry.get_motor_collection()
+    await entries.insert_one({"user_id": user_id, "scope": "spanish", "first_name": "Ana", "lessons": 9})
+
+    await rebuild_leaderboard(users)
+
+    rows = {doc["scope"]: doc["lessons"] async for doc in entries.find({"user_id": user_id})}
+    assert rows == {GLOBAL_SCOPE: 3, language_scope("global"): 2}
@@ -0,0 +1,166 @@
+import asyncio
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from fastapi import BackgroundTasks
+from pymongo import ReturnDocument
+
+from app.api.routes.lessons import build_completion_pipeline, complete_lesson, sync_lessons
+from app.core.config import settings
+from app.schemas.lesson import LessonCompletionRequest, LessonSyncItem, LessonSyncRequest
+from app.schemas.user import SessionIdentity, User, UserProfile
+
+
+def lesson(lesson_id="span_01", language="Spanish", minutes=10, notes="Good") -> LessonCompletionRequest:
+    return LessonCompletionRequest(language=language, lesson_id=lesson_id, time_spent=minutes, rating=4, new_notes=notes)
+
+
+async def new_user(**fields) -> dict:
+    doc = {"email": "ana@example.com", "password_hash": "x", "first_name": "Ana", **fields}
+    await User.get_motor_collection().insert_one(doc)
+    return doc
+
+
+async def complete_on(user: dict, day: date, payload: LessonCompletionRequest) -> dict:
+    return await User.get_motor_collection().find_one_and_update(
+        {"_id": user["_id"]}, build_completion_pipeline(payload, day), return_document=ReturnDocument.AFTER,
+    )
+
+
+def identity(user: dict) -> SessionIdentity:
+    return SessionIdentity(user_id=str(user["_id"]), email=user["email"], first_name=user["first_name"])
+
+
+@pytest.mark.anyio
+async def test_first_completion_starts_streak_totals_and_progress(db):
+    user = await new_user()
+    profile = await complete_lesson(lesson(minutes=12), BackgroundTasks(), identity(user))
+
+    assert profile.daily_streak == 1
+    assert profile.last_active_date == date.today()
+    assert (profile.total_lessons_completed, profile.total_time_spent) == (1, 12)
+    assert profile.languages_studied["Spanish"].completed_count == 1
+    assert profile.version == 1
+
+
+@pytest.mark.anyio
+async def test_streak_keeps_on_the_same_day_grows_on_the_next_and_resets_after_a_gap(db):
+    user = await new_user()
+    day = date(2026, 3, 1)
+    streaks = []
+    for offset, lesson_id in ((0, "a"), (0, "b"), (1, "c"), (2, "d"), (5, "e"), (4, "f")):
+        doc = await complete_on(user, day + timedelta(days=offset), lesson(lesson_id))
+        streaks.append(doc["daily_streak"])
+
+    # A late replay of an older day (the last one) keeps the streak
+    assert streaks == [1, 1, 2, 3, 1, 1]
+    assert doc["last_active_date"] == datetime.combine(day + timedelta(days=5), time.min)
+    assert doc["total_lessons_completed"] == 6
+
+
+@pytest.mark.anyio
+async def test_concurrent_completions_are_all_counted(db):
+    user = await new_user()
+    await asyncio.gather(*(
+        complete_lesson(lesson(f"l{i}", minutes=5), BackgroundTasks(), identity(user)) for i in range(20)
+    ))
+
+    profile = UserProfile.model_validate(
+        await User.get_motor_collection().find_one({"_id": user["_id"]}, UserProfile.Settings.projection)
+    )
+    assert (profile.total_lessons_completed, profile.total_time_spent, profile.version) == (20, 100, 20)
+    assert profile.languages_studied["Spanish"].completed_count == 20
+
+
+@pytest.mark.anyio
+async def test_user_strings_are_stored_literally(db):
+    user = await new_user()
+    doc = await complete_on(user, date.today(), lesson("$email", notes="$password_hash"))
+    assert doc["languages_studied"]["Spanish"]["completed_lessons"] == ["$email"]
+    assert doc["languages_studied"]["Spanish"]["previous_lesson_notes"] == "$password_hash"
+
+
+@pytest.mark.anyio
+async def test_a_legacy_progress_list_is_keyed_by_language_on_the_next_completion(db):
+    user = await new_user(languages_studied=[
+        {"language": "Spanish", "level": "Beginner", "completed_lessons": ["span_01"]},
+        {"language": "French", "level": "Intermediate", "completed_lessons": ["fr_01", "fr_02"]},
+    ])
+    doc = await complete_on(user, date.today(), lesson("span_02"))
+
+    progress = doc["languages_studied"]
+    assert set(progress) == {"Spanish", "French"}
+    assert progress["Spanish"]["completed_lessons"] == ["span_01", "span_02"]
+    assert progress["French"] == {"language": "French", "level": "Intermediate", "completed_lessons": ["fr_01", "fr_02"]}
+
+
+@pytest.mark.anyio
+async def test_completed_lessons_are_a_set_and_other_languages_are_untouched(db):
+    user = await new_user()
+    await complete_on(user, date.today(), lesson("fr_01", language="French"))
+    for _ in range(3):
+        doc = await complete_on(user, date.today(), lesson("span_01"))
+
+    assert doc["languages_studied"]["Spanish"]["completed_lessons"] == ["span_01"]
+    assert doc["languages_studied"]["French"]["completed_lessons"] == ["fr_01"]
+    # Repeats still count as practice
+    assert doc["total_lessons_completed"] == 4
+
+    profile = UserProfile.model_validate(
+        await User.get_motor_collection().find_one({"_id": user["_id"]}, UserProfile.Settings.projection)
+    )
+    assert {name: p.completed_count for name, p in profile.languages_studied.items()} == {"Spanish": 1, "French": 1}
+
+
+def synced(key: str, day: date, lesson_id: str = None) -> LessonSyncItem:
+    return LessonSyncItem(
+        idempotency_key=key, completed_on=day, language="Spanish", lesson_id=lesson_id or key,
+        time_spent=10, rating=5, new_notes=f"notes {key}",
+    )
+
+
+@pytest.mark.anyio
+async def test_sync_applies_oldest_day_first_and_reports_each_item(db):
+    user = await new_user()
+    today = date.today()
+    items = [
+        synced("k3", today),
+        synced("k1", today - timedelta(days=2)),
+        synced("k1", today - timedelta(days=2)),        # Repeated within the batch
+        synced("k2", today - timedelta(days=1)),
+        synced("k9", today + timedelta(days=5)),        # Beyond any timezone
+    ]
+    response = await sync_lessons(LessonSyncRequest(completions=items), BackgroundTasks(), identity(user))
+
+    assert [(r.idempotency_key, r.status) for r in response.results] == [
+        ("k3", "applied"), ("k1", "applied"), ("k1", "duplicate"), ("k2", "applied"), ("k9", "rejected"),
+    ]
+    # Three consecutive days, as if the client had been online
+    assert response.user.daily_streak == 3
+    assert response.user.total_lessons_completed == 3
+    assert response.user.last_active_date == today
+
+
+@pytest.mark.anyio
+async def test_a_retried_sync_changes_nothing(db):
+    user = await new_user()
+    payload = LessonSyncRequest(completions=[synced("k1", date.today()), synced("k2", date.today())])
+    first = await sync_lessons(payload, BackgroundTasks(), identity(user))
+    retry = await sync_lessons(payload, BackgroundTasks(), identity(user))
+
+    assert [r.status for r in first.results] == ["applied", "applied"]
+    assert [r.status for r in retry.results] == ["duplicate", "duplicate"]
+    assert retry.user.total_lessons_completed == 2
+    assert retry.user.version == first.user.version
+
+
+@pytest.mark.anyio
+async def test_only_the_most_recent_sync_keys_are_kept(db, monkeypatch):
+    monkeypatch.setattr(settings, "LESSON_SYNC_KEYS_KEPT", 3)
+    user = await new_user()
+    for key in ("k1", "k2", "k3", "k4"):
+        await sync_lessons(LessonSyncRequest(completions=[synced(key, date.today())]), BackgroundTasks(), identity(user))
+
+    doc = await User.get_motor_collection().find_one({"_id": user["_id"]})
+    assert [entry["k"] for entry in doc["sync_keys"]] == ["k2", "k3", "k4"]
+    assert "_sync_apply" not in doc
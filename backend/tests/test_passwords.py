@@ -0,0 +1,57 @@
+import pytest
+
+from app.core.passwords import PasswordHasher, PasswordHasherBusy
+from app.schemas.user import User
+from migrations.m004_hash_passwords import LEGACY_FILTER
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=4, workers=1)
+    yield hasher
+    hasher.close()
+
+
+@pytest.mark.anyio
+async def test_hash_round_trip(hasher):
+    stored = await hasher.hash("secret")
+    assert await hasher.verify("secret", stored) == (True, None)
+    assert await hasher.verify("wrong", stored) == (False, None)
+    assert await hasher.verify("secret", None) == (False, None)
+
+
+@pytest.mark.anyio
+async def test_legacy_plaintext_and_other_costs_are_upgraded_on_match(hasher):
+    matches, new_hash = await hasher.verify("secret", "secret")
+    assert matches and new_hash.startswith("$2b$04$")
+
+    other_cost = PasswordHasher(rounds=5, workers=1).hash_sync("secret")
+    matches, new_hash = await hasher.verify("secret", other_cost)
+    assert matches and new_hash.startswith("$2b$04$")
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("stored", ["$2b$", "$2b$xx$abc", "$2a$04$tooshort", "$2y$04$" + "!" * 53])
+async def test_malformed_hashes_never_match(hasher, stored):
+    assert await hasher.verify("secret", stored) == (False, None)
+
+
+@pytest.mark.anyio
+async def test_rejected_hashes_are_not_counted(hasher):
+    hasher.max_pending = 0
+    with pytest.raises(PasswordHasherBusy):
+        await hasher.hash("secret")
+    assert hasher.stats()["hashed"] == 0
+    assert hasher.stats()["rejected"] == 1
+
+
+@pytest.mark.anyio
+async def test_the_migration_only_selects_plain_text_passwords(db):
+    users = User.get_motor_collection()
+    await users.insert_many([
+        {"email": "plain@example.com", "password_hash": "secret"},
+        {"email": "hashed@example.com", "password_hash": "$2b$04$" + "a" * 53},
+        {"email": "null@example.com", "password_hash": None},
+        {"email": "missing@example.com"},
+    ])
+    assert [raw["email"] async for raw in users.find(LEGACY_FILTER)] == ["plain@example.com"]
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import HTTPException, Response
+
+from app.api.deps import authenticate_credentials
+from app.api.routes.lessons import KEYED_PROGRESS_STAGE
+from app.api.routes.users import read_language_progress
+from app.schemas.user import SessionIdentity, User, UserProfile
+from migrations.m001_keyed_language_progress import DEDUPE_STAGE, LEGACY_FILTER, VERSION_STAGE
+
+
+@pytest.mark.anyio
+async def test_a_password_rehash_bumps_the_version(db):
+    users = User.get_motor_collection()
+    await users.insert_one({"email": "a@example.com", "password_hash": "legacy", "first_name": "Ana", "version": 3})
+
+    raw = await authenticate_credentials("a@example.com", "legacy", UserProfile.Settings.projection)
+    assert raw["version"] == 4
+    stored = await users.find_one({"email": "a@example.com"})
+    assert stored["version"] == 4 and stored["password_hash"].startswith("$2")
+
+
+@pytest.mark.anyio
+async def test_converting_the_legacy_layout_bumps_the_version(db):
+    users = User.get_motor_collection()
+    await users.insert_one({
+        "email": "b@example.com", "password_hash": "x", "first_name": "Bo",
+        "languages_studied": [{"language": "spanish", "level": "Beginner", "completed_lessons": ["l1", "l1"]}],
+    })
+
+    await users.update_many(LEGACY_FILTER, [KEYED_PROGRESS_STAGE, DEDUPE_STAGE, VERSION_STAGE])
+
+    stored = await users.find_one({"email": "b@example.com"})
+    assert stored["version"] == 1
+    assert stored["languages_studied"]["spanish"]["completed_lessons"] == ["l1"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("legacy", [False, True])
+async def test_one_language_is_read_from_either_layout(db, legacy):
+    entry = {"language": "spanish", "level": "Beginner", "completed_lessons": ["l1"]}
+    users = User.get_motor_collection()
+    result = await users.insert_one({
+        "email": "c@example.com", "password_hash": "x", "first_name": "Cy", "version": 2,
+        "languages_studied": [entry] if legacy else {"spanish": entry},
+    })
+    me = SessionIdentity(user_id=str(result.inserted_id), email="c@example.com", first_name="Cy")
+
+    response = Response()
+    progress = await read_language_progress("spanish", response, me, None)
+    assert progress.completed_lessons == {"l1"}
+    assert response.headers["ETag"] == f'"{result.inserted_id}.2"'
+
+    with pytest.raises(HTTPException) as missing:
+        await read_language_progress("french", Response(), me, None)
+    assert missing.value.status_code == 404
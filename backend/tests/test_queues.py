@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from app.realtime.queues import OverflowPolicy, QueueClosed, RelayQueue, run_stages
+
+
+async def drain(queue: RelayQueue) -> list:
+    queue.close()
+    return [item async for item in queue]
+
+
+@pytest.mark.anyio
+async def test_drop_oldest_keeps_the_newest_audio_and_every_control_item():
+    queue = RelayQueue("q", maxsize=3, policy=OverflowPolicy.DROP_OLDEST)
+    await queue.put("a1")
+    await queue.put("end", droppable=False)
+    for item in ("a2", "a3", "a4"):
+        await queue.put(item)
+
+    assert await drain(queue) == ["end", "a3", "a4"]
+    assert queue.stats()["dropped"] == 2
+
+
+@pytest.mark.anyio
+async def test_drop_oldest_goes_over_the_limit_when_only_control_items_are_queued():
+    queue = RelayQueue("q", maxsize=1, policy=OverflowPolicy.DROP_OLDEST)
+    await queue.put("end", droppable=False)
+    await queue.put("a1")
+    assert await drain(queue) == ["end", "a1"]
+
+
+@pytest.mark.anyio
+async def test_drop_newest_discards_the_incoming_item():
+    queue = RelayQueue("q", maxsize=2, policy=OverflowPolicy.DROP_NEWEST)
+    for item in ("a1", "a2", "a3"):
+        await queue.put(item)
+    await queue.put("end", droppable=False)
+    assert await drain(queue) == ["a1", "a2", "end"]
+    assert queue.dropped == 1
+
+
+@pytest.mark.anyio
+async def test_block_waits_for_the_consumer_and_close_releases_producers():
+    queue = RelayQueue("q", maxsize=1, policy=OverflowPolicy.BLOCK)
+    await queue.put(b"1")
+    producer = asyncio.create_task(queue.put(b"2"))
+    await asyncio.sleep(0)
+    assert not producer.done()
+
+    assert await queue.get() == b"1"
+    await asyncio.wait_for(producer, 1)
+    assert queue.dropped == 0
+
+    blocked = asyncio.create_task(queue.put(b"3"))
+    await asyncio.sleep(0)
+    queue.close()
+    with pytest.raises(QueueClosed):
+        await blocked
+    assert [item async for item in queue] == [b"2"]
+
+
+@pytest.mark.anyio
+async def test_stale_audio_is_skipped_but_control_items_never_are():
+    queue = RelayQueue("q", maxsize=10, max_age_ms=20)
+    await queue.put("old")
+    await queue.put("end", droppable=False)
+    await asyncio.sleep(0.05)
+    await queue.put("fresh")
+
+    assert await drain(queue) == ["end", "fresh"]
+    assert queue.stale == 1
+
+
+@pytest.mark.anyio
+async def test_drop_pending_clears_an_interrupted_reply():
+    queue = RelayQueue("q", maxsize=10)
+    for item in ("a1", "a2"):
+        await queue.put(item)
+    await queue.put("text", droppable=False)
+    assert queue.drop_pending() == 2
+    assert await drain(queue) == ["text"]
+
+
+@pytest.mark.anyio
+async def test_run_stages_ends_every_stage_once_one_exits():
+    cancelled = []
+
+    async def forever():
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def quick():
+        await asyncio.sleep(0)
+
+    await asyncio.wait_for(run_stages(forever(), quick(), forever()), 1)
+    assert cancelled == [True, True]
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from app.core import ratelimit
+from app.core.config import settings
+from app.core.ratelimit import MemoryRateLimitStore, Rate, RateLimited, RateLimiter, client_ip
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only the rate limiter's view of time; the event loop keeps the real clock
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.mark.anyio
+async def test_bucket_allows_a_minute_of_burst_then_rejects_with_retry_after(clock):
+    limiter = RateLimiter(MemoryRateLimitStore())
+    rate = Rate(per_minute=6)
+    for _ in range(6):
+        await limiter.hit("login", "ip:1", rate)
+
+    with pytest.raises(RateLimited) as rejected:
+        await limiter.hit("login", "ip:1", rate)
+    assert rejected.value.retry_after == pytest.approx(10.0)
+    assert rejected.value.retry_after_header == "10"
+    assert limiter.stats()["limited_login"] == 1
+
+    # Other keys have their own bucket
+    await limiter.hit("login", "ip:2", rate)
+
+
+@pytest.mark.anyio
+async def test_bucket_refills_continuously(clock):
+    store = MemoryRateLimitStore()
+    rate = Rate(per_minute=60)
+    for _ in range(60):
+        assert await store.take("k", rate) == 0.0
+    assert await store.take("k", rate) == pytest.approx(1.0)
+
+    clock.now += 2.5
+    assert await store.take("k", rate) == 0.0
+    assert await store.take("k", rate) == 0.0
+    assert await store.take("k", rate) > 0
+
+    clock.now += 3600    # Never more than one minute's worth
+    for _ in range(60):
+        assert await store.take("k", rate) == 0.0
+    assert await store.take("k", rate) > 0
+
+
+@pytest.mark.anyio
+async def test_zero_rate_and_disabled_limiter_never_reject(clock):
+    for limiter, rate in ((RateLimiter(MemoryRateLimitStore()), Rate(0)), (RateLimiter(MemoryRateLimitStore(), enabled=False), Rate(1))):
+        for _ in range(10):
+            await limiter.hit("signup", "ip:1", rate)
+
+
+@pytest.mark.anyio
+async def test_least_recently_used_buckets_are_dropped_and_start_full(clock):
+    store = MemoryRateLimitStore(max_keys=2)
+    rate = Rate(per_minute=1)
+    await store.take("a", rate)
+    await store.take("b", rate)
+    await store.take("c", rate)     # Evicts "a"
+    assert await store.take("a", rate) == 0.0
+    assert await store.take("c", rate) > 0
+
+
+@pytest.mark.anyio
+async def test_counters_expire(clock):
+    store = MemoryRateLimitStore()
+    assert await store.incr("slots", 1, ttl=60) == 1
+    assert await store.incr("slots", 1, ttl=60) == 2
+    assert await store.incr("slots", -1, ttl=60) == 1
+    clock.now += 61
+    assert await store.get("slots") == 0.0
+    assert await store.incr("slots", 1, ttl=60) == 1
+
+
+def request(client: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (client, 1234)})
+
+
+def test_client_ip_ignores_forwarded_for_unless_trusted(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", False)
+    assert client_ip(request("10.0.0.1", "203.0.113.7")) == "10.0.0.1"
+
+
+def test_client_ip_behind_a_proxy_takes_the_entry_the_proxy_appended(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_FORWARDED_HOPS", 1)
+    assert client_ip(request("10.0.0.1", "203.0.113.7")) == "203.0.113.7"
+    # A client can prepend anything; only what our proxy added counts
+    assert client_ip(request("10.0.0.1", "1.2.3.4, 203.0.113.7")) == "203.0.113.7"
+    assert client_ip(request("10.0.0.1")) == "10.0.0.1"
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_FORWARDED_HOPS", 2)
+    assert client_ip(request("10.0.0.1", "1.2.3.4, 203.0.113.7, 10.0.0.9")) == "203.0.113.7"
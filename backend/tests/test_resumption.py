@@ -0,0 +1,67 @@
+import pytest
+
+from app.realtime.queues import RelayQueue
+from app.realtime.resumption import ReplayBuffer, ResumableSession, ResumptionRegistry
+from app.realtime.transcripts import TranscriptRecorder
+
+
+class FakeLive:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def parked_session(owner=None) -> ResumableSession:
+    recorder = TranscriptRecorder("speaking")
+    return ResumableSession(
+        session_id=recorder.session_id,
+        endpoint="speaking",
+        key=("Spanish", "Greetings", "Assisted"),
+        live=FakeLive(),
+        recorder=recorder,
+        downstream=RelayQueue("downstream", maxsize=10),
+        replay=ReplayBuffer(10),
+        owner=owner,
+    )
+
+
+@pytest.fixture
+async def registry():
+    registry = ResumptionRegistry(grace_seconds=30, max_parked=5)
+    yield registry
+    await registry.close()
+
+
+@pytest.mark.anyio
+async def test_claim_needs_the_owner_and_the_resume_key(registry):
+    session = parked_session(owner="user-1")
+    registry.track(session)
+    assert await registry.park(session)
+
+    assert await registry.claim(session.session_id, "speaking", "user-2", session.resume_key) is None
+    assert await registry.claim(session.session_id, "speaking", None, session.resume_key) is None
+    assert await registry.claim(session.session_id, "speaking", "user-1", "wrong-key") is None
+    assert registry.denied == 3
+
+    assert await registry.claim(session.session_id, "speaking", "user-1", session.resume_key) is session
+
+
+@pytest.mark.anyio
+async def test_anonymous_session_resumes_with_its_key(registry):
+    session = parked_session()
+    registry.track(session)
+    assert await registry.park(session)
+
+    assert await registry.claim(session.session_id, "speaking") is None
+    assert await registry.claim(session.session_id, "speaking", None, session.resume_key) is session
+
+
+@pytest.mark.anyio
+async def test_close_live_closes_a_claimed_session_once():
+    session = parked_session()
+    live = session.live
+    await session.close_live()
+    await session.close_live()
+    assert live.closed and session.live is None
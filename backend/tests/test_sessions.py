@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.api.deps import get_optional_identity, load_identity
+from app.core import cache, security
+from app.core.cache import TTLCache
+from app.core.security import create_session_token, identity_cache, verify_session_token
+from app.schemas.user import SessionIdentity, User
+
+
+def identity(user_id: str = None) -> SessionIdentity:
+    return SessionIdentity(user_id=user_id or str(ObjectId()), email="ana@example.com", first_name="Ana")
+
+
+def bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture(autouse=True)
+def empty_identity_cache():
+    identity_cache.clear()
+
+
+def test_tokens_verify_and_reject_tampering_and_expiry(monkeypatch):
+    token = create_session_token(identity("abc"))
+    assert verify_session_token(token)["sub"] == "abc"
+
+    body, signature = token.split(".")
+    forged = security._b64encode(b'{"sub":"someone-else","exp":9999999999}')
+    assert verify_session_token(f"{forged}.{signature}") is None
+    assert verify_session_token(body) is None
+    assert verify_session_token("not a token") is None
+    # Non-ASCII anywhere is a bad token, not a server error
+    assert verify_session_token("a.\xe9") is None
+    assert verify_session_token(f"{body}.{signature[:-1]}\xe9") is None
+    assert verify_session_token(f"\xe9.{signature}") is None
+
+    monkeypatch.setattr(security, "time", SimpleNamespace(time=lambda: 10**11))
+    assert verify_session_token(token) is None
+
+
+def test_cache_expires_and_evicts_least_recently_used(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    entries = TTLCache(maxsize=2, ttl=10)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    assert entries.get("a") == 1
+    entries.set("c", 3)                 # "b" was used least recently
+    assert entries.get("b") is None
+    assert (entries.get("a"), entries.get("c")) == (1, 3)
+
+    now[0] += 11
+    assert entries.get("a") is None
+    assert entries.stats() == {"size": 1, "maxsize": 2, "hits": 3, "misses": 2, "evictions": 1, "hit_ratio": 0.6}
+
+
+@pytest.mark.anyio
+async def test_identity_is_read_once_then_served_from_the_cache(db):
+    users = User.get_motor_collection()
+    user_id = (await users.insert_one({"email": "ana@example.com", "password_hash": "x", "first_name": "Ana"})).inserted_id
+    token = create_session_token(identity(str(user_id)))
+
+    assert (await get_optional_identity(bearer(token))).first_name == "Ana"
+    # A cached identity doesn't need the database any more
+    await users.update_one({"_id": user_id}, {"$set": {"first_name": "Changed"}})
+    assert (await get_optional_identity(bearer(token))).first_name == "Ana"
+    assert identity_cache.stats()["hits"] >= 1
+
+    identity_cache.invalidate(str(user_id))
+    assert (await load_identity(str(user_id))).first_name == "Changed"
+
+
+@pytest.mark.anyio
+async def test_bad_tokens_and_deleted_users_are_401(db):
+    assert await get_optional_identity(None) is None
+    for token in ("garbage", "a.\xe9", create_session_token(identity()), create_session_token(identity("not-an-object-id"))):
+        with pytest.raises(HTTPException) as rejected:
+            await get_optional_identity(bearer(token))
+        assert rejected.value.status_code == 401
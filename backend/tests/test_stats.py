@@ -0,0 +1,55 @@
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.core.stats import daily_series, rollup_days, touched_days, user_days, utc_today
+from app.schemas.stats import LessonEvent
+
+
+async def record(user_id, completed_on, recorded_at, minutes=10, language="spanish"):
+    await LessonEvent.get_motor_collection().insert_one({
+        "timestamp": recorded_at,
+        "language": language,
+        "user_id": user_id,
+        "lesson_id": "l1",
+        "time_spent": minutes,
+        "rating": 4,
+        "completed_on": datetime.combine(completed_on, time.min),
+        "source": "sync" if completed_on < recorded_at.date() else "complete",
+    })
+
+
+@pytest.mark.anyio
+async def test_synced_lessons_count_on_the_day_they_were_completed(db):
+    user = ObjectId()
+    today = utc_today()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    await record(user, today, now)
+    # Practised offline three days ago, synced just now
+    await record(user, today - timedelta(days=3), now, minutes=25)
+
+    await rollup_days([today, today - timedelta(days=3)])
+
+    rows = await user_days(user, today - timedelta(days=7))
+    assert [(row.day, row.minutes) for row in rows] == [(today - timedelta(days=3), 25), (today, 10)]
+    series = await daily_series(today - timedelta(days=7))
+    assert [(row.day, row.lessons) for row in series] == [(today - timedelta(days=3), 1), (today, 1)]
+
+
+@pytest.mark.anyio
+async def test_rollup_job_picks_up_the_days_a_sync_touched(db):
+    user = ObjectId()
+    today = utc_today()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    await record(user, today - timedelta(days=5), now)
+    await record(user, today - timedelta(days=9), now)
+    # Recorded long ago: its day was rolled up back then
+    await record(user, today - timedelta(days=20), now - timedelta(days=20))
+
+    days = await touched_days(today - timedelta(days=1))
+    assert sorted(days) == [today - timedelta(days=9), today - timedelta(days=5)]
+
+    await rollup_days(days)
+    rows = await user_days(user, today - timedelta(days=30))
+    assert [row.day for row in rows] == [today - timedelta(days=9), today - timedelta(days=5)]
@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.sessions import session_summary, session_transcript
+from app.realtime import transcripts
+from app.realtime.transcripts import TranscriptRecorder
+from app.schemas.transcript import SessionSummary, TranscriptTurn
+from app.schemas.user import SessionIdentity
+
+
+def identity(user_id: str) -> SessionIdentity:
+    return SessionIdentity(user_id=user_id, email=f"{user_id}@example.com", first_name="Ana")
+
+
+async def store_session(session_id: str, owner=None):
+    now = datetime.now(timezone.utc)
+    await SessionSummary.get_motor_collection().insert_one({
+        "session_id": session_id, "user_id": owner, "endpoint": "speaking", "language": "Spanish",
+        "started_at": now, "ended_at": now, "turns": 2, "notes": "Good.", "source": "fallback",
+    })
+    await TranscriptTurn.get_motor_collection().insert_many([
+        {"session_id": session_id, "user_id": owner, "seq": seq, "role": role, "text": text, "created_at": now}
+        for seq, (role, text) in enumerate([("user", "Hola"), ("tutor", "¡Hola!")])
+    ])
+
+
+async def status_of(call) -> int:
+    try:
+        await call
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_recorded_turns_carry_the_owner(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(transcripts.transcript_writer, "record", recorded.append)
+    recorder = TranscriptRecorder("speaking", "Spanish", owner="u1")
+    recorder.add("user", "Hola")
+    recorder.complete_turn()
+    assert recorded[0]["user_id"] == "u1"
+
+
+@pytest.mark.anyio
+async def test_owned_sessions_are_only_readable_by_their_owner(db):
+    await store_session("s1", owner="u1")
+
+    summary = await session_summary("s1", identity("u1"))
+    transcript = await session_transcript("s1", identity("u1"))
+    assert summary.notes == "Good."
+    assert [turn.text for turn in transcript.turns] == ["Hola", "¡Hola!"]
+
+    for route in (session_summary, session_transcript):
+        assert await status_of(route("s1", None)) == 401
+        # Another user sees the same 404 as for an id that doesn't exist
+        assert await status_of(route("s1", identity("u2"))) == 404
+        assert await status_of(route("missing", identity("u1"))) == 404
+
+
+@pytest.mark.anyio
+async def test_sessions_opened_without_a_token_are_readable_by_id(db):
+    await store_session("s2")
+
+    for caller in (None, identity("u2")):
+        assert (await session_summary("s2", caller)).turns == 2
+        assert len((await session_transcript("s2", caller)).turns) == 2
@@ -9,7 +9,8 @@ const Speaking = () => {
   // Get default language from user data
   const getDefaultLanguage = () => {
     if (user?.last_lesson_language) return user.last_lesson_language
-    if (user?.languages_studied?.[0]?.language) return user.languages_studied[0].language
+    const studied = Object.values(user?.languages_studied || {})
+    if (studied[0]?.language) return studied[0].language
     return 'Spanish'
   }
   
@@ -24,14 +24,14 @@ const Lessons = () => {
         return flags[language] || "🌍";
     };
 
-    // Build lessons array from user's languages_studied
-    const lessons = (user.languages_studied || []).map((lang) => ({
+    // Build lessons array from user's languages_studied (keyed by language)
+    const lessons = Object.values(user.languages_studied || {}).map((lang) => ({
         id: lang.language.toLowerCase(),
         name: lang.language,
         flag: getLanguageFlag(lang.language),
         description: `Level: ${lang.level || "Beginner"}`,
         level: lang.level,
-        completedLessons: lang.completed_lessons?.length || 0,
+        completedLessons: lang.completed_count ?? lang.completed_lessons?.length ?? 0,
     }));
 
     // Get next lesson info
@@ -27,18 +27,19 @@ const Profile = () => {
     return flags[language] || '🌍'
   }
 
-  // Build profile data from user object
+  // Build profile data from user object (languages_studied is keyed by language)
+  const firstLanguage = Object.values(user.languages_studied || {})[0]
   const profileData = {
     name: user.first_name || user.email?.split('@')[0] || 'Language Learner',
     email: user.email || 'user@example.com',
     joinDate: 'January 2026', // Could be calculated from user creation date if available
-    currentLanguage: user.last_lesson_language || (user.languages_studied?.[0]?.language) || 'No language yet',
-    languageFlag: user.last_lesson_language ? getLanguageFlag(user.last_lesson_language) : (user.languages_studied?.[0] ? getLanguageFlag(user.languages_studied[0].language) : '🌍'),
+    currentLanguage: user.last_lesson_language || firstLanguage?.language || 'No language yet',
+    languageFlag: user.last_lesson_language ? getLanguageFlag(user.last_lesson_language) : (firstLanguage ? getLanguageFlag(firstLanguage.language) : '🌍'),
     stats: {
       totalTime: user.total_time_spent || 0,
       streak: user.daily_streak || 0,
       lessonsCompleted: user.total_lessons_completed || 0,
-      currentLevel: user.languages_studied?.[0]?.level || 'Beginner'
+      currentLevel: firstLanguage?.level || 'Beginner'
     }
   }
 